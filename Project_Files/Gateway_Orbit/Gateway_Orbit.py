@@ -1,23 +1,20 @@
+import os
+import sys
+
 import spiceypy as spice
 import numpy as np
 import matplotlib.pyplot as plt
 
-# -------------------------------------------------
-# 1. Load kernels via your meta-kernel
-# -------------------------------------------------
-spice.furnsh('gateway_meta.txt')
-
-# -------------------------------------------------
-# 2. Time window inside the SPK coverage
-# -------------------------------------------------
-utc_start = '2020-01-05 T00:00:00'
-utc_end   = '2020-03-05 T00:00:00'
-
-et_start = spice.str2et(utc_start)
-et_end   = spice.str2et(utc_end)
+# Shared helpers live one directory up in Project_Files/spice_tools
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from spice_tools.adaptive_sampling import adaptive_times
+from spice_tools.ephemeris_cache import EphemerisCache
+from spice_tools.instrumentation import instrumented
+from spice_tools.kernel_session import kernel_session
+from spice_tools.rotating_frame import RotatingFrame
 
-N = 2000
-times = np.linspace(et_start, et_end, N)
+# gateway_meta.txt is resolved next to this script, so it runs from any directory
+GATEWAY_KERNELS = kernel_session('gateway_meta.txt', relative_to=__file__)
 
 # -------------------------------------------------
 # 3. NAIF IDs
@@ -26,84 +23,126 @@ DSG_ID   = '-60000'   # DSG spacecraft
 EARTH_ID = 'EARTH'    # 399
 MOON_ID  = 'MOON'     # 301
 
-# -------------------------------------------------
-# 4. States in J2000, Moon-centered
-# -------------------------------------------------
-# DSG w.r.t. MOON in J2000
-dsg_states_moon, _ = spice.spkezr(
-    targ   = DSG_ID,
-    et     = times,
-    ref    = 'J2000',
-    abcorr = 'NONE',
-    obs    = MOON_ID
-)
-r_dsg_moon = dsg_states_moon[:, :3]
-
-# Earth w.r.t. MOON in J2000
-earth_states_moon, _ = spice.spkezr(
-    targ   = EARTH_ID,
-    et     = times,
-    ref    = 'J2000',
-    abcorr = 'NONE',
-    obs    = MOON_ID
-)
-r_e_moon = earth_states_moon[:, :3]
-v_e_moon = earth_states_moon[:, 3:]
-
-# -------------------------------------------------
-# 5. Build Moon-centered EM rotating frame
-# -------------------------------------------------
-# x-axis: Moon → Earth
-x_hat = r_e_moon / np.linalg.norm(r_e_moon, axis=1, keepdims=True)
-
-# z-axis: orbital angular momentum of Earth about Moon
-h_vec = np.cross(r_e_moon, v_e_moon)
-z_hat = h_vec / np.linalg.norm(h_vec, axis=1, keepdims=True)
-
-# y-axis: completes right-handed triad
-y_hat = np.cross(z_hat, x_hat)
-y_hat = y_hat / np.linalg.norm(y_hat, axis=1, keepdims=True)
-
-# -------------------------------------------------
-# 6. Rotate DSG and Earth positions into this frame
-# -------------------------------------------------
-r_dsg_rot = np.zeros_like(r_dsg_moon)
-r_e_rot   = np.zeros_like(r_e_moon)
-
-for k in range(N):
-    C_rot_J2000 = np.column_stack((x_hat[k], y_hat[k], z_hat[k]))  # columns are unit axes
-    r_dsg_rot[k] = C_rot_J2000.T @ r_dsg_moon[k]
-    r_e_rot[k]   = C_rot_J2000.T @ r_e_moon[k]
-
-# -------------------------------------------------
-# 7. Plot as seen from Earth: use Y–Z plane
-#    (Moon at origin, looking along -X toward the Moon)
-# -------------------------------------------------
-fig, ax = plt.subplots(figsize=(6, 6))
-
-# Plot NRHO in Y–Z plane
-ax.plot(r_dsg_rot[:, 1], r_dsg_rot[:, 2],
-        label='DSG NRHO')
-
-# Moon at center
-ax.scatter(0, 0, s=60, color='gray', label='Moon')
-
-# Nice symmetric limits around Moon
-y = r_dsg_rot[:, 1]
-z = r_dsg_rot[:, 2]
-R = 1.1 * max(abs(y).max(), abs(z).max())
-ax.set_xlim(-R, R)
-ax.set_ylim(-R, R)
-
-ax.set_xlabel('Y (km)')
-ax.set_ylabel('Z (km)')
-ax.set_title('DSG NRHO in Earth–Moon Rotating Frame\nMoon-centered, view from Earth')
-
-ax.set_aspect('equal', 'box')
-ax.grid(True)
-ax.legend(loc='upper right')
-fig.tight_layout()
-plt.show()
-
-spice.kclear()
-
+def rotating_frame_positions(times, cache=None):
+    """
+    DSG and Earth positions side by side (N, 6) in the Moon-centered rotating frame.
+    Kernels must already be loaded.
+    """
+    # -------------------------------------------------
+    # 4. & 5. Build Moon-centered EM rotating frame
+    # -------------------------------------------------
+    # One batched state pull of Earth w.r.t. MOON in J2000 defines the frame:
+    #   x-axis: Moon → Earth
+    #   z-axis: orbital angular momentum of Earth about Moon
+    #   y-axis: completes right-handed triad
+    frame = RotatingFrame(MOON_ID, EARTH_ID, times, center='primary', cache=cache)
+
+    # -------------------------------------------------
+    # 6. Rotate DSG and Earth states into this frame
+    # -------------------------------------------------
+    # All N epochs are rotated with stacked matrix products (no per-sample loop);
+    # velocities include the omega x r term of the rotating frame
+    dsg_states_rot = frame.transform(DSG_ID)
+    earth_states_rot = frame.to_rotating(frame.relative_states)
+
+    return np.hstack([dsg_states_rot[:, :3], earth_states_rot[:, :3]])
+
+@instrumented('calculate_rotating_frame')
+def calculate_rotating_frame(utc_start, utc_end, N, cache=None, tolerance_km=None):
+    """
+    DSG and Earth positions (N, 3) in the Moon-centered Earth-Moon rotating frame,
+    and the N epochs (ET) they were computed at.
+    Pass an EphemerisCache as `cache` to skip SPICE for states computed before.
+
+    With tolerance_km, N is only the starting grid: epochs are added where straight
+    segments between samples would stray more than tolerance_km from the orbit
+    (the perilune passes) and the smooth stretches keep the coarse spacing. The
+    returned epochs are then non-uniform and can be reused for later state pulls.
+    """
+    # -------------------------------------------------
+    # 1. Load kernels via your meta-kernel
+    # -------------------------------------------------
+    with GATEWAY_KERNELS:
+        # -------------------------------------------------
+        # 2. Time window inside the SPK coverage
+        # -------------------------------------------------
+        et_start = spice.str2et(utc_start)
+        et_end   = spice.str2et(utc_end)
+
+        if tolerance_km is None:
+            times = np.linspace(et_start, et_end, N)
+            positions = rotating_frame_positions(times, cache)
+        else:
+            samples = adaptive_times(lambda t: rotating_frame_positions(t, cache), et_start, et_end,
+                                     tolerance_km, n_initial=N)
+            times, positions = samples.times_et, samples.values
+
+    r_dsg_rot = positions[:, :3]
+    r_e_rot   = positions[:, 3:]
+
+    return r_dsg_rot, r_e_rot, times
+
+@instrumented('plot_rotating_frame')
+def plot_rotating_frame(r_dsg_rot, filename=None):
+    """
+    Plots the NRHO in the Y–Z plane of the rotating frame. The figure is saved to
+    `filename` if given (no display needed), otherwise shown on screen.
+    """
+    # -------------------------------------------------
+    # 7. Plot as seen from Earth: use Y–Z plane
+    #    (Moon at origin, looking along -X toward the Moon)
+    # -------------------------------------------------
+    fig, ax = plt.subplots(figsize=(6, 6))
+
+    # Plot NRHO in Y–Z plane
+    ax.plot(r_dsg_rot[:, 1], r_dsg_rot[:, 2],
+            label='DSG NRHO')
+
+    # Moon at center
+    ax.scatter(0, 0, s=60, color='gray', label='Moon')
+
+    # Nice symmetric limits around Moon
+    y = r_dsg_rot[:, 1]
+    z = r_dsg_rot[:, 2]
+    R = 1.1 * max(abs(y).max(), abs(z).max())
+    ax.set_xlim(-R, R)
+    ax.set_ylim(-R, R)
+
+    ax.set_xlabel('Y (km)')
+    ax.set_ylabel('Z (km)')
+    ax.set_title('DSG NRHO in Earth–Moon Rotating Frame\nMoon-centered, view from Earth')
+
+    ax.set_aspect('equal', 'box')
+    ax.grid(True)
+    ax.legend(loc='upper right')
+    fig.tight_layout()
+
+    if filename:
+        fig.savefig(filename)
+        plt.close(fig)
+    else:
+        plt.show()
+
+# --- Main Execution ---
+if __name__ == "__main__":
+
+    # Time window inside the SPK coverage
+    utc_start = '2020-01-05 T00:00:00'
+    utc_end   = '2020-03-05 T00:00:00'
+    N = 64
+    # Plotted path stays within this distance of the true orbit; epochs are
+    # concentrated around perilune instead of spread evenly
+    TOLERANCE_KM = 25.0
+
+    # On-disk cache: re-running with the same kernels and
+    # time grid loads the states without calling SPICE
+    cache = EphemerisCache()
+
+    r_dsg_rot, r_e_rot, times = calculate_rotating_frame(utc_start, utc_end, N, cache=cache,
+                                                        tolerance_km=TOLERANCE_KM)
+    print(f"{len(times)} adaptive epochs")
+    print(f"Kernels loaded in {GATEWAY_KERNELS.load_seconds:.2f} s")
+
+    plot_rotating_frame(r_dsg_rot)
+
+    GATEWAY_KERNELS.unload()
@@ -1,23 +1,20 @@
+import os
+import sys
+
 import spiceypy as spice
 import numpy as np
 import matplotlib.pyplot as plt
 
-# -------------------------------------------------
-# 1. Load kernels via your meta-kernel
-# -------------------------------------------------
-spice.furnsh("gateway_meta.txt")
-
-# -------------------------------------------------
-# 2. Time window inside the SPK coverage
-# -------------------------------------------------
-utc_start = "2020-01-05 T00:00:00"
-utc_end   = "2020-03-05 T00:00:00"
-
-et_start = spice.str2et(utc_start)
-et_end   = spice.str2et(utc_end)
+# Shared helpers live one directory up in Project_Files/spice_tools
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from spice_tools.adaptive_sampling import adaptive_times
+from spice_tools.ephemeris_cache import EphemerisCache
+from spice_tools.instrumentation import instrumented
+from spice_tools.kernel_session import kernel_session
+from spice_tools.rotating_frame import body_states
 
-N = 2000
-times = np.linspace(et_start, et_end, N)
+# gateway_meta.txt is resolved next to this script, so it runs from any directory
+GATEWAY_KERNELS = kernel_session("gateway_meta.txt", relative_to=__file__)
 
 # -------------------------------------------------
 # 3. NAIF IDs
@@ -26,77 +23,126 @@ DSG_ID   = "-60000"   # DSG spacecraft from nrho.lbl
 EARTH_ID = "EARTH"    # 399
 MOON_ID  = "MOON"     # 301
 
-# -------------------------------------------------
-# 4. States in Earth-centered inertial frame (J2000)
-# -------------------------------------------------
-# DSG w.r.t. EARTH in J2000 (this is basically ECI)
-dsg_states_eci, _ = spice.spkezr(
-    targ   = DSG_ID,
-    et     = times,
-    ref    = "J2000",
-    abcorr = "NONE",
-    obs    = EARTH_ID,
-)
-r_dsg_eci = dsg_states_eci[:, :3]   # (N,3)
-
-# Moon w.r.t. EARTH in J2000
-moon_states_eci, _ = spice.spkezr(
-    targ   = MOON_ID,
-    et     = times,
-    ref    = "J2000",
-    abcorr = "NONE",
-    obs    = EARTH_ID,
-)
-r_moon_eci = moon_states_eci[:, :3]
-
-# -------------------------------------------------
-# 5. 3D plot: Earth at origin, Moon orbiting, DSG precessing
-# -------------------------------------------------
-fig = plt.figure(figsize=(7, 7))
-ax = fig.add_subplot(111, projection="3d")
-
-# Optional: subsample so the plot isn't too dense
-step = slice(0, N, 3)
-
-# DSG trajectory
-ax.plot(
-    r_dsg_eci[step, 0], r_dsg_eci[step, 1], r_dsg_eci[step, 2],
-    label="DSG NRHO",
-)
-
-# Moon trajectory
-ax.plot(
-    r_moon_eci[step, 0], r_moon_eci[step, 1], r_moon_eci[step, 2],
-    linestyle="--",
-    label="Moon orbit",
-)
-
-# Earth at origin
-ax.scatter(0.0, 0.0, 0.0, s=80, color="blue", label="Earth")
-
-ax.set_xlabel("X (km)")
-ax.set_ylabel("Y (km)")
-ax.set_zlabel("Z (km)")
-ax.set_title("DSG NRHO and Moon in Earth-Centered Inertial Frame (J2000)")
-
-# --- make the 3D aspect ratio equal-ish ---
-x = r_dsg_eci[:, 0]
-y = r_dsg_eci[:, 1]
-z = r_dsg_eci[:, 2]
-
-max_range = max(x.max() - x.min(), y.max() - y.min(), z.max() - z.min()) / 2.0
-mid_x = (x.max() + x.min()) / 2.0
-mid_y = (y.max() + y.min()) / 2.0
-mid_z = (z.max() + z.min()) / 2.0
-
-ax.set_xlim(mid_x - max_range, mid_x + max_range)
-ax.set_ylim(mid_y - max_range, mid_y + max_range)
-ax.set_zlim(mid_z - max_range, mid_z + max_range)
-
-ax.legend()
-plt.tight_layout()
-plt.show()
-
-spice.kclear()
-
-
+def eci_positions(times, cache=None):
+    """
+    DSG and Moon positions side by side (N, 6) w.r.t. Earth in J2000.
+    Kernels must already be loaded.
+    """
+    # DSG and Moon w.r.t. EARTH in J2000 (this is basically ECI)
+    states_eci = body_states([DSG_ID, MOON_ID], times, EARTH_ID, ref="J2000", abcorr="NONE", cache=cache)
+    return np.hstack([states_eci[DSG_ID][:, :3], states_eci[MOON_ID][:, :3]])
+
+@instrumented('calculate_eci_states')
+def calculate_eci_states(utc_start, utc_end, N, cache=None, tolerance_km=None):
+    """
+    Earth-centered J2000 positions (N, 3) of the DSG and the Moon, and the N epochs (ET).
+    Pass an EphemerisCache as `cache` to skip SPICE for states computed before.
+    With tolerance_km, N is only the starting grid and epochs are added where the
+    plotted lines would stray more than tolerance_km from the true paths.
+    """
+    # -------------------------------------------------
+    # 1. Load kernels via your meta-kernel
+    # -------------------------------------------------
+    with GATEWAY_KERNELS:
+        # -------------------------------------------------
+        # 2. Time window inside the SPK coverage
+        # -------------------------------------------------
+        et_start = spice.str2et(utc_start)
+        et_end   = spice.str2et(utc_end)
+
+        # -------------------------------------------------
+        # 4. States in Earth-centered inertial frame (J2000)
+        # -------------------------------------------------
+        if tolerance_km is None:
+            times = np.linspace(et_start, et_end, N)
+            positions = eci_positions(times, cache)
+        else:
+            samples = adaptive_times(lambda t: eci_positions(t, cache), et_start, et_end,
+                                     tolerance_km, n_initial=N)
+            times, positions = samples.times_et, samples.values
+
+    r_dsg_eci  = positions[:, :3]   # (N,3)
+    r_moon_eci = positions[:, 3:]
+
+    return r_dsg_eci, r_moon_eci, times
+
+@instrumented('plot_eci')
+def plot_eci(r_dsg_eci, r_moon_eci, filename=None):
+    """
+    3D plot with Earth at the origin, the Moon orbiting and the DSG precessing.
+    The figure is saved to `filename` if given (no display needed), otherwise shown.
+    """
+    # -------------------------------------------------
+    # 5. 3D plot: Earth at origin, Moon orbiting, DSG precessing
+    # -------------------------------------------------
+    fig = plt.figure(figsize=(7, 7))
+    ax = fig.add_subplot(111, projection="3d")
+
+    # Every sample is plotted: adaptive grids (tolerance_km) are already sparse
+    # where the paths are smooth, and dropping samples would cut the perilune corners
+
+    # DSG trajectory
+    ax.plot(
+        r_dsg_eci[:, 0], r_dsg_eci[:, 1], r_dsg_eci[:, 2],
+        label="DSG NRHO",
+    )
+
+    # Moon trajectory
+    ax.plot(
+        r_moon_eci[:, 0], r_moon_eci[:, 1], r_moon_eci[:, 2],
+        linestyle="--",
+        label="Moon orbit",
+    )
+
+    # Earth at origin
+    ax.scatter(0.0, 0.0, 0.0, s=80, color="blue", label="Earth")
+
+    ax.set_xlabel("X (km)")
+    ax.set_ylabel("Y (km)")
+    ax.set_zlabel("Z (km)")
+    ax.set_title("DSG NRHO and Moon in Earth-Centered Inertial Frame (J2000)")
+
+    # --- make the 3D aspect ratio equal-ish ---
+    x = r_dsg_eci[:, 0]
+    y = r_dsg_eci[:, 1]
+    z = r_dsg_eci[:, 2]
+
+    max_range = max(x.max() - x.min(), y.max() - y.min(), z.max() - z.min()) / 2.0
+    mid_x = (x.max() + x.min()) / 2.0
+    mid_y = (y.max() + y.min()) / 2.0
+    mid_z = (z.max() + z.min()) / 2.0
+
+    ax.set_xlim(mid_x - max_range, mid_x + max_range)
+    ax.set_ylim(mid_y - max_range, mid_y + max_range)
+    ax.set_zlim(mid_z - max_range, mid_z + max_range)
+
+    ax.legend()
+    plt.tight_layout()
+
+    if filename:
+        fig.savefig(filename)
+        plt.close(fig)
+    else:
+        plt.show()
+
+# --- Main Execution ---
+if __name__ == "__main__":
+
+    # Time window inside the SPK coverage
+    utc_start = "2020-01-05 T00:00:00"
+    utc_end   = "2020-03-05 T00:00:00"
+    N = 64
+    TOLERANCE_KM = 25.0   # plotted lines stay this close to the true paths
+
+    # On-disk cache: re-running with the same kernels and
+    # time grid loads the states without calling SPICE
+    cache = EphemerisCache()
+
+    r_dsg_eci, r_moon_eci, times = calculate_eci_states(utc_start, utc_end, N, cache=cache,
+                                                        tolerance_km=TOLERANCE_KM)
+    print(f"{len(times)} adaptive epochs")
+    print(f"Kernels loaded in {GATEWAY_KERNELS.load_seconds:.2f} s")
+
+    plot_eci(r_dsg_eci, r_moon_eci)
+
+    GATEWAY_KERNELS.unload()
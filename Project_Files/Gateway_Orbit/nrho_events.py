@@ -0,0 +1,235 @@
+import os
+import sys
+import csv
+
+import spiceypy as spice
+import numpy as np
+
+# Shared helpers live one directory up in Project_Files/spice_tools
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from spice_tools.coverage import body_code, spk_coverage
+from spice_tools.instrumentation import instrumented, stage
+from spice_tools.kernel_session import kernel_session
+from spice_tools.rotating_frame import body_states
+from spice_tools.time_scale import et_to_iso
+
+# gateway_meta.txt is resolved next to this script, so it runs from any directory
+GATEWAY_KERNELS = kernel_session('gateway_meta.txt', relative_to=__file__)
+
+# -------------------------------------------------
+# NAIF IDs
+# -------------------------------------------------
+DSG_ID   = '-60000'   # DSG spacecraft
+MOON_ID  = 'MOON'     # 301
+
+# Coarse scan step. It only has to be shorter than the time between a perilune and
+# the next apolune (about 3 days), because each sign change of the range rate is
+# found wherever it falls inside a step; refinement does the rest.
+SCAN_STEP_SECONDS = 3600.0
+
+# Event epochs are refined to this accuracy
+TIME_TOLERANCE = 1e-3
+
+PERILUNE = 1
+APOLUNE = -1
+
+# One row per revolution, perilune to next perilune
+REVOLUTION_DTYPE = np.dtype([
+    ('revolution', np.int64),
+    ('perilune_et', np.float64),
+    ('perilune_radius_km', np.float64),
+    ('perilune_altitude_km', np.float64),
+    ('perilune_speed_kms', np.float64),
+    ('apolune_et', np.float64),
+    ('apolune_radius_km', np.float64),
+    ('apolune_speed_kms', np.float64),
+    ('period_days', np.float64),
+    ('amplitude_km', np.float64),
+])
+
+def dsg_moon_states(times_et, cache=None):
+    """
+    Moon-centered J2000 states (N, 6) of the DSG (NaN outside SPK coverage).
+    """
+    return body_states([DSG_ID], times_et, MOON_ID, cache=cache)[DSG_ID]
+
+def range_rate(states):
+    """
+    Rate of change of the distance from the Moon, r . v / |r| (km/s), for (N, 6) states.
+    """
+    states = np.asarray(states, dtype=float)
+    r = states[:, :3]
+    return np.sum(r * states[:, 3:6], axis=1) / np.linalg.norm(r, axis=1)
+
+def coarse_brackets(times_et, rdot):
+    """
+    Sign changes of the range rate on a time grid. Returns (lo, hi, kind) arrays:
+    every event lies in [lo, hi], kind is PERILUNE (range rate - to +) or APOLUNE (+ to -).
+    Samples with NaN (outside coverage) never form a bracket.
+    """
+    before, after = rdot[:-1], rdot[1:]
+    rising = (before < 0) & (after >= 0)
+    falling = (before > 0) & (after <= 0)
+    k = np.flatnonzero(rising | falling)
+    kind = np.where(rising[k], PERILUNE, APOLUNE)
+    return times_et[k], times_et[k + 1], kind
+
+@instrumented('refine_events')
+def refine_events(lo, hi, kind, tolerance=TIME_TOLERANCE):
+    """
+    Refines every bracketed range-rate root at once: each bisection step evaluates the
+    midpoints of all brackets with one batched spkezr call, and a final linear
+    interpolation inside the remaining bracket gives the epoch.
+    """
+    lo = np.array(lo, dtype=float)
+    hi = np.array(hi, dtype=float)
+    if len(lo) == 0:
+        return lo
+
+    # g = kind * range rate is negative at lo and non-negative at hi for both kinds
+    g_lo = kind * range_rate(dsg_moon_states(lo))
+    g_hi = kind * range_rate(dsg_moon_states(hi))
+
+    # TEACHING NOTE: spice.gfdist(..., 'LOCMIN', ...) finds the same perilunes, but
+    # one search at a time. Bisecting all brackets together keeps every SPICE call batched.
+    iterations = int(np.ceil(np.log2(max(np.max(hi - lo), tolerance) / tolerance)))
+    for _ in range(iterations):
+        mid = 0.5 * (lo + hi)
+        g_mid = kind * range_rate(dsg_moon_states(mid))
+        below = g_mid < 0
+        lo = np.where(below, mid, lo)
+        g_lo = np.where(below, g_mid, g_lo)
+        hi = np.where(below, hi, mid)
+        g_hi = np.where(below, g_hi, g_mid)
+
+    return lo - g_lo * (hi - lo) / (g_hi - g_lo)
+
+@instrumented('find_apsides')
+def find_apsides(et_start=None, et_end=None, step_seconds=SCAN_STEP_SECONDS,
+                 tolerance=TIME_TOLERANCE, chunk_size=200000, cache=None):
+    """
+    Epochs of every perilune and apolune of the DSG between et_start and et_end
+    (None for either end uses the whole DSG kernel). Kernels must already be loaded.
+    Returns (event_et, kind) sorted by time, kind being PERILUNE or APOLUNE.
+    """
+    intervals = spk_coverage().pair_intervals(body_code(DSG_ID), body_code(MOON_ID))
+    if et_start is not None or et_end is not None:
+        low = -np.inf if et_start is None else et_start
+        high = np.inf if et_end is None else et_end
+        intervals = np.column_stack([np.maximum(intervals[:, 0], low), np.minimum(intervals[:, 1], high)])
+        intervals = intervals[intervals[:, 0] < intervals[:, 1]]
+
+    los, his, kinds = [], [], []
+    for start, stop in intervals:
+        n_total = int(np.floor((stop - start) / step_seconds)) + 1
+        # Consecutive chunks share one sample so no sign change falls between them
+        for first in range(0, max(n_total - 1, 1), chunk_size):
+            times_et = start + step_seconds * np.arange(first, min(first + chunk_size + 1, n_total))
+            with stage('apsis coarse scan'):
+                rdot = range_rate(dsg_moon_states(times_et, cache))
+            lo, hi, kind = coarse_brackets(times_et, rdot)
+            los.append(lo)
+            his.append(hi)
+            kinds.append(kind)
+
+    if not los:
+        return np.empty(0), np.empty(0, dtype=int)
+    kind = np.concatenate(kinds)
+    event_et = refine_events(np.concatenate(los), np.concatenate(his), kind, tolerance)
+    return event_et, kind
+
+def moon_mean_radius():
+    """
+    Mean lunar radius (km) from the RADII in the loaded PCK.
+    """
+    return float(np.mean(spice.bodvrd(MOON_ID, 'RADII', 3)[1]))
+
+def revolution_table(event_et, kind, cache=None):
+    """
+    Per-revolution table (a REVOLUTION_DTYPE record array): each revolution runs from one
+    perilune to the next and contains the apolune in between. A perilune at the end
+    of the span (no next perilune yet) is not counted. Kernels must already be loaded.
+    """
+    if len(event_et) == 0:
+        return np.zeros(0, dtype=REVOLUTION_DTYPE)
+    states = dsg_moon_states(event_et, cache)
+    radius = np.linalg.norm(states[:, :3], axis=1)
+    speed = np.linalg.norm(states[:, 3:6], axis=1)
+
+    # Events alternate, so a complete revolution is perilune, apolune, perilune
+    peri = np.flatnonzero(kind == PERILUNE)
+    start, end = peri[:-1], peri[1:]
+    complete = end - start == 2
+    start, end = start[complete], end[complete]
+    apo_index = start + 1
+
+    table = np.zeros(len(start), dtype=REVOLUTION_DTYPE)
+    table['revolution'] = np.arange(len(start))
+    table['perilune_et'] = event_et[start]
+    table['perilune_radius_km'] = radius[start]
+    table['perilune_altitude_km'] = radius[start] - moon_mean_radius()
+    table['perilune_speed_kms'] = speed[start]
+    table['apolune_et'] = event_et[apo_index]
+    table['apolune_radius_km'] = radius[apo_index]
+    table['apolune_speed_kms'] = speed[apo_index]
+    table['period_days'] = (event_et[end] - event_et[start]) / 86400.0
+    table['amplitude_km'] = radius[apo_index] - radius[start]
+    return table
+
+def revolution_statistics(table):
+    """
+    {column: (mean, std, min, max)} of the period and radius columns of a revolution table
+    (all NaN when the table has no complete revolution).
+    """
+    columns = ['period_days', 'perilune_radius_km', 'perilune_altitude_km',
+               'apolune_radius_km', 'amplitude_km', 'perilune_speed_kms']
+    if len(table) == 0:
+        return {name: (np.nan, np.nan, np.nan, np.nan) for name in columns}
+    return {name: (table[name].mean(), table[name].std(), table[name].min(), table[name].max())
+            for name in columns}
+
+def write_revolution_table(table, filename):
+    """
+    Saves a revolution table as CSV, with the event epochs as UTC strings.
+    Kernels must be loaded (for the leapseconds table).
+    """
+    perilune_utc = et_to_iso(table['perilune_et'], unit='s')
+    apolune_utc = et_to_iso(table['apolune_et'], unit='s')
+    with open(filename, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['revolution', 'perilune_utc', 'apolune_utc'] + list(REVOLUTION_DTYPE.names[2:5])
+                        + list(REVOLUTION_DTYPE.names[6:]))
+        for row, peri, apo in zip(table, perilune_utc, apolune_utc):
+            writer.writerow([row['revolution'], peri, apo]
+                            + [f'{row[name]:.6f}' for name in REVOLUTION_DTYPE.names[2:5]]
+                            + [f'{row[name]:.6f}' for name in REVOLUTION_DTYPE.names[6:]])
+
+@instrumented('calculate_revolutions')
+def calculate_revolutions(utc_start=None, utc_end=None, step_seconds=SCAN_STEP_SECONDS, cache=None):
+    """
+    Perilune/apolune passages and the per-revolution table between two UTC times
+    (None for either end uses the whole DSG kernel). Returns (event_et, kind, table).
+    """
+    with GATEWAY_KERNELS:
+        et_start = spice.str2et(utc_start) if utc_start else None
+        et_end = spice.str2et(utc_end) if utc_end else None
+        event_et, kind = find_apsides(et_start, et_end, step_seconds, cache=cache)
+        table = revolution_table(event_et, kind, cache)
+    return event_et, kind, table
+
+# --- Main Execution ---
+if __name__ == "__main__":
+
+    # Whole 15-year kernel
+    event_et, kind, table = calculate_revolutions()
+
+    print(f"{np.count_nonzero(kind == PERILUNE)} perilunes, {np.count_nonzero(kind == APOLUNE)} apolunes, "
+          f"{len(table)} complete revolutions")
+    for name, (mean, std, low, high) in revolution_statistics(table).items():
+        print(f"{name:>22}: mean {mean:12.3f}  std {std:10.3f}  min {low:12.3f}  max {high:12.3f}")
+
+    with GATEWAY_KERNELS:
+        write_revolution_table(table, 'nrho_revolutions.csv')
+    print("Saved nrho_revolutions.csv")
+
+    GATEWAY_KERNELS.unload()
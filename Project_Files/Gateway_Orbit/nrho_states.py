@@ -0,0 +1,228 @@
+import os
+import sys
+import json
+
+import spiceypy as spice
+import numpy as np
+
+# Shared helpers live one directory up in Project_Files/spice_tools
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from spice_tools.coverage import body_code, spk_coverage
+from spice_tools.instrumentation import instrumented, stage
+from spice_tools.kernel_session import kernel_session
+from spice_tools.rotating_frame import body_states
+
+# gateway_meta.txt is resolved next to this script, so it runs from any directory
+GATEWAY_KERNELS = kernel_session('gateway_meta.txt', relative_to=__file__)
+
+# -------------------------------------------------
+# NAIF IDs
+# -------------------------------------------------
+DSG_ID   = '-60000'   # DSG spacecraft
+EARTH_ID = 'EARTH'    # 399
+MOON_ID  = 'MOON'     # 301
+SUN_ID   = 'SUN'      # 10
+
+# (center, body) of every state product, all in J2000:
+# Moon-centered, Earth-centered (ECI) and Sun-centered (SCI)
+PRODUCTS = [
+    ('MOON', 'DSG'), ('MOON', 'EARTH'),
+    ('EARTH', 'DSG'), ('EARTH', 'MOON'),
+    ('SUN', 'DSG'), ('SUN', 'EARTH'), ('SUN', 'MOON'),
+]
+
+class NRHOChunk:
+    """
+    One chunk of a streamed NRHO run: its epochs and an (n, 6) J2000 state array
+    for every (center, body) pair in PRODUCTS. first_row is the chunk's offset in
+    the full run.
+    """
+
+    def __init__(self, index, first_row, times_et, states):
+        self.index = index
+        self.first_row = first_row
+        self.times_et = times_et
+        self.states = states
+
+@instrumented('nrho_chunk_states')
+def chunk_states(times_et, cache=None):
+    """
+    DSG, Earth and Moon states in all three frames for one block of epochs.
+
+    Geometric states add up along the chain DSG -> Moon -> Earth -> Sun, so three
+    batched spkezr calls (one per link) give every product in PRODUCTS; the sums
+    match direct spkezr calls to floating-point rounding. Epochs outside SPK
+    coverage are NaN. Kernels must already be loaded.
+    """
+    dsg_moon = body_states([DSG_ID], times_et, MOON_ID, cache=cache)[DSG_ID]
+    moon_earth = body_states([MOON_ID], times_et, EARTH_ID, cache=cache)[MOON_ID]
+    earth_sun = body_states([EARTH_ID], times_et, SUN_ID, cache=cache)[EARTH_ID]
+
+    with stage('nrho chain sums'):
+        dsg_earth = dsg_moon + moon_earth
+        moon_sun = moon_earth + earth_sun
+        return {
+            ('MOON', 'DSG'): dsg_moon,
+            ('MOON', 'EARTH'): -moon_earth,
+            ('EARTH', 'DSG'): dsg_earth,
+            ('EARTH', 'MOON'): moon_earth,
+            ('SUN', 'DSG'): dsg_earth + earth_sun,
+            ('SUN', 'EARTH'): earth_sun,
+            ('SUN', 'MOON'): moon_sun,
+        }
+
+def dsg_coverage():
+    """
+    (et_start, et_end) of the DSG kernel's coverage (with Sun data available).
+    Kernels must already be loaded.
+    """
+    intervals = spk_coverage().pair_intervals(body_code(DSG_ID), body_code(SUN_ID))
+    if len(intervals) == 0:
+        raise ValueError("No SPK coverage for the DSG; is the NRHO kernel loaded?")
+    return intervals[0, 0], intervals[-1, 1]
+
+def time_span(utc_start, utc_end):
+    """
+    ET span for UTC strings; None for either end means the start/end of DSG coverage.
+    Kernels must already be loaded.
+    """
+    cover_start, cover_end = dsg_coverage()
+    et_start = spice.str2et(utc_start) if utc_start else cover_start
+    et_end = spice.str2et(utc_end) if utc_end else cover_end
+    return et_start, et_end
+
+def stream_nrho_states(utc_start, utc_end, step_seconds, chunk_size=100000, cache=None, first_chunk=0):
+    """
+    Generator of NRHOChunk objects covering utc_start to utc_end every step_seconds
+    (None for either end uses the full 15-year kernel coverage). Only one chunk of
+    chunk_size epochs is held in memory at a time. first_chunk skips chunks that
+    were already produced, e.g. to resume an interrupted run.
+    """
+    with GATEWAY_KERNELS:
+        et_start, et_end = time_span(utc_start, utc_end)
+        n_total = int(np.floor((et_end - et_start) / step_seconds)) + 1
+
+        for index, first in enumerate(range(0, n_total, chunk_size)):
+            if index < first_chunk:
+                continue
+            # Integer offsets, so every chunk lines up exactly with the full grid
+            times_et = et_start + step_seconds * np.arange(first, min(first + chunk_size, n_total))
+            yield NRHOChunk(index, first, times_et, chunk_states(times_et, cache))
+
+def product_file(center, body):
+    return f'{body.lower()}_wrt_{center.lower()}.npy'
+
+class NRHOStateStore:
+    """
+    Preallocated .npy files (one per product plus times_et.npy) that a streamed run
+    fills chunk by chunk. Each chunk is written through a short-lived memory map, so
+    RAM use stays bounded however long the run is. manifest.json records how many
+    chunks are complete, so an interrupted run can be resumed.
+    """
+
+    def __init__(self, directory, et_start, step_seconds, n_rows, chunk_size):
+        self.directory = os.path.abspath(directory)
+        os.makedirs(self.directory, exist_ok=True)
+        self.manifest_path = os.path.join(self.directory, 'manifest.json')
+
+        config = {'et_start': et_start, 'step_seconds': step_seconds, 'rows': n_rows,
+                  'chunk_size': chunk_size, 'products': [list(p) for p in PRODUCTS]}
+        manifest = None
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+
+        if manifest is not None and manifest['config'] == config:
+            self.manifest = manifest
+        else:
+            # New run (or different grid): allocate every file at its final size
+            self.manifest = {'config': config, 'chunks_done': 0}
+            self._allocate('times_et.npy', (n_rows,))
+            for center, body in PRODUCTS:
+                self._allocate(product_file(center, body), (n_rows, 6))
+            self._save_manifest()
+
+    def _allocate(self, name, shape):
+        array = np.lib.format.open_memmap(os.path.join(self.directory, name), mode='w+',
+                                          dtype=np.float64, shape=shape)
+        del array
+
+    def _write(self, name, first_row, values):
+        array = np.load(os.path.join(self.directory, name), mmap_mode='r+')
+        array[first_row:first_row + len(values)] = values
+        array.flush()
+        del array
+
+    def _save_manifest(self):
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    @property
+    def chunks_done(self):
+        return self.manifest['chunks_done']
+
+    def append(self, chunk):
+        """
+        Writes one NRHOChunk into its rows and marks it complete.
+        """
+        self._write('times_et.npy', chunk.first_row, chunk.times_et)
+        for center, body in PRODUCTS:
+            self._write(product_file(center, body), chunk.first_row, chunk.states[(center, body)])
+
+        # Count the chunk as done last, so readers never see a partly written chunk
+        self.manifest['chunks_done'] = chunk.index + 1
+        self._save_manifest()
+
+def write_nrho_states(directory, utc_start=None, utc_end=None, step_seconds=600.0,
+                      chunk_size=100000, cache=None):
+    """
+    Streams DSG/Earth/Moon states in all three frames into an NRHOStateStore at
+    `directory`, resuming where an earlier run with the same grid stopped.
+    Returns the store.
+    """
+    with GATEWAY_KERNELS:
+        et_start, et_end = time_span(utc_start, utc_end)
+    n_rows = int(np.floor((et_end - et_start) / step_seconds)) + 1
+
+    store = NRHOStateStore(directory, et_start, step_seconds, n_rows, chunk_size)
+    for chunk in stream_nrho_states(utc_start, utc_end, step_seconds, chunk_size, cache,
+                                    first_chunk=store.chunks_done):
+        store.append(chunk)
+        print(f"Chunk {chunk.index}: {chunk.first_row + len(chunk.times_et)} of {n_rows} epochs written")
+    return store
+
+def open_nrho_states(directory):
+    """
+    Memory-maps a finished (or partly written) NRHOStateStore without reading it
+    into memory. Returns (times_et (N,), {(center, body): (N, 6) states}) for the
+    rows of completed chunks.
+    """
+    directory = os.path.abspath(directory)
+    with open(os.path.join(directory, 'manifest.json')) as f:
+        manifest = json.load(f)
+    config = manifest['config']
+    rows = min(manifest['chunks_done'] * config['chunk_size'], config['rows'])
+
+    times_et = np.load(os.path.join(directory, 'times_et.npy'), mmap_mode='r')[:rows]
+    states = {(center, body): np.load(os.path.join(directory, product_file(center, body)),
+                                      mmap_mode='r')[:rows]
+              for center, body in config['products']}
+    return times_et, states
+
+# --- Main Execution ---
+if __name__ == "__main__":
+
+    # Whole kernel coverage (about 15 years) every 10 minutes
+    STEP_SECONDS = 600.0
+    OUTPUT_DIR = 'nrho_states'
+
+    write_nrho_states(OUTPUT_DIR, step_seconds=STEP_SECONDS)
+
+    times_et, states = open_nrho_states(OUTPUT_DIR)
+    r_dsg_moon = np.linalg.norm(states[('MOON', 'DSG')][:, :3], axis=1)
+    print(f"{len(times_et)} epochs, DSG distance from the Moon "
+          f"{np.nanmin(r_dsg_moon):.0f} to {np.nanmax(r_dsg_moon):.0f} km")
+
+    GATEWAY_KERNELS.unload()
@@ -0,0 +1,219 @@
+import numpy as np
+
+def merge_intervals(starts, ends, tolerance=0.0):
+    """
+    Union of intervals, sorted by start: (K, 2) array of disjoint [start, end] rows.
+    Intervals less than `tolerance` seconds apart are merged.
+    """
+    order = np.argsort(starts, kind='stable')
+    starts, ends = np.asarray(starts, dtype=float)[order], np.asarray(ends, dtype=float)[order]
+    if len(starts) == 0:
+        return np.empty((0, 2))
+
+    # A new union interval starts wherever a start lies beyond every earlier end
+    reach = np.maximum.accumulate(ends)
+    new = np.concatenate(([True], starts[1:] > reach[:-1] + tolerance))
+    group = np.cumsum(new) - 1
+    merged_ends = np.full(group[-1] + 1, -np.inf)
+    np.maximum.at(merged_ends, group, ends)
+    return np.column_stack([starts[new], merged_ends])
+
+class ContactIndex:
+    """
+    Sorted-endpoint index over the contact windows of several stations.
+
+    Each station's windows are disjoint, so sorting them by start also sorts their ends,
+    and "is station s in contact at t" is one binary search. The union of all stations'
+    windows is precomputed the same way, so point queries, range queries and coverage
+    gaps all cost O(log n) plus the size of the answer, however long the span is.
+
+    Build it from VisibilityResult.intervals(), NetworkVisibility.contact_windows(),
+    LinkAvailability.link_windows() or calculate_visibility_windows() output:
+
+        index = ContactIndex.from_windows(visibility_data.intervals(), tolerance=step)
+
+    tolerance (seconds) bridges gaps up to one sample step, since sampled windows run
+    from the first to the last visible sample and neighbouring windows can be a step apart.
+    """
+
+    def __init__(self, stations, starts, ends, tolerance=0.0):
+        self.stations = list(stations)
+        self.starts = [np.asarray(s, dtype=float) for s in starts] # one sorted array per station
+        self.ends = [np.asarray(e, dtype=float) for e in ends]
+        self.tolerance = tolerance
+        self.union = merge_intervals(np.concatenate(self.starts + [np.empty(0)]),
+                                     np.concatenate(self.ends + [np.empty(0)]), tolerance)
+
+        # All windows in start order, with the running maximum end (and which window
+        # reaches it) for the handover scheduler
+        all_starts = np.concatenate(self.starts + [np.empty(0)])
+        all_ends = np.concatenate(self.ends + [np.empty(0)])
+        all_station = np.concatenate([np.full(len(s), i) for i, s in enumerate(self.starts)] + [np.empty(0, int)])
+        order = np.argsort(all_starts, kind='stable')
+        self._starts = all_starts[order]
+        self._ends = all_ends[order]
+        self._station = all_station[order].astype(int)
+        self._reach = np.maximum.accumulate(self._ends) if len(order) else self._ends
+        # Index of the window that achieves the running maximum end
+        is_new_max = np.concatenate(([True], self._ends[1:] > self._reach[:-1])) if len(order) else np.empty(0, bool)
+        self._reach_index = np.maximum.accumulate(np.where(is_new_max, np.arange(len(order)), 0))
+
+    @classmethod
+    def from_windows(cls, windows, tolerance=0.0):
+        """
+        Index of {station: windows}, where windows are rows starting with [start_et, end_et, ...].
+        """
+        stations, starts, ends = [], [], []
+        for station, rows in windows.items():
+            rows = np.asarray(rows, dtype=float)
+            rows = rows.reshape(len(rows), -1) if rows.size else np.empty((0, 2))
+            rows = rows[np.argsort(rows[:, 0], kind='stable')]
+            stations.append(station)
+            starts.append(rows[:, 0])
+            ends.append(rows[:, 1])
+        return cls(stations, starts, ends, tolerance)
+
+    def __len__(self):
+        return sum(len(s) for s in self.starts)
+
+    # --- Point and range queries ---
+
+    def stations_at(self, times_et):
+        """
+        Boolean (S, N) array: which stations are in contact at each epoch.
+        A single epoch gives an (S,) array.
+        """
+        times_et = np.asarray(times_et, dtype=float)
+        masks = []
+        for starts, ends in zip(self.starts, self.ends):
+            k = np.searchsorted(starts, times_et, side='right') - 1
+            masks.append((k >= 0) & (times_et <= ends[np.maximum(k, 0)]) if len(starts) else
+                         np.zeros(times_et.shape, dtype=bool))
+        return np.array(masks)
+
+    def visible_stations(self, et):
+        """
+        Names of the stations in contact at one epoch.
+        """
+        return [station for station, visible in zip(self.stations, self.stations_at(et)) if visible]
+
+    def windows_between(self, et_start, et_end):
+        """
+        {station: (K, 2) array} of every window overlapping [et_start, et_end] (not clipped).
+        """
+        result = {}
+        for station, starts, ends in zip(self.stations, self.starts, self.ends):
+            # Ends are sorted too, so both bounds are binary searches
+            first = np.searchsorted(ends, et_start, side='left')
+            last = np.searchsorted(starts, et_end, side='right')
+            result[station] = np.column_stack([starts[first:last], ends[first:last]])
+        return result
+
+    def covered(self, times_et):
+        """
+        True where at least one station is in contact (gaps up to tolerance count as covered).
+        """
+        times_et = np.asarray(times_et, dtype=float)
+        if len(self.union) == 0:
+            return np.zeros(times_et.shape, dtype=bool)
+        k = np.searchsorted(self.union[:, 0], times_et, side='right') - 1
+        return (k >= 0) & (times_et <= self.union[np.maximum(k, 0), 1])
+
+    def coverage_gaps(self, et_start, et_end, min_gap=0.0):
+        """
+        (K, 2) array of the stretches of [et_start, et_end] with no station in contact,
+        keeping only gaps longer than min_gap seconds.
+        """
+        first = np.searchsorted(self.union[:, 1], et_start, side='left')
+        last = np.searchsorted(self.union[:, 0], et_end, side='right')
+        covered = self.union[first:last]
+
+        gap_starts = np.concatenate(([et_start], covered[:, 1]))
+        gap_ends = np.concatenate((covered[:, 0], [et_end]))
+        gaps = np.column_stack([gap_starts, gap_ends])
+        return gaps[gaps[:, 1] - gaps[:, 0] > min_gap]
+
+    # --- Handover scheduling ---
+
+    def handover_schedule(self, et_start, et_end):
+        """
+        Continuous coverage plan with the fewest handovers: a list of
+        (station, start_et, end_et) passes covering every covered moment of [et_start, et_end].
+
+        Greedy interval cover, which is optimal here: from the current time, stay with
+        the station whose window reaches furthest among those already in contact; when
+        it ends, hand over to the one that then reaches furthest. The running maximum
+        end over windows in start order makes each choice one binary search, so a
+        multi-year plan takes milliseconds. Handovers happen in the middle of the
+        overlap of the two windows (or at the old window's end when they only touch
+        within tolerance). A single-sample window (start == end) becomes a
+        zero-length pass, since covered() counts that epoch as covered.
+        """
+        plan = []
+        t = et_start
+        while t <= et_end:
+            # Windows already started (allowing the tolerance); the furthest-reaching one
+            k = np.searchsorted(self._starts, t + self.tolerance, side='right') - 1
+            # A window ending exactly at t still needs a pass unless the plan covers t
+            covered_until = plan[-1][2] if plan else -np.inf
+            if k < 0 or self._reach[k] < t or (self._reach[k] == t and covered_until >= t):
+                # Nobody in contact beyond t: jump to the next window start
+                nxt = np.searchsorted(self._starts, t, side='right')
+                if nxt >= len(self._starts) or self._starts[nxt] > et_end:
+                    break
+                t = self._starts[nxt]
+                continue
+
+            w = self._reach_index[k]
+            station = self.stations[self._station[w]]
+            start, end = max(t, self._starts[w]), min(self._ends[w], et_end)
+            continuing = plan and plan[-1][2] >= t - self.tolerance
+            if continuing and plan[-1][0] == station:
+                # Same station again (within tolerance): extend its pass
+                plan[-1] = (station, plan[-1][1], end)
+            elif continuing and plan[-1][2] > self._starts[w]:
+                # Overlapping windows: hand over in the middle of the overlap
+                handover = 0.5 * (max(plan[-1][1], self._starts[w]) + plan[-1][2])
+                plan[-1] = (plan[-1][0], plan[-1][1], handover)
+                plan.append((station, handover, end))
+            else:
+                plan.append((station, start, end))
+            t = self._ends[w]
+        return plan
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    import time
+
+    from jwst_visibility import JWST_KERNELS, calculate_visibility
+    from spice_tools.time_scale import et_to_iso
+
+    UTC_START = '2025-06-01'
+    UTC_END = '2025-12-31'
+    TIME_STEPS = 30000
+
+    positions_T, visibility_data, times_utc, visibility_flags = calculate_visibility(UTC_START, UTC_END, TIME_STEPS)
+
+    if visibility_data is not None:
+        times_et = visibility_data.times_et
+        step = times_et[1] - times_et[0]
+        index = ContactIndex.from_windows(visibility_data.intervals(), tolerance=step)
+        print(f"{len(index)} contact windows indexed")
+
+        with JWST_KERNELS:
+            t = times_et[len(times_et) // 2]
+            print(f"In contact at {et_to_iso(t, unit='s')}: {index.visible_stations(t)}")
+
+            gaps = index.coverage_gaps(times_et[0], times_et[-1], min_gap=step)
+            print(f"{len(gaps)} coverage gaps, {np.sum(gaps[:, 1] - gaps[:, 0]) / 3600:.1f} h in total")
+
+            start = time.perf_counter()
+            plan = index.handover_schedule(times_et[0], times_et[-1])
+            handovers = sum(1 for before, after in zip(plan, plan[1:]) if before[0] != after[0])
+            print(f"Handover plan: {len(plan)} passes, {handovers} handovers "
+                  f"({1000 * (time.perf_counter() - start):.1f} ms)")
+            for station, pass_start, pass_end in plan[:10]:
+                start_utc, end_utc = et_to_iso(np.array([pass_start, pass_end]), unit='s')
+                print(f"  {station:<10} {start_utc}  ->  {end_utc}")
+
+        JWST_KERNELS.unload()
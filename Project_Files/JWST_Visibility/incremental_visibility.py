@@ -0,0 +1,209 @@
+import os
+import json
+import hashlib
+
+import spiceypy as spice
+import numpy as np
+
+from jwst_visibility import (
+    DSN_STATIONS, JWST_KERNELS, MIN_ELEVATION_DEG, STATION_ABCORR, calculate_visibility_block,
+    lookup_body_id, visibility_flags_from
+)
+from visibility_result import StationTrack, VisibilityResult
+from spice_tools.kernel_fingerprint import KernelFingerprints
+from spice_tools.time_scale import et_to_datetime64
+
+# Results are stored in one file per day of epochs
+SEGMENT_SECONDS = 86400.0
+
+# Light-time corrected geometry looks a few seconds before each epoch, so a
+# segment's fingerprint also covers a minute before its first epoch
+LIGHT_TIME_MARGIN = 60.0
+
+class IncrementalVisibility:
+    """
+    Time-indexed visibility store that only computes what it does not have yet.
+
+    Epochs lie on one fixed grid, J2000 + i * step_seconds, cut into segments of
+    segment_seconds. Each segment is saved as its own .npz file together with a
+    fingerprint of the kernel data that overlaps its time range (see KernelFingerprints).
+    update() computes the segments that are missing or whose fingerprint changed,
+    so moving UTC_END forward by a day costs one segment, and a new jwst_pred.bsp
+    only recomputes the days whose ephemeris changed. Stores for different stations,
+    cadences, elevation masks or aberration corrections live side by side in their
+    own subdirectories.
+    """
+
+    def __init__(self, directory, step_seconds=600.0, stations=tuple(DSN_STATIONS),
+                 segment_seconds=SEGMENT_SECONDS):
+        rows = segment_seconds / step_seconds
+        if rows != int(rows):
+            raise ValueError(f"step_seconds must divide segment_seconds ({segment_seconds} s)")
+
+        self.step_seconds = float(step_seconds)
+        self.segment_seconds = float(segment_seconds)
+        self.rows_per_segment = int(rows)
+        self.stations = list(stations)
+
+        # Everything besides the kernels that changes the stored results
+        config = {'step_seconds': self.step_seconds, 'segment_seconds': self.segment_seconds,
+                  'stations': self.stations, 'min_elevation_deg': MIN_ELEVATION_DEG,
+                  'abcorr': STATION_ABCORR}
+        config_key = hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:16]
+
+        root = os.path.abspath(directory)
+        self.directory = os.path.join(root, config_key)
+        os.makedirs(os.path.join(self.directory, 'segments'), exist_ok=True)
+        self.manifest_path = os.path.join(self.directory, 'manifest.json')
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {'config': config, 'segments': {}}
+
+        # Kernel hashes are shared by every configuration under the same root
+        self.fingerprints = KernelFingerprints(os.path.join(root, 'kernel_hashes.json'))
+
+    # --- Grid ---
+
+    def segment_times(self, k):
+        """
+        The epochs of segment k (integer grid offsets, so segments line up exactly).
+        """
+        first = k * self.rows_per_segment
+        return self.step_seconds * (first + np.arange(self.rows_per_segment))
+
+    def segments_for(self, et_start, et_end):
+        """
+        Indices of the segments holding the grid epochs in [et_start, et_end].
+        """
+        return range(int(np.floor(et_start / self.segment_seconds)),
+                     int(np.floor(et_end / self.segment_seconds)) + 1)
+
+    def _segment_path(self, k):
+        return os.path.join(self.directory, 'segments', f'{k}.npz')
+
+    # --- Updating ---
+
+    def update(self, utc_start, utc_end, cache=None):
+        """
+        Makes sure every segment between utc_start and utc_end is computed with the
+        currently loaded kernels. Returns counts of computed, reused and invalidated segments.
+        """
+        stats = {'computed': 0, 'reused': 0, 'invalidated': 0}
+
+        with JWST_KERNELS:
+            et_start = spice.str2et(utc_start)
+            et_end = spice.str2et(utc_end)
+
+            JWST_ID = lookup_body_id('JWST', '-170')
+            SUN_EARTH_BARYCENTER_ID = lookup_body_id('SUN_EARTH_BARYCENTER', '3')
+
+            for k in self.segments_for(et_start, et_end):
+                times_et = self.segment_times(k)
+                fingerprint = self.fingerprints.range_fingerprint(times_et[0] - LIGHT_TIME_MARGIN, times_et[-1])
+
+                entry = self.manifest['segments'].get(str(k))
+                if entry is not None and entry['fingerprint'] == fingerprint \
+                        and os.path.exists(self._segment_path(k)):
+                    stats['reused'] += 1
+                    continue
+                if entry is not None:
+                    stats['invalidated'] += 1
+
+                positions_T, visibility_data = calculate_visibility_block(
+                    times_et, JWST_ID, SUN_EARTH_BARYCENTER_ID, cache=cache, stations=self.stations
+                )
+                self._write_segment(k, times_et, positions_T, visibility_data, fingerprint)
+                stats['computed'] += 1
+
+        self.fingerprints.save()
+        return stats
+
+    def _write_segment(self, k, times_et, positions_T, visibility_data, fingerprint):
+        columns = {'times_et': times_et, 'positions': np.asarray(positions_T, dtype=np.float64).T}
+        for station in self.stations:
+            track = visibility_data[station]
+            columns[f'{station}.az'] = track.az_deg
+            columns[f'{station}.el'] = track.el_deg
+            columns[f'{station}.range'] = track.range_km
+            columns[f'{station}.visible'] = track.visible
+
+        # Write the segment, then the manifest, both atomically, so an interrupted
+        # update never leaves a segment that looks valid but isn't
+        path = self._segment_path(k)
+        tmp_path = path + f'.{os.getpid()}.tmp.npz'
+        np.savez(tmp_path, **columns)
+        os.replace(tmp_path, path)
+
+        self.manifest['segments'][str(k)] = {'fingerprint': fingerprint}
+        tmp_path = self.manifest_path + f'.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    # --- Reading ---
+
+    def load(self, utc_start, utc_end):
+        """
+        Reads the stored grid epochs between utc_start and utc_end. Returns the same
+        (positions_T, visibility_data, times_utc, visibility_flags) as calculate_visibility.
+        Contact windows that cross segment boundaries come out as one interval.
+        """
+        with JWST_KERNELS:
+            et_start = spice.str2et(utc_start)
+            et_end = spice.str2et(utc_end)
+
+        parts = []
+        for k in self.segments_for(et_start, et_end):
+            if str(k) not in self.manifest['segments']:
+                raise KeyError(f"Segment {k} is not in the store; run update() for this span first")
+            with np.load(self._segment_path(k)) as segment:
+                keep = (segment['times_et'] >= et_start) & (segment['times_et'] <= et_end)
+                parts.append({name: segment[name][keep] for name in segment.files})
+
+        times_et = np.concatenate([part['times_et'] for part in parts])
+        tracks = {}
+        for station in self.stations:
+            tracks[station] = StationTrack(
+                station, times_et,
+                np.concatenate([part[f'{station}.az'] for part in parts]),
+                np.concatenate([part[f'{station}.el'] for part in parts]),
+                np.concatenate([part[f'{station}.range'] for part in parts]),
+                np.concatenate([part[f'{station}.visible'] for part in parts])
+            )
+        visibility_data = VisibilityResult(times_et, tracks)
+        positions_T = np.concatenate([part['positions'] for part in parts]).T
+
+        with JWST_KERNELS:
+            times_utc = et_to_datetime64(times_et)
+
+        return positions_T, visibility_data, times_utc, visibility_flags_from(visibility_data)
+
+def calculate_visibility_incremental(utc_start, utc_end, step_seconds, directory, cache=None):
+    """
+    Incremental version of calculate_visibility on a step_seconds grid: computes the
+    segments the store at `directory` is missing, then returns the whole span from it.
+    """
+    store = IncrementalVisibility(directory, step_seconds)
+    stats = store.update(utc_start, utc_end, cache)
+    print(f"{stats['computed']} segments computed ({stats['invalidated']} after a kernel change), "
+          f"{stats['reused']} reused")
+    return store.load(utc_start, utc_end)
+
+# --- Main Execution ---
+if __name__ == "__main__":
+
+    UTC_START = '2025-06-01'
+    UTC_END = '2025-12-31' # move forward daily; only the new days are computed
+    STEP_SECONDS = 600.0
+    STORE_DIR = 'visibility_increments'
+
+    positions_T, visibility_data, times_utc, visibility_flags = calculate_visibility_incremental(
+        UTC_START, UTC_END, STEP_SECONDS, STORE_DIR
+    )
+    for station, intervals in visibility_data.intervals().items():
+        print(f"{station}: {len(intervals)} windows, "
+              f"{visibility_data[station].total_contact_time() / 3600:.1f} h of contact")
+
+    JWST_KERNELS.unload()
@@ -1,17 +1,208 @@
+import os
+import sys
+
 import spiceypy as spice
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 from matplotlib.patches import Patch
 
-def calculate_visibility(utc_start, utc_end, steps):
+# Shared helpers live one directory up in Project_Files/spice_tools
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from spice_tools.parallel import run_time_sharded
+from spice_tools.kernel_session import kernel_session
+from spice_tools.ephemeris_cache import EphemerisCache
+from spice_tools.chebyshev_surrogate import build_chebyshev_surrogate, spkpos_sampler
+from spice_tools.rotating_frame import rotating_frame_matrices, rotate_vectors
+from spice_tools.lod_plot import plot_flagged_path_3d
+from spice_tools.instrumentation import count_exception, instrumented, stage
+from spice_tools.coverage import coverage_report, covered_ephemeris
+from spice_tools.time_scale import et_to_datetime64
+
+from visibility_result import VisibilityResult
+
+# Absolute path to the meta-kernel, used by worker processes in parallel mode
+META_KERNEL = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'jwst_meta.txt')
+
+# Process-wide handle on jwst_meta.txt, shared by every function that needs kernels
+JWST_KERNELS = kernel_session(META_KERNEL)
+
+# DSN antennas used for visibility: name -> (topocentric frame, NAIF station ID)
+DSN_STATIONS = {
+    'Goldstone': ('DSS-14_TOPO', '399014'), 
+    'Madrid':    ('DSS-63_TOPO', '399063'), 
+    'Canberra':  ('DSS-43_TOPO', '399043')  
+}
+
+MIN_ELEVATION_DEG = 0.0
+
+# Aberration correction of the station-to-target geometry
+STATION_ABCORR = 'LT+S'
+
+def lookup_body_id(name, default):
+    """
+    NAIF ID (as a string) for a body name, falling back to `default` when the
+    loaded kernels do not define the name.
+    """
+    try:
+        return str(spice.bodn2c(name))
+    except:
+        print(f"ID not found in loaded kernels for '{name}'. defaulting to {default}.")
+        return default
+
+@instrumented('recrad_batch')
+def recrad_batch(positions):
+    """
+    Vectorized version of spice.recrad for an (N, 3) array of rectangular vectors.
+    Returns range, azimuth (0 to 2pi) and elevation (-pi/2 to pi/2) arrays.
+    """
+    positions = np.asarray(positions, dtype=float)
+
+    # Scale by the largest component first, the same way SPICE does, so the
+    # results match spice.recrad to floating-point rounding
+    big = np.max(np.abs(positions), axis=1, keepdims=True)
+    scaled = positions / np.where(big > 0.0, big, 1.0)
+    x, y, z = scaled[:, 0], scaled[:, 1], scaled[:, 2]
+
+    ranges = big[:, 0] * np.sqrt(x * x + y * y + z * z)
+    az_rad = np.arctan2(y, x)
+    az_rad = np.where(az_rad < 0.0, az_rad + 2.0 * np.pi, az_rad) # recrad wraps into [0, 2pi)
+    el_rad = np.arctan2(z, np.sqrt(x * x + y * y))
+
+    return ranges, az_rad, el_rad
+
+def ephemeris_or_nan(routine, targ, times_et, ref, abcorr, obs, cache=None):
+    """
+    Calls spkezr or spkpos (named by `routine`) for a whole array of epochs and
+    returns an (N, 6) or (N, 3) array. Epochs SPICE cannot evaluate are left as NaN,
+    so the result always lines up with times_et.
+    Pass an EphemerisCache as `cache` to reuse results from earlier runs.
+    """
+    times_et = np.atleast_1d(np.asarray(times_et, dtype=float))
+
+    # Stages are named after the routine and correction, e.g. 'spkezr LT+S'
+    with stage(f"{routine} {abcorr}"):
+        try:
+            # TEACHING NOTE: Epochs outside the SPK coverage of targ or obs are masked out
+            # (as NaN) before calling SPICE, so the batched call normally never raises.
+            return covered_ephemeris(routine, targ, times_et, ref, abcorr, obs, cache)
+        except Exception:
+            count_exception(f"{routine} batch failed")
+
+        # Something besides SPK coverage failed (e.g. missing Earth orientation data),
+        # so fall back to one epoch at a time and leave the failed samples as NaN.
+        values = np.full((len(times_et), 6 if routine == 'spkezr' else 3), np.nan)
+        for i, t in enumerate(times_et):
+            try:
+                values[i], _ = getattr(spice, routine)(targ, t, ref, abcorr, obs)
+            except Exception:
+                count_exception(f"{routine} epoch failed")
+        return values
+
+def calculate_station_geometry(target_id, times_et, station_frame, station_id, abcorr=STATION_ABCORR, cache=None):
+    """
+    Calculates range, azimuth and elevation of a target from one DSN station
+    over a whole array of epochs. Epochs SPICE cannot evaluate are returned as NaN.
+    Pass an EphemerisCache as `cache` to reuse states from earlier runs.
+    """
+    # 'LT+S' corrects for Light Time and Stellar Aberration
+    states = ephemeris_or_nan('spkezr', target_id, times_et, station_frame, abcorr, station_id, cache)
+    return recrad_batch(states[:, :3])
+
+def build_station_surrogates(target_id, et_start, et_end, tolerance_km=0.1, abcorr=STATION_ABCORR):
+    """
+    Fits a Chebyshev surrogate of the topocentric target position for every DSN station.
+    Each surrogate is checked against SPICE to within tolerance_km; evaluate it at any
+    epochs in the span and pass the positions to recrad_batch for range/azimuth/elevation.
+    """
+    surrogates = {}
+    for station_name, (station_frame, station_id) in DSN_STATIONS.items():
+        sampler = spkpos_sampler(target_id, station_frame, abcorr, station_id)
+        surrogates[station_name] = build_chebyshev_surrogate(sampler, et_start, et_end, tolerance_km)
+        print(f"{station_name}: {len(surrogates[station_name].max_errors)} segments, "
+              f"max fit error {surrogates[station_name].max_error:.3g} km")
+    return surrogates
+
+def calculate_visibility_block(times_et, jwst_id, observer_id, cache=None, stations=None):
+    """
+    Calculates JWST positions (3, N) and the per-station VisibilityResult for one
+    block of epochs, without any datetime conversion. Kernels must already be loaded.
+    `stations` is a list of DSN_STATIONS names to include (default: all of them).
+    """
+    # --- JWST Position for 3D Orbit Plot ---
+    # Position from observer to target; epochs outside JWST's SPK coverage come back as NaN
+    positions = ephemeris_or_nan('spkpos', jwst_id, times_et, 'J2000', 'NONE', observer_id, cache)
+
+    # --- DSN Visibility Windows ---
+    station_geometry = {}
+    for station_name in (stations or DSN_STATIONS):
+        station_frame, station_id = DSN_STATIONS[station_name]
+        # TEACHING NOTE: Instead of asking SPICE for one epoch at a time, we hand it
+        # the whole times_et array and get range/azimuth/elevation arrays back.
+        station_geometry[station_name] = calculate_station_geometry(
+            jwst_id, times_et, station_frame, station_id, cache=cache
+        )
+
+    # Per-station columns (et, az, el, range) plus the visible mask for each station
+    visibility_data = VisibilityResult.from_arrays(times_et, station_geometry, MIN_ELEVATION_DEG)
+
+    return np.asarray(positions).T, visibility_data
+
+def calculate_visibility_chunk(times_et, jwst_id, observer_id, cache=None):
+    """
+    Calculates JWST positions, visible samples and visibility flags for one block of epochs.
+    Kernels must already be loaded. Serial runs pass the whole span as a single block,
+    parallel runs hand one block to each worker process.
+    """
+    # TEACHING NOTE: One vectorized leap-second lookup converts the whole block to a
+    # datetime64 array, instead of building a Python datetime object per epoch.
+    with stage('et_to_datetime64'):
+        times_utc = et_to_datetime64(times_et)
+
+    positions_T, visibility_data = calculate_visibility_block(times_et, jwst_id, observer_id, cache)
+
+    return positions_T, visibility_data, times_utc, visibility_flags_from(visibility_data)
+
+def visibility_flags_from(visibility_data):
+    """
+    Integer flag per time step for the 3D plots: 0 = not visible, otherwise the
+    color code of the first station in DSN_STATIONS order that sees JWST.
+    """
+    visibility_flags = np.zeros(len(visibility_data.times_et), dtype=int) # 0 = Not visible
+    station_colors = {'Goldstone': 1, 'Madrid': 2, 'Canberra': 3} # For 3D plot
+
+    for station_name in visibility_data:
+        visible = visibility_data[station_name].visible
+        visibility_flags[visible & (visibility_flags == 0)] = station_colors[station_name]
+
+    return visibility_flags
+
+def merge_visibility_chunks(chunks):
+    """
+    Joins the per-block results of calculate_visibility_chunk (in time order)
+    back into the structures returned by calculate_visibility.
+    """
+    positions_T = np.concatenate([chunk[0] for chunk in chunks], axis=1)
+    visibility_data = VisibilityResult.concatenate([chunk[1] for chunk in chunks])
+    times_utc = np.concatenate([chunk[2] for chunk in chunks])
+    visibility_flags = np.concatenate([chunk[3] for chunk in chunks])
+
+    return positions_T, visibility_data, times_utc, visibility_flags
+
+@instrumented('calculate_visibility')
+def calculate_visibility(utc_start, utc_end, steps, workers=None, cache=None):
     """
     Calculates JWST orbit, DSN visibility windows, and visibility flags for plotting.
+    With workers > 1 the time span is split into blocks that run in parallel processes.
+    Pass an EphemerisCache as `cache` to skip SPICE for ephemerides computed before.
     """
     
     # --- Step 1: Setup and Load Kernels ---
+    # The kernel session resolves jwst_meta.txt next to this file, loads it the first
+    # time it is needed and keeps it loaded for later calls in the same process.
     try:
-        spice.furnsh('jwst_meta.txt')
+        with stage('kernel acquire'):
+            JWST_KERNELS.acquire()
         # The jwst_meta.txt file should list all required SPICE kernels, listed below:
         # KERNELS_TO_LOAD=(
         # 'naif0012.tls',                 Provides leap seconds              'https://naif.jpl.nasa.gov/pub/naif/generic_kernels/lsk/naif0012.tls',       
@@ -27,111 +218,50 @@ def calculate_visibility(utc_start, utc_end, steps):
         print("Please ensure jwst_meta.txt and all kernel files (.bsp, .tf, .tls) are in the same directory.")
         return None, None, None, None
 
-    # --- Step 2: Define Time Window and Targets ---
-    et_start = spice.str2et(utc_start)
-    et_end = spice.str2et(utc_end)
-    
-    times_et = np.linspace(et_start, et_end, steps)
-    times_utc = [spice.et2datetime(t) for t in times_et]
-
-    # Define NAIF IDs from https://naif.jpl.nasa.gov/pub/naif/toolkit_docs/C/req/naif_ids.html
-    # JWST_ID = '-170'
-    try:
-        JWST_ID = str(spice.bodn2c('JWST')) # JWST NAIF ID using bodn2c which maps names to IDs
-    except:
-        print("ID not found in loaded kernels for 'JWST'. defaulting to -170.")
-        JWST_ID = '-170'
-    # SUN_EARTH_BARYCENTER_ID = '3'
     try:
-        SUN_EARTH_BARYCENTER_ID = str(spice.bodn2c('SUN_EARTH_BARYCENTER'))
-    except:
-        print("ID not found in loaded kernels for 'SUN_EARTH_BARYCENTER'. defaulting to 3.")
-        SUN_EARTH_BARYCENTER_ID = '3'
-    # EARTH_ID = '399'
-    try:
-        EARTH_ID = str(spice.bodn2c('EARTH'))
-    except:
-        print("ID not found in loaded kernels for 'EARTH'. defaulting to 399.")
-        EARTH_ID = '399'
-
-    DSN_STATIONS = {
-        'Goldstone': ('DSS-14_TOPO', '399014'), 
-        'Madrid':    ('DSS-63_TOPO', '399063'), 
-        'Canberra':  ('DSS-43_TOPO', '399043')  
-    }
+        # --- Step 2: Define Time Window and Targets ---
+        with stage('str2et'):
+            et_start = spice.str2et(utc_start)
+            et_end = spice.str2et(utc_end)
     
-    MIN_ELEVATION_DEG = 0.0
-    MIN_ELEVATION_RAD = np.deg2rad(MIN_ELEVATION_DEG)
+        times_et = np.linspace(et_start, et_end, steps)
 
-    # --- Step 3: Calculate JWST Position for 3D Orbit Plot ---
-    try:
-        positions, _ = spice.spkpos( # Returns position and light time from target to observer
-            targ=JWST_ID,
-            et=times_et,
-            ref='J2000',
-            abcorr='NONE',
-            obs=SUN_EARTH_BARYCENTER_ID
-        )
-        positions_T = positions.T
-    except Exception as e:
-        print(f"Error calculating JWST orbit position: {e}")
-        spice.kclear()
-        return None, None, None, None
+        # Define NAIF IDs from https://naif.jpl.nasa.gov/pub/naif/toolkit_docs/C/req/naif_ids.html
+        # JWST_ID = '-170', SUN_EARTH_BARYCENTER_ID = '3', EARTH_ID = '399'
+        JWST_ID = lookup_body_id('JWST', '-170')
+        SUN_EARTH_BARYCENTER_ID = lookup_body_id('SUN_EARTH_BARYCENTER', '3')
+        EARTH_ID = lookup_body_id('EARTH', '399')
 
-    # --- Step 4: Calculate DSN Visibility Windows ---
-    
-    visibility_data = {station: [] for station in DSN_STATIONS} # List of visible times per station
-    visibility_flags = np.zeros(steps, dtype=int) # 0 = Not visible
-    station_colors = {'Goldstone': 1, 'Madrid': 2, 'Canberra': 3} # For 3D plot
-    
-    print(f"Calculating visibility for {steps} time steps...")
+        # Epochs outside the JWST kernel's coverage are reported once here and masked as gaps
+        report = coverage_report(JWST_ID, SUN_EARTH_BARYCENTER_ID, times_et)
+        if not report:
+            print(report)
 
-    for i, t in enumerate(times_et):
-        is_visible_at_this_time = False
-        
-        for station_name, (station_frame, station_id) in DSN_STATIONS.items():
-            try:
-                # TEACHING NOTE: spkezr calculates the state (position + velocity) 
-                # of a target (JWST) relative to an observer (DSN Station)
-                # 'LT+S' corrects for Light Time and Stellar Aberration
-                state, lt = spice.spkezr(
-                    targ=JWST_ID,
-                    et=t,
-                    ref=station_frame, # Topocentric frame (Z is up, X is North)
-                    abcorr='LT+S',
-                    obs=station_id
+        # --- Step 3 & 4: Calculate JWST Position and DSN Visibility Windows ---
+        print(f"Calculating visibility for {steps} time steps...")
+
+        try:
+            if workers and workers > 1:
+                # Each worker process loads its own kernels once and handles blocks of epochs
+                chunks = run_time_sharded(
+                    calculate_visibility_chunk, times_et, META_KERNEL, workers=workers,
+                    args=(JWST_ID, SUN_EARTH_BARYCENTER_ID, cache)
                 )
-                
-                # Extract position (x, y, z) from state vector
-                position_topo = state[:3] 
-                
-                # Convert rectangular coordinates (x, y, z) to range, azimuth, elevation
-                r, az_rad, el_rad = spice.recrad(position_topo) 
-                
-                # SPICE returns azimuth in radians (0 to 2pi). 
-                # SPICE 'lat' is elevation (-pi/2 to pi/2).
-                
-                if el_rad > MIN_ELEVATION_RAD:
-                    # Store data for Sky Plot: (Time, Azimuth in Deg, Elevation in Deg)
-                    # Note: We convert to degrees here for easier plotting later
-                    visibility_data[station_name].append(
-                        (times_utc[i], np.rad2deg(az_rad), np.rad2deg(el_rad))
-                    )
-                    
-                    if not is_visible_at_this_time:
-                        visibility_flags[i] = station_colors[station_name]
-                        is_visible_at_this_time = True
-                        
-            except Exception as e:
-                # uncomment the line below for detailed debugging
-                # print(f"Error for {station_name} at {spice.et2utc(t, 'C', 0)}: {e}")
-                pass
-                
-    
-    print("Calculation complete.")
-    return positions_T, visibility_data, times_utc, visibility_flags
+            else:
+                chunks = [calculate_visibility_chunk(times_et, JWST_ID, SUN_EARTH_BARYCENTER_ID, cache)]
+        except Exception as e:
+            print(f"Error calculating JWST orbit position: {e}")
+            return None, None, None, None
 
-def plot_orbit_3d(positions_T, visibility_flags):
+        positions_T, visibility_data, times_utc, visibility_flags = merge_visibility_chunks(chunks)
+
+        print("Calculation complete.")
+        return positions_T, visibility_data, times_utc, visibility_flags
+    finally:
+        JWST_KERNELS.release()
+
+@instrumented('plot_orbit_3d')
+def plot_orbit_3d(positions_T, visibility_flags, filename="jwst_orbit_3d.jpg"):
     """
     Generates a 3D plot of the JWST halo orbit, color-coded by DSN visibility.
     """
@@ -155,10 +285,16 @@ def plot_orbit_3d(positions_T, visibility_flags):
         3: 'Visible (Canberra)'
     }
     
-    # Map flags to colors for plotting
-    plot_colors = [colors_map.get(flag, 'red') for flag in visibility_flags]
+    # Limits first: the level-of-detail path decimates points in screen space
+    max_range = np.nanmax(np.abs(positions_T))
+    ax.set_xlim([-max_range, max_range])
+    ax.set_ylim([-max_range, max_range])
+    ax.set_zlim([-max_range, max_range])
 
-    ax.scatter(positions_T[0], positions_T[1], positions_T[2], c=plot_colors, s=2)
+    # TEACHING NOTE: Instead of one colored marker per sample, the orbit is drawn as a
+    # few line collections (one per visibility flag) with about one vertex per pixel,
+    # so the render time no longer grows with TIME_STEPS.
+    plot_flagged_path_3d(ax, positions_T.T, visibility_flags, colors_map)
     
     ax.scatter([0], [0], [0], color='red', s=100, label=None)
 
@@ -167,11 +303,6 @@ def plot_orbit_3d(positions_T, visibility_flags):
     ax.set_ylabel('Y (km)', fontsize=12)
     ax.set_zlabel('Z (km)', fontsize=12)
     
-    max_range = np.max(np.abs(positions_T))
-    ax.set_xlim([-max_range, max_range])
-    ax.set_ylim([-max_range, max_range])
-    ax.set_zlim([-max_range, max_range])
-    
     # --- Create custom legend ---
     legend_elements = [
         Patch(facecolor=colors_map[0], label=labels_map[0]),
@@ -184,32 +315,59 @@ def plot_orbit_3d(positions_T, visibility_flags):
     ax.legend(handles=legend_elements)
     
     plt.tight_layout()
-    plt.savefig("jwst_orbit_3d.jpg") # Save the plot
+    plt.savefig(filename) # Save the plot
     plt.close() # Close the figure to save memory
 
-def plot_visibility_timeline(visibility_data, all_times_utc):
+@instrumented('plot_visibility_timeline')
+def plot_visibility_timeline(visibility_data, all_times_utc, annotate=False, filename="jwst_visibility_timeline.jpg"):
     """
     Generates a 2D timeline (Gantt-style) plot of DSN visibility.
-    (This function remains unchanged)
+    Each contact window is one broken_barh bar, so the render cost depends on the
+    number of windows rather than the number of time steps. With annotate=True
+    every bar is labeled with its duration and every gap with its length (hours).
     """
     if visibility_data is None:
         return
 
     print("Generating 2D visibility timeline plot...")
+    all_times_utc = np.asarray(all_times_utc) # datetime64 array from calculate_visibility
     fig, ax = plt.subplots(figsize=(15, 6))
     
     station_names = list(visibility_data.keys())
     colors = {'Goldstone': '#E69F00', 'Madrid': '#56B4E9', 'Canberra': '#009E73'}
 
+    # Each sample covers half a time step on either side, like the old per-sample ticks
+    # (the same convention as StationTrack.total_contact_time)
+    times_et = visibility_data.times_et
+    half_step_days = 0.5 * np.median(np.diff(times_et)) / 86400.0 if len(times_et) > 1 else 0.0
+    span_days = max((times_et[-1] - times_et[0]) / 86400.0, 1e-6)
+    px_per_day = ax.bbox.width / span_days
+
     for i, station in enumerate(station_names):
-        visible_times = visibility_data[station]
-        if not visible_times:
+        # TEACHING NOTE: interval_index comes from a vectorized run-length pass over the
+        # elevation mask, giving the first/last sample of every contact window at once.
+        interval_index = visibility_data[station].interval_index
+        if len(interval_index) == 0:
             print(f"No visible times found for {station}.")
             continue
-            
-        # ax.vlines(visible_times, i - 0.4, i + 0.4, color=colors[station], lw=2, label=station)
-        visible_times_only = [x[0] for x in visible_times]
-        ax.vlines(visible_times_only, i - 0.4, i + 0.4, color=colors[station], lw=2, label=station)
+
+        # Only the window edges are converted to matplotlib dates
+        starts = mdates.date2num(all_times_utc[interval_index[:, 0]]) - half_step_days
+        ends = mdates.date2num(all_times_utc[interval_index[:, 1]]) + half_step_days
+        ax.broken_barh(list(zip(starts, ends - starts)), (i - 0.4, 0.8), facecolors=colors[station], label=station)
+
+        if annotate:
+            # Contact duration centered on each bar, gap length between bars (hours).
+            # Only spans wide enough on screen to hold a label are annotated.
+            min_label_days = 30.0 / px_per_day
+            for start, end in zip(starts, ends):
+                if end - start >= min_label_days:
+                    ax.text(0.5 * (start + end), i, f"{(end - start) * 24:.1f}",
+                            ha='center', va='center', fontsize=7)
+            for gap_start, gap_end in zip(ends[:-1], starts[1:]):
+                if gap_end - gap_start >= min_label_days:
+                    ax.text(0.5 * (gap_start + gap_end), i - 0.45, f"{(gap_end - gap_start) * 24:.1f}",
+                            ha='center', va='top', fontsize=6, color='dimgray')
 
     ax.set_yticks(range(len(station_names)))
     ax.set_yticklabels(station_names, fontsize=12)
@@ -229,10 +387,11 @@ def plot_visibility_timeline(visibility_data, all_times_utc):
     ax.legend(handles, station_names, loc='upper right')
     
     plt.tight_layout()
-    plt.savefig("jwst_visibility_timeline.jpg") # Save the plot
+    plt.savefig(filename) # Save the plot
     plt.close() # Close the figure to save memory
 
-def plot_sky_tracks(visibility_data):
+@instrumented('plot_sky_tracks')
+def plot_sky_tracks(visibility_data, filename="jwst_sky_tracks.jpg"):
     """
     Generates sky plot for each DSN station.
     """
@@ -254,15 +413,15 @@ def plot_sky_tracks(visibility_data):
         axes = [axes] 
 
     for ax, station in zip(axes, station_names):
-        visible_times_data = visibility_data[station]
+        track = visibility_data[station]
         
-        if not visible_times_data:
+        if not track.visible.any():
             ax.set_title(f"{station} (No Visibility)")
             continue
             
-        azimuths_rad = np.deg2rad([item[1] for item in visible_times_data])
-        elevations_deg = [item[2] for item in visible_times_data]
-        co_elevations = 90 - np.array(elevations_deg)
+        azimuths_rad = np.deg2rad(track.az_deg[track.visible])
+        elevations_deg = track.el_deg[track.visible]
+        co_elevations = 90 - elevations_deg
         
         ax.scatter(azimuths_rad, co_elevations, c=colors[station], s=2, label=station)
         
@@ -275,69 +434,92 @@ def plot_sky_tracks(visibility_data):
         ax.set_ylim(0, 90) 
 
     plt.tight_layout()
-    plt.savefig("jwst_sky_tracks.jpg") # Save the plot
+    plt.savefig(filename) # Save the plot
     plt.close() # Close the figure to save memory
 
-def calculate_rotating_frame_data(utc_start, utc_end, steps):
+def calculate_rotating_frame_chunk(times, jwst_id, earth_id, sun_id, cache=None,
+                                   positions_T=None, observer_id=None):
+    """
+    Rotates JWST positions into the Sun-Earth Rotating Frame for one block of epochs.
+    Kernels must already be loaded. If positions_T (JWST relative to observer_id,
+    as returned by calculate_visibility) is given it is reused instead of asking
+    SPICE for JWST again. Epochs SPICE cannot evaluate come back as NaN.
+    """
+    # 1. Get JWST position relative to EARTH
+    # We use Earth as the center of this rotating frame
+    if positions_T is None:
+        pos_jwst_earth = ephemeris_or_nan('spkpos', jwst_id, times, 'J2000', 'NONE', earth_id, cache)
+    else:
+        # JWST - Earth = (JWST - observer) - (Earth - observer)
+        pos_earth_obs = ephemeris_or_nan('spkpos', earth_id, times, 'J2000', 'NONE', observer_id, cache)
+        pos_jwst_earth = np.asarray(positions_T, dtype=float).T - pos_earth_obs
+
+    # 2. Get Earth state relative to SUN to define the rotation
+    # We need velocity to find the orbital plane normal
+    state_earth_sun = ephemeris_or_nan('spkezr', earth_id, times, 'J2000', 'NONE', sun_id, cache)
+
+    with stage('rotating frame transform'):
+        # 3. & 4. Build every rotation matrix at once
+        # X-axis points from Sun to Earth, Z-axis is the orbital plane normal (r x v)
+        transform_matrices = rotating_frame_matrices(state_earth_sun)
+
+        # 5. Apply Rotation
+        # TEACHING NOTE: rotate_vectors multiplies matrix n by vector n for all epochs in
+        # one einsum call, replacing a Python loop of spice.mxv calls.
+        pos_rotated = rotate_vectors(transform_matrices, pos_jwst_earth)
+
+    return pos_rotated[:, 0], pos_rotated[:, 1], pos_rotated[:, 2]
+
+@instrumented('calculate_rotating_frame_data')
+def calculate_rotating_frame_data(utc_start, utc_end, steps, workers=None, cache=None,
+                                  positions_T=None, visibility_data=None):
     """
     Calculates JWST position in a Sun-Earth Rotating Frame (RLP).
     This removes the Earth's orbital motion to reveal the 'Halo' shape.
+    Pass the positions_T and visibility_data returned by calculate_visibility to
+    reuse its epochs and JWST positions, so the arrays line up with visibility_flags.
+    With workers > 1 the time span is split into blocks that run in parallel processes.
     """
     print("Calculating Rotating Frame transformation (Sun-Earth L2)...")
     
-    et_start = spice.str2et(utc_start)
-    et_end = spice.str2et(utc_end)
-    times = np.linspace(et_start, et_end, steps)
-    
-    # Pre-calculate IDs to save time in the loop
-    try:
-        jwst_id = str(spice.bodn2c('JWST'))
-        earth_id = str(spice.bodn2c('EARTH'))
-        sun_id = str(spice.bodn2c('SUN'))
-    except:
-        print("Error: IDs not found. Ensure kernels are loaded.")
-        return None
-
-    xs, ys, zs = [], [], []
-
-    for t in times:
+    # Kernels are loaded once per process and shared with calculate_visibility
+    with JWST_KERNELS:
+        # Pre-calculate IDs once for the whole span
         try:
-            # 1. Get JWST position relative to EARTH (Observer)
-            # We use Earth as the center of this rotating frame
-            pos_jwst_earth, _ = spice.spkpos(jwst_id, t, 'J2000', 'NONE', earth_id) # Target, ET, Ref Frame, Aberration Correction, Observer
-
-            # 2. Get Earth state relative to SUN to define the rotation
-            # We need velocity to find the orbital plane normal
-            state_earth_sun, _ = spice.spkezr(earth_id, t, 'J2000', 'NONE', sun_id) # Target, ET, Ref Frame, Aberration Correction, Observer
-            pos_earth_sun = state_earth_sun[:3]
-            vel_earth_sun = state_earth_sun[3:]
-
-            # 3. Define the Rotating Frame Axes
-            # Axis X: Points from Sun to Earth
-            vec_x = pos_earth_sun
-            # Axis Z: Orbital Plane Normal (Cross product of Position and Velocity)
-            vec_z = spice.vcrss(pos_earth_sun, vel_earth_sun)
-
-            # 4. Create Rotation Matrix 
-            # spice.twovec creates a transformation matrix based on two vectors. This transforms from J2000 to Rotating Frame
-            # Arg 2=1 means 'vec_x' defines the X-axis (1)
-            # Arg 4=3 means 'vec_z' defines the Z-axis (3)
-            transform_matrix = spice.twovec(vec_x, 1, vec_z, 3)
-
-            # 5. Apply Rotation
-            # Multiply matrix by the J2000 position vector
-            pos_rotated = spice.mxv(transform_matrix, pos_jwst_earth)
-
-            xs.append(pos_rotated[0])
-            ys.append(pos_rotated[1])
-            zs.append(pos_rotated[2])
-            
-        except Exception as e:
-            continue
-
-    return np.array(xs), np.array(ys), np.array(zs)
-
-def plot_rotating_frame(x, y, z, visibility_flags):
+            jwst_id = str(spice.bodn2c('JWST'))
+            earth_id = str(spice.bodn2c('EARTH'))
+            sun_id = str(spice.bodn2c('SUN'))
+        except:
+            print("Error: IDs not found. Ensure kernels are loaded.")
+            return None
+
+        if visibility_data is not None and positions_T is not None:
+            # Same epochs as the visibility pass; only the Earth ephemerides are new
+            observer_id = lookup_body_id('SUN_EARTH_BARYCENTER', '3')
+            return calculate_rotating_frame_chunk(
+                visibility_data.times_et, jwst_id, earth_id, sun_id, cache, positions_T, observer_id
+            )
+
+        et_start = spice.str2et(utc_start)
+        et_end = spice.str2et(utc_end)
+        times = np.linspace(et_start, et_end, steps)
+
+        if workers and workers > 1:
+            chunks = run_time_sharded(
+                calculate_rotating_frame_chunk, times, META_KERNEL, workers=workers,
+                args=(jwst_id, earth_id, sun_id, cache)
+            )
+        else:
+            chunks = [calculate_rotating_frame_chunk(times, jwst_id, earth_id, sun_id, cache)]
+
+        xs = np.concatenate([chunk[0] for chunk in chunks])
+        ys = np.concatenate([chunk[1] for chunk in chunks])
+        zs = np.concatenate([chunk[2] for chunk in chunks])
+
+        return xs, ys, zs
+
+@instrumented('plot_rotating_frame')
+def plot_rotating_frame(x, y, z, visibility_flags, filename="jwst_rotating_frame.jpg"):
     """
     Plots the trajectory in the Rotating Frame with DSN Visibility colors.
     """
@@ -361,12 +543,19 @@ def plot_rotating_frame(x, y, z, visibility_flags):
         3: 'Visible (Canberra)'
     }
     
-    # Convert the integer flags (0,1,2,3) into a list of hex color strings
-    plot_colors = [colors_map.get(flag, 'grey') for flag in visibility_flags]
+    # Set View
+    ax.view_init(elev=20, azim=-120)
+    
+    # Set Limits
+    max_range = 2.0e6 
+    ax.set_xlim(0, max_range)
+    ax.set_ylim(-max_range/2, max_range/2)
+    ax.set_zlim(-max_range/2, max_range/2)
 
     # Plot the Trajectory
-    # Note: We removed 'cmap' and 'label' and used 'c=plot_colors'
-    ax.scatter(x, y, z, c=plot_colors, s=2)
+    # The integer flags (0,1,2,3) go through a colormap, and the path is drawn as one
+    # line collection per flag, decimated to the screen resolution set by the view above
+    plot_flagged_path_3d(ax, np.column_stack([x, y, z]), visibility_flags, colors_map)
     
     # Plot Reference Points
     ax.scatter([0], [0], [0], color='blue', s=200, label='Earth')
@@ -378,17 +567,8 @@ def plot_rotating_frame(x, y, z, visibility_flags):
     ax.set_ylabel('Y (km) [Tangential]')
     ax.set_zlabel('Z (km) [Vertical]')
 
-    # Set View
-    ax.view_init(elev=20, azim=-120)
-    
-    # Set Limits
-    max_range = 2.0e6 
-    ax.set_xlim(0, max_range)
-    ax.set_ylim(-max_range/2, max_range/2)
-    ax.set_zlim(-max_range/2, max_range/2)
-
     # --- Create Custom Legend ---
-    # We manually create legend handles because the scatter plot uses a list of colors
+    # We manually create legend handles because the path is split into line collections
     legend_elements = [
         Patch(facecolor=colors_map[0], label=labels_map[0]),
         Patch(facecolor=colors_map[1], label=labels_map[1]),
@@ -400,7 +580,8 @@ def plot_rotating_frame(x, y, z, visibility_flags):
     ax.legend(handles=legend_elements, loc='upper right')
 
     plt.tight_layout()
-    plt.show()
+    plt.savefig(filename) # Save the plot
+    plt.close() # Close the figure to save memory
 
 # --- Main Execution ---
 if __name__ == "__main__":
@@ -408,8 +589,10 @@ if __name__ == "__main__":
     UTC_START = '2025-06-01'
     UTC_END = '2025-12-31'
     TIME_STEPS = 10000 # <-- Increase steps for a denser 3D plot
+    WORKERS = 1 # <-- Set above 1 (e.g. os.cpu_count()) to split the time span across processes
+    CACHE = EphemerisCache() # <-- Set to None to always recompute ephemerides with SPICE
     
-    positions_3d, visibility_windows, all_utc_times, visibility_flags = calculate_visibility(UTC_START, UTC_END, TIME_STEPS)
+    positions_3d, visibility_windows, all_utc_times, visibility_flags = calculate_visibility(UTC_START, UTC_END, TIME_STEPS, workers=WORKERS, cache=CACHE)
     
     if positions_3d is not None and visibility_windows is not None:
 
@@ -422,11 +605,14 @@ if __name__ == "__main__":
         # Generate sky track plots
         plot_sky_tracks(visibility_windows)
 
-        # Generate Rotating Frame plot
-        # rot_x, rot_y, rot_z = calculate_rotating_frame_data(UTC_START, UTC_END, TIME_STEPS)
-        # plot_rotating_frame(rot_x, rot_y, rot_z, visibility_flags)
+        # Generate Rotating Frame plot, reusing the epochs and JWST positions from above
+        rot_x, rot_y, rot_z = calculate_rotating_frame_data(
+            UTC_START, UTC_END, TIME_STEPS, cache=CACHE,
+            positions_T=positions_3d, visibility_data=visibility_windows
+        )
+        plot_rotating_frame(rot_x, rot_y, rot_z, visibility_flags)
 
-        # Clear loaded SPICE kernels now that all SPICE-based work is complete
-        spice.kclear()
+        # Unload this script's kernels now that all SPICE-based work is complete
+        JWST_KERNELS.unload()
     else:
         print("\nAnalysis failed. Please check kernel files and error messages.")
\ No newline at end of file
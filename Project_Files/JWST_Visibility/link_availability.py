@@ -0,0 +1,122 @@
+import numpy as np
+import spiceypy as spice
+
+from jwst_visibility import JWST_KERNELS, MIN_ELEVATION_DEG
+from network_visibility import GATEWAY_KERNELS, calculate_network_visibility
+from spice_tools.instrumentation import instrumented
+from spice_tools.occultation import blockage_intervals
+
+# Deep Space Gateway in the NRHO kernel
+GATEWAY_ID = '-60000'
+
+class LinkAvailability:
+    """
+    Link availability of one spacecraft from every DSN station over a long span,
+    kept as boolean masks only (about 2 bytes per station and epoch).
+
+    available (S, N) is True where the spacecraft is above the station's elevation
+    mask and no occulting body blocks the line of sight; occulted (S, N) marks the
+    blocked samples and geocenter_occulted (N,) the ones blocked as seen from Earth's center.
+    """
+
+    def __init__(self, target, stations, times_et, available, occulted, geocenter_occulted):
+        self.target = target
+        self.stations = list(stations)
+        self.times_et = times_et
+        self.available = available
+        self.occulted = occulted
+        self.geocenter_occulted = geocenter_occulted
+
+    def link_windows(self):
+        """
+        {station: (K, 2) array of [start_et, end_et]} of every window with a usable link.
+        """
+        return {station: blockage_intervals(self.times_et, self.available[s])
+                for s, station in enumerate(self.stations)}
+
+    def blockage_windows(self):
+        """
+        {station: (K, 2) array of [start_et, end_et]} of every occultation, with
+        'EARTH' for the line of sight from Earth's center.
+        """
+        windows = {'EARTH': blockage_intervals(self.times_et, self.geocenter_occulted)}
+        for s, station in enumerate(self.stations):
+            windows[station] = blockage_intervals(self.times_et, self.occulted[s])
+        return windows
+
+    def coverage(self):
+        """
+        Boolean mask of the epochs where at least one station has a usable link.
+        """
+        return np.any(self.available, axis=0)
+
+    def availability(self):
+        """
+        {station: fraction of epochs with a usable link}.
+        """
+        return {station: float(np.mean(self.available[s])) for s, station in enumerate(self.stations)}
+
+@instrumented('calculate_link_availability')
+def calculate_link_availability(utc_start, utc_end, step_seconds, target=GATEWAY_ID, stations=None,
+                                min_elevation_deg=MIN_ELEVATION_DEG, occulting_bodies=('MOON',),
+                                span_block=100000, cache=None):
+    """
+    Multi-year, multi-station link availability: elevation mask plus lunar (or other)
+    occultation for every station, every step_seconds from utc_start to utc_end.
+
+    The span is processed span_block epochs at a time with calculate_network_visibility,
+    keeping only the boolean masks, so memory grows by bytes per epoch rather than
+    by the float tensors of a full NetworkVisibility.
+    """
+    with JWST_KERNELS, GATEWAY_KERNELS:
+        et_start = spice.str2et(utc_start)
+        et_end = spice.str2et(utc_end)
+        # Integer offsets, so blocks line up exactly with the full grid
+        times_et = et_start + step_seconds * np.arange(int(np.floor((et_end - et_start) / step_seconds)) + 1)
+
+        result = None
+        for start in range(0, len(times_et), span_block):
+            block = times_et[start:start + span_block]
+            network = calculate_network_visibility([target], block, stations, min_elevation_deg, cache,
+                                                   occulting_bodies=list(occulting_bodies))
+            if result is None:
+                n_stations = len(network.stations)
+                result = LinkAvailability(
+                    target, network.station_names, times_et,
+                    np.zeros((n_stations, len(times_et)), dtype=bool),
+                    np.zeros((n_stations, len(times_et)), dtype=bool),
+                    np.zeros(len(times_et), dtype=bool)
+                )
+                # Later blocks reuse the stations that have ephemeris data
+                stations = network.station_names
+            result.available[:, start:start + len(block)] = network.visible[0]
+            result.occulted[:, start:start + len(block)] = network.occulted[0]
+            result.geocenter_occulted[start:start + len(block)] = network.geocenter_occulted[0]
+
+    return result
+
+# --- Main Execution ---
+if __name__ == "__main__":
+
+    UTC_START = '2025-01-01'
+    UTC_END = '2028-01-01'
+    STEP_SECONDS = 300.0
+
+    # None = every antenna in DSN_topo.tf; e.g. ['DSS-14', 'Madrid'] picks a subset
+    STATIONS = None
+
+    links = calculate_link_availability(UTC_START, UTC_END, STEP_SECONDS, stations=STATIONS)
+
+    blockages = links.blockage_windows()
+    earth_hours = np.sum(blockages['EARTH'][:, 1] - blockages['EARTH'][:, 0]) / 3600.0
+    print(f"Gateway behind the Moon as seen from Earth's center: "
+          f"{len(blockages['EARTH'])} times, {earth_hours:.1f} h in total")
+
+    windows = links.link_windows()
+    for station, fraction in links.availability().items():
+        print(f"{station}: link available {100 * fraction:.1f}% of the time, "
+              f"{len(windows[station])} windows, {len(blockages[station])} lunar occultations")
+    print(f"At least one station: {100 * np.mean(links.coverage()):.1f}% of the time")
+
+    JWST_KERNELS.unload()
+    GATEWAY_KERNELS.unload()
@@ -0,0 +1,304 @@
+import os
+
+import spiceypy as spice
+import numpy as np
+
+from jwst_visibility import (
+    JWST_KERNELS, MIN_ELEVATION_DEG, ephemeris_or_nan, recrad_batch
+)
+from visibility_result import StationTrack, VisibilityResult
+from spice_tools.kernel_session import kernel_session
+from spice_tools.dsn_catalog import load_dsn_catalog, select_stations, station_positions
+from spice_tools.instrumentation import instrumented, stage
+from spice_tools.occultation import OccultingBody
+
+# The DSG trajectory lives in the Gateway tutorial's kernels
+GATEWAY_KERNELS = kernel_session(os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', 'Gateway_Orbit', 'gateway_meta.txt'
+))
+
+# JWST and the Deep Space Gateway (NAIF ID -60000 in the NRHO kernel)
+DEFAULT_TARGETS = ['JWST', '-60000']
+
+class NetworkVisibility:
+    """
+    Elevation, azimuth and range of every target from every station on one time axis.
+
+    range_km, az_deg and el_deg are (targets, stations, epochs) arrays with NaN where
+    SPICE could not evaluate an epoch; visible is the matching boolean tensor.
+    When occulting bodies were checked, occulted marks the samples where one of them
+    blocks the station's line of sight (those are not visible either), and
+    geocenter_occulted (targets, epochs) does the same for the line from Earth's center.
+    track(target, station) and result(target) give the usual StationTrack and
+    VisibilityResult views, so the existing plots and interval tools work unchanged.
+    """
+
+    def __init__(self, targets, stations, times_et, range_km, az_deg, el_deg, min_elevation_deg=0.0,
+                 occulted=None, geocenter_occulted=None):
+        self.targets = list(targets)
+        self.stations = dict(stations) # name -> DSNStation
+        self.times_et = np.ascontiguousarray(times_et, dtype=np.float64)
+        self.range_km = range_km
+        self.az_deg = az_deg
+        self.el_deg = el_deg
+        self.min_elevation_deg = min_elevation_deg
+        self.occulted = occulted
+        self.geocenter_occulted = geocenter_occulted
+        self.visible = el_deg > min_elevation_deg # NaN compares as False (not visible)
+        if occulted is not None:
+            self.visible &= ~occulted
+
+    @property
+    def station_names(self):
+        return list(self.stations.keys())
+
+    def _index(self, target, station):
+        return self.targets.index(target), self.station_names.index(station)
+
+    def track(self, target, station):
+        """
+        StationTrack of one target/station pair (views into the tensors, no copy).
+        """
+        t, s = self._index(target, station)
+        return StationTrack(station, self.times_et, self.az_deg[t, s], self.el_deg[t, s],
+                            self.range_km[t, s], self.visible[t, s])
+
+    def result(self, target):
+        """
+        VisibilityResult of one target from every station.
+        """
+        return VisibilityResult(self.times_et, {station: self.track(target, station)
+                                                for station in self.stations})
+
+    def contact_windows(self):
+        """
+        Contact windows of every pair as {(target, station): (K, 2) array of [start_et, end_et]},
+        from the first to the last visible sample of each run. All pairs are
+        run-length encoded in one pass over the visibility tensor.
+        """
+        return self._pair_windows(self.visible)
+
+    def occultation_windows(self):
+        """
+        Same as contact_windows, for the runs of samples where an occulting body
+        blocks the line of sight (whether or not the target is above the horizon).
+        """
+        if self.occulted is None:
+            raise ValueError("No occulting bodies were checked in this run")
+        return self._pair_windows(self.occulted)
+
+    def _pair_windows(self, mask):
+        n_targets, n_stations, n_epochs = mask.shape
+        padded = np.zeros((n_targets, n_stations, n_epochs + 2), dtype=np.int8)
+        padded[:, :, 1:-1] = mask
+        edges = np.diff(padded, axis=2)
+
+        # np.nonzero walks the tensor in C order, so starts and ends of the same
+        # pair come out in matching order
+        start_t, start_s, starts = np.nonzero(edges == 1)
+        _, _, ends = np.nonzero(edges == -1)
+        pair_index = start_t * n_stations + start_s
+        split_at = np.searchsorted(pair_index, np.arange(1, n_targets * n_stations))
+
+        windows = {}
+        intervals = np.column_stack([self.times_et[starts], self.times_et[ends - 1]])
+        for k, rows in enumerate(np.split(intervals, split_at)):
+            target = self.targets[k // n_stations]
+            station = self.station_names[k % n_stations]
+            windows[(target, station)] = rows
+        return windows
+
+    def coverage(self, target, by_complex=False):
+        """
+        Boolean mask of the epochs where any station sees the target. With
+        by_complex=True returns {complex name: mask} instead.
+        """
+        t = self.targets.index(target)
+        if not by_complex:
+            return np.any(self.visible[t], axis=0)
+
+        masks = {}
+        for s, station in enumerate(self.stations.values()):
+            masks[station.complex] = masks.get(station.complex, False) | self.visible[t, s]
+        return masks
+
+    @property
+    def nbytes(self):
+        total = self.times_et.nbytes + self.range_km.nbytes + self.az_deg.nbytes + \
+            self.el_deg.nbytes + self.visible.nbytes
+        if self.occulted is not None:
+            total += self.occulted.nbytes + self.geocenter_occulted.nbytes
+        return total
+
+def earth_fixed_frame(stations):
+    """
+    Body-fixed frame the topocentric frames are defined against (EARTH_FIXED in DSN_topo.tf).
+    """
+    frames = {spice.gcpool(f'TKFRAME_{station.frame}_RELATIVE', 0, 1)[0] for station in stations.values()}
+    if len(frames) != 1:
+        raise ValueError(f"Stations are defined against several body-fixed frames: {sorted(frames)}")
+    return frames.pop()
+
+def station_states(positions_fixed, fixed_frame, times_et):
+    """
+    J2000 positions and velocities (S, N, 3) of stations fixed on Earth, relative to
+    Earth's center, plus the (N, 3, 3) J2000 -> Earth-fixed rotations they came from.
+    Earth's orientation is evaluated with one batched sxform shared by every station.
+    """
+    with stage('sxform'):
+        xforms = spice.sxform('J2000', fixed_frame, times_et)
+    rotation, rotation_rate = xforms[:, :3, :3], xforms[:, 3:, :3]
+
+    # The inverse of a state transform [[R, 0], [dR, R]] is [[R^T, 0], [dR^T, R^T]]
+    station_pos = np.einsum('nji,sj->sni', rotation, positions_fixed)
+    station_vel = np.einsum('nji,sj->sni', rotation_rate, positions_fixed)
+    return station_pos, station_vel, rotation
+
+def apparent_topocentric(target_states, earth_ssb, station_pos, station_vel):
+    """
+    'LT+S' corrected target positions (T, S, N, 3) in J2000 for every target/station pair.
+
+    target_states are geometric target states (T, N, 6) relative to Earth's center,
+    earth_ssb is Earth's state (N, 6) relative to the solar system barycenter and
+    station_pos/station_vel are the station states (S, N, 3) relative to Earth's center.
+    Light time follows SPICE's single 'LT' iteration, moving the target back along its
+    barycentric velocity; that first-order step agrees with spkezr to well under a
+    meter for JWST and the DSG. Stellar aberration uses the station's barycentric
+    velocity, like stelab.
+    """
+    c = spice.clight()
+
+    # Geometric position from each station to each target at the receive epoch
+    relative = target_states[:, None, :, :3] - station_pos[None]
+    light_time = np.linalg.norm(relative, axis=-1, keepdims=True) / c
+
+    # Target position at the emission epoch (et - light_time)
+    target_velocity = target_states[:, :, 3:] + earth_ssb[None, :, 3:]
+    relative -= target_velocity[:, None] * light_time
+
+    # Stellar aberration: rotate toward the observer's velocity by asin(|u x v/c|)
+    observer_velocity = earth_ssb[None, :, 3:] + station_vel
+    unit = relative / np.linalg.norm(relative, axis=-1, keepdims=True)
+    h = np.cross(unit, observer_velocity[None] / c)
+    sin_phi = np.linalg.norm(h, axis=-1, keepdims=True)
+    return relative * np.sqrt(1.0 - sin_phi**2) + np.cross(h, relative)
+
+@instrumented('calculate_network_visibility')
+def calculate_network_visibility(targets, times_et, stations=None, min_elevation_deg=MIN_ELEVATION_DEG,
+                                 cache=None, block_size=20000, occulting_bodies=None):
+    """
+    Elevation/azimuth/range of every target from every DSN station in one batched pass.
+    Kernels (including DSN_topo.tf and the station SPK) must already be loaded.
+
+    stations is a list of station and/or complex names (see select_stations) or None
+    for the whole catalog. SPICE is called once per target and once for Earth's state
+    per block, plus one sxform per epoch shared by all stations, so adding targets or
+    stations only grows the numpy work. block_size bounds the memory of temporaries.
+    Pass an EphemerisCache as `cache` to reuse the target states of earlier runs.
+
+    occulting_bodies (e.g. ['MOON']) also checks whether those bodies block the
+    geometric line of sight from each station and from Earth's center, using their
+    RADII from the loaded PCK; one extra spkpos per body and block.
+    """
+    targets = [str(target) for target in targets]
+    times_et = np.ascontiguousarray(times_et, dtype=np.float64)
+    stations = select_stations(load_dsn_catalog(), stations)
+    if not stations:
+        raise ValueError("No DSN stations found; is DSN_topo.tf loaded?")
+
+    # --- Step 1: Fixed station geometry ---
+    # Stations do not move in the Earth-fixed frame and the topocentric frames are
+    # constant rotations of it, so both are looked up once per station.
+    fixed_frame = earth_fixed_frame(stations)
+    positions_fixed = station_positions(stations, fixed_frame, times_et[0])
+    missing = [name for name, row in zip(stations, positions_fixed) if np.isnan(row).any()]
+    if missing:
+        print(f"No ephemeris for {', '.join(missing)}, leaving them out.")
+        stations = {name: station for name, station in stations.items() if name not in missing}
+        positions_fixed = positions_fixed[~np.isnan(positions_fixed).any(axis=1)]
+    topo_rotations = np.array([spice.pxform(fixed_frame, station.frame, times_et[0])
+                               for station in stations.values()])
+
+    shape = (len(targets), len(stations), len(times_et))
+    range_km = np.full(shape, np.nan)
+    az_deg = np.full(shape, np.nan)
+    el_deg = np.full(shape, np.nan)
+
+    bodies = [OccultingBody(name) for name in occulting_bodies or []]
+    occulted = np.zeros(shape, dtype=bool) if bodies else None
+    geocenter_occulted = np.zeros((len(targets), len(times_et)), dtype=bool) if bodies else None
+
+    for start in range(0, len(times_et), block_size):
+        block = times_et[start:start + block_size]
+
+        # --- Step 2: Earth orientation, shared by every station and target ---
+        station_pos, station_vel, rotation = station_states(positions_fixed, fixed_frame, block)
+
+        # --- Step 3: One geometric ephemeris per target, plus Earth's barycentric state ---
+        earth_ssb = ephemeris_or_nan('spkezr', 'EARTH', block, 'J2000', 'NONE',
+                                     'SOLAR SYSTEM BARYCENTER', cache)
+        target_states = np.array([
+            ephemeris_or_nan('spkezr', target, block, 'J2000', 'NONE', 'EARTH', cache)
+            for target in targets
+        ])
+
+        # --- Step 4: Corrections and rotation into each topocentric frame ---
+        with stage('network geometry'):
+            apparent = apparent_topocentric(target_states, earth_ssb, station_pos, station_vel)
+            apparent = np.einsum('nij,tsnj->tsni', rotation, apparent)
+            apparent = np.einsum('sij,tsnj->tsni', topo_rotations, apparent)
+
+        # --- Step 5: Lines of sight through occulting bodies (e.g. the Moon) ---
+        for body in bodies:
+            body_pos = ephemeris_or_nan('spkpos', body.name, block, 'J2000', 'NONE', 'EARTH', cache)
+            with stage('occultation'):
+                target_pos = target_states[:, :, :3]
+                occulted[:, :, start:start + len(block)] |= body.blocked(
+                    station_pos[None], target_pos[:, None], body_pos, block)
+                geocenter_occulted[:, start:start + len(block)] |= body.blocked(
+                    np.zeros_like(body_pos), target_pos, body_pos, block)
+
+        ranges, az_rad, el_rad = recrad_batch(apparent.reshape(-1, 3))
+        block_shape = apparent.shape[:3]
+        range_km[:, :, start:start + len(block)] = ranges.reshape(block_shape)
+        az_deg[:, :, start:start + len(block)] = np.rad2deg(az_rad).reshape(block_shape)
+        el_deg[:, :, start:start + len(block)] = np.rad2deg(el_rad).reshape(block_shape)
+
+    return NetworkVisibility(targets, stations, times_et, range_km, az_deg, el_deg, min_elevation_deg,
+                             occulted, geocenter_occulted)
+
+def run_network_visibility(utc_start, utc_end, steps, targets=DEFAULT_TARGETS, stations=None, cache=None,
+                           occulting_bodies=None):
+    """
+    Loads the JWST and Gateway kernels and runs calculate_network_visibility on
+    `steps` evenly spaced epochs from utc_start to utc_end.
+    """
+    with JWST_KERNELS, GATEWAY_KERNELS:
+        times_et = np.linspace(spice.str2et(utc_start), spice.str2et(utc_end), steps)
+        return calculate_network_visibility(targets, times_et, stations, cache=cache,
+                                            occulting_bodies=occulting_bodies)
+
+# --- Main Execution ---
+if __name__ == "__main__":
+
+    UTC_START = '2025-06-01'
+    UTC_END = '2025-07-01'
+    STEPS = 4321 # 10 minute steps
+
+    # None = every antenna in DSN_topo.tf; e.g. ['DSS-14', 'Madrid'] picks a subset
+    STATIONS = None
+
+    network = run_network_visibility(UTC_START, UTC_END, STEPS, stations=STATIONS)
+    print(f"{len(network.targets)} targets x {len(network.stations)} stations x "
+          f"{len(network.times_et)} epochs ({network.nbytes / 1024**2:.1f} MB)")
+
+    for (target, station), windows in network.contact_windows().items():
+        hours = np.sum(windows[:, 1] - windows[:, 0]) / 3600.0
+        print(f"{target:>8} from {station} ({network.stations[station].complex}): "
+              f"{len(windows)} windows, {hours:.1f} h of contact")
+
+    for target in network.targets:
+        print(f"{target}: seen by at least one antenna {100 * np.mean(network.coverage(target)):.1f}% of the time")
+
+    JWST_KERNELS.unload()
+    GATEWAY_KERNELS.unload()
@@ -0,0 +1,336 @@
+import os
+import json
+import time
+import asyncio
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+
+import spiceypy as spice
+import numpy as np
+
+from jwst_visibility import (
+    DSN_STATIONS, JWST_KERNELS, META_KERNEL, calculate_visibility_block, ephemeris_or_nan, lookup_body_id
+)
+from visibility_result import VisibilityResult
+from spice_tools.coverage import body_code
+from spice_tools.kernel_session import kernel_session
+from spice_tools.parallel import load_worker_kernels, split_times
+from spice_tools.time_scale import et_to_iso, leap_second_table
+
+# The DSG trajectory lives in the Gateway tutorial's kernels
+GATEWAY_META_KERNEL = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Gateway_Orbit', 'gateway_meta.txt')
+GATEWAY_KERNELS = kernel_session(GATEWAY_META_KERNEL)
+
+# Requests larger than this are refused instead of building a huge JSON reply
+MAX_EPOCHS = 2000000
+
+# Aberration corrections spkezr accepts for a reception (or X transmission) case
+ABERRATION_CORRECTIONS = ('NONE', 'LT', 'LT+S', 'CN', 'CN+S', 'XLT', 'XLT+S', 'XCN', 'XCN+S')
+
+# --- Worker side (runs in the pool processes, kernels already loaded) ---
+
+def load_service_kernels(meta_kernels):
+    """
+    Process-pool initializer: keeps every meta-kernel loaded for the worker's life.
+    """
+    for meta_kernel in meta_kernels:
+        load_worker_kernels(meta_kernel)
+
+def states_shard(times_et, target, observer, ref, abcorr):
+    """
+    (N, 6) states of target relative to observer for one block of epochs (NaN where not covered).
+    """
+    return ephemeris_or_nan('spkezr', target, times_et, ref, abcorr, observer)
+
+def contacts_shard(times_et, stations, jwst_id, observer_id):
+    """
+    VisibilityResult of JWST from the given DSN_STATIONS for one block of epochs.
+    """
+    _, visibility_data = calculate_visibility_block(times_et, jwst_id, observer_id, stations=stations)
+    return visibility_data
+
+# --- Service side ---
+
+class QueryError(Exception):
+    """
+    A request the service cannot answer (reported to the client as HTTP 400).
+    """
+
+class LRUCache:
+    """
+    Encoded replies keyed by the normalized request, evicting the least recently used
+    once max_entries or max_bytes is exceeded.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=512 * 1024**2):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.nbytes = 0
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is not None:
+            self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        if key in self.entries:
+            self.nbytes -= len(self.entries.pop(key))
+        self.entries[key] = value
+        self.nbytes += len(value)
+        while self.entries and (len(self.entries) > self.max_entries or self.nbytes > self.max_bytes):
+            _, evicted = self.entries.popitem(last=False)
+            self.nbytes -= len(evicted)
+
+def _json_rows(array):
+    """
+    Nested lists for JSON, with NaN (no ephemeris) as null.
+    """
+    return np.where(np.isnan(array), None, array).tolist()
+
+class QueryService:
+    """
+    Answers ephemeris and DSN contact queries from a pool of worker processes that
+    keep the JWST and Gateway kernels loaded, so no request pays for furnishing them.
+
+    Each query is normalized (times parsed to ET) into a cache key. Replies are kept
+    encoded in an LRUCache, so a repeated query costs a dictionary lookup, and a query
+    that is already being computed is awaited instead of computed twice. Long spans
+    are split into blocks of shard_epochs that run on several workers at once.
+    """
+
+    def __init__(self, workers=None, shard_epochs=50000, cache_entries=256,
+                 meta_kernels=(META_KERNEL, GATEWAY_META_KERNEL)):
+        self.workers = workers or os.cpu_count() or 1
+        self.shard_epochs = shard_epochs
+        self.cache = LRUCache(cache_entries)
+        self.in_flight = {}
+        self.stats = {'requests': 0, 'cache_hits': 0, 'coalesced': 0, 'computed': 0, 'errors': 0}
+
+        # CSPICE is not thread-safe, so the kernels live in worker processes
+        # ('spawn' gives each a clean kernel pool, like run_time_sharded)
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=load_service_kernels,
+            initargs=(tuple(meta_kernels),)
+        )
+
+        # The service process itself only parses times and names, but needs the
+        # same kernels to do it
+        JWST_KERNELS.acquire()
+        GATEWAY_KERNELS.acquire()
+        self.jwst_id = lookup_body_id('JWST', '-170')
+        self.observer_id = lookup_body_id('SUN_EARTH_BARYCENTER', '3')
+
+        # Read the leap seconds from the kernel pool now, on this thread: et_to_iso
+        # then only does numpy work when encode_contacts runs in an executor thread
+        self.leap_seconds = leap_second_table()
+
+    def warm_up(self):
+        """
+        Starts every worker (loading its kernels) before the first request arrives.
+        """
+        futures = [self.pool.submit(os.getpid) for _ in range(self.workers)]
+        return {future.result() for future in futures}
+
+    def close(self):
+        self.pool.shutdown()
+        JWST_KERNELS.release()
+        GATEWAY_KERNELS.release()
+
+    # --- Request normalization ---
+
+    def time_grid(self, params):
+        """
+        Epochs from the start/end (UTC strings) and step (seconds) query parameters,
+        on integer offsets from the start.
+        """
+        try:
+            et_start = spice.str2et(params['start'])
+            et_end = spice.str2et(params['end'])
+            step = float(params.get('step', 600.0))
+        except KeyError as e:
+            raise QueryError(f"Missing parameter {e}")
+        except Exception as e:
+            raise QueryError(f"Bad time parameters: {e}")
+        if step <= 0 or et_end < et_start:
+            raise QueryError("Need start <= end and step > 0")
+        n_epochs = int(np.floor((et_end - et_start) / step)) + 1
+        if n_epochs > MAX_EPOCHS:
+            raise QueryError(f"{n_epochs} epochs requested, the limit is {MAX_EPOCHS}")
+        return et_start, step, n_epochs
+
+    def normalize(self, kind, params):
+        """
+        (cache key, computation arguments) of a query, or QueryError.
+        """
+        if kind not in ('states', 'contacts'):
+            raise QueryError(f"Unknown query '{kind}'; use /states, /contacts or /stats")
+        et_start, step, n_epochs = self.time_grid(params)
+
+        if kind == 'states':
+            target = params.get('target', 'JWST')
+            observer = params.get('observer', 'EARTH')
+            for name in (target, observer):
+                if body_code(name) is None:
+                    raise QueryError(f"Unknown body '{name}'")
+            ref = params.get('ref', 'J2000').upper()
+            if spice.namfrm(ref) == 0:
+                raise QueryError(f"Unknown reference frame '{ref}'")
+            abcorr = params.get('abcorr', 'NONE').upper().replace(' ', '')
+            if abcorr not in ABERRATION_CORRECTIONS:
+                raise QueryError(f"Unknown aberration correction '{abcorr}'; use one of {list(ABERRATION_CORRECTIONS)}")
+            args = (str(body_code(target)), str(body_code(observer)), ref, abcorr)
+        elif kind == 'contacts':
+            stations = params['stations'].split(',') if params.get('stations') else list(DSN_STATIONS)
+            unknown = [station for station in stations if station not in DSN_STATIONS]
+            if unknown:
+                raise QueryError(f"Unknown stations {unknown}; choose from {list(DSN_STATIONS)}")
+            args = (tuple(stations), self.jwst_id, self.observer_id)
+
+        key = json.dumps([kind, round(et_start, 6), step, n_epochs, args])
+        return key, (kind, et_start, step, n_epochs, args)
+
+    # --- Answering ---
+
+    async def query(self, kind, params):
+        """
+        Encoded JSON reply for a query, from the cache, an identical query in flight,
+        or the worker pool.
+        """
+        self.stats['requests'] += 1
+        key, job = self.normalize(kind, params)
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.stats['cache_hits'] += 1
+            return cached
+
+        if key in self.in_flight:
+            self.stats['coalesced'] += 1
+            return await asyncio.shield(self.in_flight[key])
+
+        future = asyncio.get_running_loop().create_future()
+        self.in_flight[key] = future
+        try:
+            reply = await self.compute(*job)
+            self.cache.put(key, reply)
+            self.stats['computed'] += 1
+            future.set_result(reply)
+            return reply
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting for it
+            future.exception()
+            raise
+        finally:
+            if not future.done():
+                # This request was cancelled (CancelledError is not an Exception):
+                # release the coalesced waiters instead of leaving them hanging
+                future.set_exception(RuntimeError("The identical query being computed was cancelled"))
+                future.exception()
+            del self.in_flight[key]
+
+    async def compute(self, kind, et_start, step, n_epochs, args):
+        loop = asyncio.get_running_loop()
+        times_et = et_start + step * np.arange(n_epochs)
+        shards = split_times(times_et, int(np.ceil(n_epochs / self.shard_epochs)))
+        worker = states_shard if kind == 'states' else contacts_shard
+        parts = await asyncio.gather(*[loop.run_in_executor(self.pool, worker, shard, *args)
+                                       for shard in shards])
+
+        # Encoding a large reply takes a while; keep the event loop free for cache hits
+        if kind == 'states':
+            return await loop.run_in_executor(None, self.encode_states, times_et, np.concatenate(parts), args)
+        return await loop.run_in_executor(None, self.encode_contacts, VisibilityResult.concatenate(parts))
+
+    def encode_states(self, times_et, states, args):
+        target, observer, ref, abcorr = args
+        return json.dumps({
+            'target': target, 'observer': observer, 'ref': ref, 'abcorr': abcorr,
+            'times_et': times_et.tolist(),
+            'states': _json_rows(states)
+        }).encode()
+
+    def encode_contacts(self, visibility_data):
+        windows = {}
+        for station, intervals in visibility_data.intervals().items():
+            utc = et_to_iso(intervals, unit='s').reshape(-1, 2)
+            windows[station] = [{'start': start, 'end': end, 'duration_s': float(stop_et - start_et)}
+                                for (start, end), (start_et, stop_et) in zip(utc.tolist(), intervals)]
+        return json.dumps({'windows': windows}).encode()
+
+    # --- HTTP ---
+
+    async def handle(self, reader, writer):
+        """
+        One HTTP/1.1 GET request per connection: /states, /contacts or /stats.
+        """
+        status, body = 200, b''
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass # headers are not needed
+            if len(request_line) < 2 or request_line[0] != 'GET':
+                raise QueryError("Only GET requests are supported")
+
+            url = urlsplit(request_line[1])
+            params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            kind = url.path.strip('/')
+            if kind == 'stats':
+                body = json.dumps(dict(self.stats, cached_replies=len(self.cache.entries),
+                                       cached_bytes=self.cache.nbytes, workers=self.workers)).encode()
+            else:
+                body = await self.query(kind, params)
+        except QueryError as e:
+            self.stats['errors'] += 1
+            status, body = 400, json.dumps({'error': str(e)}).encode()
+        except Exception as e:
+            self.stats['errors'] += 1
+            status, body = 500, json.dumps({'error': repr(e)}).encode()
+
+        reason = {200: 'OK', 400: 'Bad Request', 500: 'Internal Server Error'}[status]
+        writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+async def serve(host='127.0.0.1', port=8765, workers=None, shard_epochs=50000, cache_entries=256):
+    """
+    Runs the query service until cancelled (Ctrl+C).
+    """
+    service = QueryService(workers, shard_epochs, cache_entries)
+    start = time.perf_counter()
+    service.warm_up()
+    print(f"{service.workers} workers ready in {time.perf_counter() - start:.1f} s")
+
+    server = await asyncio.start_server(service.handle, host, port)
+    print(f"Serving on http://{host}:{port}  (/states, /contacts, /stats)")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+# --- Main Execution ---
+if __name__ == "__main__":
+
+    # Example queries once the service is up:
+    #   curl 'http://127.0.0.1:8765/states?target=JWST&observer=EARTH&start=2025-06-01&end=2025-06-02&step=60'
+    #   curl 'http://127.0.0.1:8765/states?target=-60000&observer=MOON&start=2025-06-01&end=2025-07-01&step=600'
+    #   curl 'http://127.0.0.1:8765/contacts?start=2025-06-01&end=2025-07-01&step=300&stations=Goldstone,Madrid'
+    #   curl 'http://127.0.0.1:8765/stats'
+    HOST = '127.0.0.1'
+    PORT = 8765
+    WORKERS = 4
+
+    try:
+        asyncio.run(serve(HOST, PORT, WORKERS))
+    except KeyboardInterrupt:
+        pass
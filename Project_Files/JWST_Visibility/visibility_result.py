@@ -0,0 +1,157 @@
+import os
+import sys
+
+import numpy as np
+
+# Shared helpers live one directory up in Project_Files/spice_tools
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from spice_tools.coverage import mask_intervals
+
+class StationTrack:
+    """
+    Columnar geometry of the target as seen from one station.
+
+    times_et, az_deg, el_deg and range_km are contiguous float64 arrays with one
+    entry per time step (NaN where SPICE could not evaluate the epoch), and
+    visible is the matching boolean mask. Contact intervals are derived from the
+    mask on first use.
+    """
+
+    def __init__(self, name, times_et, az_deg, el_deg, range_km, visible):
+        self.name = name
+        self.times_et = times_et # shared between all stations of a result
+        self.az_deg = np.ascontiguousarray(az_deg, dtype=np.float64)
+        self.el_deg = np.ascontiguousarray(el_deg, dtype=np.float64)
+        self.range_km = np.ascontiguousarray(range_km, dtype=np.float64)
+        self.visible = np.ascontiguousarray(visible, dtype=bool)
+        self._interval_index = None
+
+    @property
+    def interval_index(self):
+        """
+        (K, 2) array of first/last sample index of every contact interval.
+        """
+        if self._interval_index is None:
+            self._interval_index = mask_intervals(self.visible)
+        return self._interval_index
+
+    @property
+    def intervals(self):
+        """
+        (K, 2) array of [start_et, end_et] for every contact interval, from the
+        first to the last visible sample of each run.
+        """
+        return self.times_et[self.interval_index]
+
+    @property
+    def visible_index(self):
+        return np.flatnonzero(self.visible)
+
+    def is_visible_at(self, et):
+        """
+        True if et falls inside one of the contact intervals (binary search).
+        """
+        intervals = self.intervals
+        k = np.searchsorted(intervals[:, 0], et, side='right') - 1
+        return bool(k >= 0 and et <= intervals[k, 1])
+
+    def total_contact_time(self):
+        """
+        Total contact time in seconds. Each visible sample stands for one time step
+        (half a step either side, as drawn by plot_visibility_timeline), so every
+        interval counts its first-to-last length plus one step and a single-sample
+        contact counts one step rather than zero.
+        """
+        intervals = self.intervals
+        step = float(np.median(np.diff(self.times_et))) if len(self.times_et) > 1 else 0.0
+        return float(np.sum(intervals[:, 1] - intervals[:, 0]) + step * len(intervals))
+
+    @property
+    def nbytes(self):
+        return self.az_deg.nbytes + self.el_deg.nbytes + self.range_km.nbytes + self.visible.nbytes
+
+class VisibilityResult:
+    """
+    Visibility of one target from every station, stored as per-station columns
+    over a single shared time axis. Indexing by station name returns its StationTrack.
+    """
+
+    def __init__(self, times_et, tracks):
+        self.times_et = np.ascontiguousarray(times_et, dtype=np.float64)
+        self.tracks = dict(tracks)
+
+    @classmethod
+    def from_arrays(cls, times_et, station_geometry, min_elevation_deg=0.0):
+        """
+        Builds a result from {station: (range_km, az_rad, el_rad)} arrays.
+        """
+        times_et = np.ascontiguousarray(times_et, dtype=np.float64)
+        min_elevation_rad = np.deg2rad(min_elevation_deg)
+        tracks = {}
+        for station, (range_km, az_rad, el_rad) in station_geometry.items():
+            tracks[station] = StationTrack(
+                station, times_et, np.rad2deg(az_rad), np.rad2deg(el_rad), range_km,
+                el_rad > min_elevation_rad # NaN compares as False (not visible)
+            )
+        return cls(times_et, tracks)
+
+    @classmethod
+    def concatenate(cls, results):
+        """
+        Joins results for consecutive blocks of epochs (in time order) into one.
+        Intervals that cross block boundaries come out as a single interval.
+        """
+        results = list(results)
+        times_et = np.concatenate([result.times_et for result in results])
+        tracks = {}
+        for station in results[0].stations:
+            parts = [result[station] for result in results]
+            tracks[station] = StationTrack(
+                station, times_et,
+                np.concatenate([part.az_deg for part in parts]),
+                np.concatenate([part.el_deg for part in parts]),
+                np.concatenate([part.range_km for part in parts]),
+                np.concatenate([part.visible for part in parts])
+            )
+        return cls(times_et, tracks)
+
+    @property
+    def stations(self):
+        return list(self.tracks.keys())
+
+    def keys(self):
+        return self.tracks.keys()
+
+    def items(self):
+        return self.tracks.items()
+
+    def __getitem__(self, station):
+        return self.tracks[station]
+
+    def __iter__(self):
+        return iter(self.tracks)
+
+    def __len__(self):
+        return len(self.tracks)
+
+    def visible_at(self, et):
+        """
+        Names of the stations that can see the target at epoch et.
+        """
+        return [station for station, track in self.tracks.items() if track.is_visible_at(et)]
+
+    def total_contact_time(self):
+        """
+        Total contact time in seconds for each station.
+        """
+        return {station: track.total_contact_time() for station, track in self.tracks.items()}
+
+    def intervals(self):
+        """
+        Contact intervals ([start_et, end_et] rows) for each station.
+        """
+        return {station: track.intervals for station, track in self.tracks.items()}
+
+    @property
+    def nbytes(self):
+        return self.times_et.nbytes + sum(track.nbytes for track in self.tracks.values())
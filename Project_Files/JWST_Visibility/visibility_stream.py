@@ -0,0 +1,302 @@
+import os
+import json
+
+import spiceypy as spice
+import numpy as np
+
+from jwst_visibility import (
+    DSN_STATIONS, JWST_KERNELS, calculate_visibility_block, lookup_body_id, visibility_flags_from
+)
+from visibility_result import StationTrack, VisibilityResult, mask_intervals
+
+class VisibilityBlock:
+    """
+    One fixed-size block of a streamed visibility run.
+
+    positions_T is (3, N) like calculate_visibility returns, visibility_data is the
+    block's VisibilityResult and visibility_flags its integer flags. closed_windows
+    holds, per station, the (start_et, end_et) contact windows that ended in this
+    block; a window still open at the end of the block is carried into the next
+    one, so windows crossing block boundaries are reported once and intact.
+    """
+
+    def __init__(self, index, positions_T, visibility_data, visibility_flags, closed_windows):
+        self.index = index
+        self.positions_T = positions_T
+        self.visibility_data = visibility_data
+        self.visibility_flags = visibility_flags
+        self.closed_windows = closed_windows
+
+    @property
+    def times_et(self):
+        return self.visibility_data.times_et
+
+def stream_visibility(utc_start, utc_end, step_seconds, block_size=86400, cache=None,
+                      first_epoch=0, open_windows=None):
+    """
+    Generator version of calculate_visibility for spans too long to hold in memory.
+
+    Epochs run from utc_start to utc_end every step_seconds and are processed
+    block_size epochs at a time, so peak memory depends on block_size only.
+    Yields VisibilityBlock objects in time order. An EphemerisCache may be passed
+    as `cache`, as for calculate_visibility.
+
+    To resume a run, first_epoch skips the epochs already processed and
+    open_windows gives {station: start_et} of the windows still open at that point
+    (see VisibilityStore.resume_point).
+    """
+    with JWST_KERNELS:
+        et_start = spice.str2et(utc_start)
+        et_end = spice.str2et(utc_end)
+        n_total = int(np.floor((et_end - et_start) / step_seconds)) + 1
+
+        JWST_ID = lookup_body_id('JWST', '-170')
+        SUN_EARTH_BARYCENTER_ID = lookup_body_id('SUN_EARTH_BARYCENTER', '3')
+
+        open_since = {station: None for station in DSN_STATIONS} # start of a window still open
+        open_last = {} # last epoch of the previous block
+        if open_windows:
+            open_since.update(open_windows)
+            open_last = {station: et_start + step_seconds * (first_epoch - 1) for station in DSN_STATIONS}
+
+        for index, first in enumerate(range(first_epoch, n_total, block_size)):
+            # Build the block's epochs from integer offsets so blocks line up exactly
+            times_et = et_start + step_seconds * np.arange(first, min(first + block_size, n_total))
+
+            positions_T, visibility_data = calculate_visibility_block(
+                times_et, JWST_ID, SUN_EARTH_BARYCENTER_ID, cache=cache
+            )
+            is_last = first + block_size >= n_total
+
+            closed_windows = {}
+            for station in DSN_STATIONS:
+                runs = mask_intervals(visibility_data[station].visible)
+                starts = times_et[runs[:, 0]]
+                ends = times_et[runs[:, 1]]
+
+                # A run touching the start of the block continues the open window
+                if open_since[station] is not None:
+                    if len(runs) and runs[0, 0] == 0:
+                        starts[0] = open_since[station]
+                    else:
+                        # The open window ended exactly at the previous block's last sample
+                        starts = np.insert(starts, 0, open_since[station])
+                        ends = np.insert(ends, 0, open_last[station])
+                    open_since[station] = None
+
+                # A run touching the end of the block stays open unless this is the last block
+                if runs.size and runs[-1, 1] == len(times_et) - 1 and not is_last:
+                    open_since[station] = starts[-1]
+                    starts, ends = starts[:-1], ends[:-1]
+
+                closed_windows[station] = np.column_stack([starts, ends])
+
+            open_last = {station: times_et[-1] for station in DSN_STATIONS}
+
+            yield VisibilityBlock(
+                index, positions_T, visibility_data,
+                visibility_flags_from(visibility_data), closed_windows
+            )
+
+class VisibilityStore:
+    """
+    Append-only on-disk store for streamed visibility runs.
+
+    Every column is a raw float64/int8/bool file that only ever grows, and
+    manifest.json records how many rows are complete, so an interrupted run
+    leaves a readable prefix. Reopening a store cuts every column back to that
+    prefix, and blocks must follow the last stored epoch, so a resumed run
+    continues the columns instead of repeating them. open_visibility_store
+    memory-maps the columns back.
+    """
+
+    def __init__(self, directory, stations=tuple(DSN_STATIONS)):
+        self.directory = os.path.abspath(directory)
+        os.makedirs(self.directory, exist_ok=True)
+        self.manifest_path = os.path.join(self.directory, 'manifest.json')
+
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {
+                'rows': 0,
+                'stations': list(stations),
+                'windows': {station: 0 for station in stations},
+            }
+
+        # Drop whatever an interrupted append wrote past the last complete block
+        for name, size in self._column_sizes():
+            path = os.path.join(self.directory, name)
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                os.truncate(path, size)
+
+    def _column_sizes(self):
+        """
+        (file name, size in bytes) of every column for the rows in the manifest.
+        """
+        rows = self.manifest['rows']
+        sizes = [('times_et.f8', 8 * rows), ('positions.f8', 24 * rows), ('flags.i1', rows)]
+        for station in self.manifest['stations']:
+            sizes += [(f'{station}.az.f8', 8 * rows), (f'{station}.el.f8', 8 * rows),
+                      (f'{station}.range.f8', 8 * rows), (f'{station}.visible.b1', rows),
+                      (f'{station}.windows.f8', 16 * self.manifest['windows'][station])]
+        return sizes
+
+    def _column(self, name, dtype, shape=None):
+        return np.memmap(os.path.join(self.directory, name), dtype=dtype, mode='r',
+                         shape=shape or (self.manifest['rows'],))
+
+    def last_epoch(self):
+        """
+        ET of the last stored row, or None for an empty store.
+        """
+        if self.manifest['rows'] == 0:
+            return None
+        return float(self._column('times_et.f8', np.float64)[-1])
+
+    def resume_point(self, et_start, step_seconds, n_total):
+        """
+        (first_epoch, open_windows) for stream_visibility to continue a run of n_total
+        epochs on the grid et_start + k * step_seconds after the stored rows.
+        Raises ValueError if the store holds a different grid.
+        """
+        rows = self.manifest['rows']
+        if rows == 0:
+            return 0, None
+        times_et = self._column('times_et.f8', np.float64)
+        if times_et[0] != et_start or (rows > 1 and not np.isclose(times_et[1] - times_et[0], step_seconds)):
+            raise ValueError(f"{self.directory} holds a run with a different start or step; "
+                             f"use another directory")
+        if rows >= n_total:
+            return rows, None
+
+        # A window still open at the last stored row starts at the beginning of its run
+        open_windows = {}
+        for station in self.manifest['stations']:
+            visible = self._column(f'{station}.visible.b1', np.bool_)
+            if not visible[-1]:
+                continue
+            hidden = np.flatnonzero(~visible)
+            open_windows[station] = float(times_et[hidden[-1] + 1 if len(hidden) else 0])
+
+            # If the previous run ended inside this window it was closed there; take
+            # it back so the resumed run stores it once, with its real end
+            n_windows = self.manifest['windows'][station]
+            if n_windows and self._column(f'{station}.windows.f8', np.float64, (n_windows, 2))[-1, 1] == times_et[-1]:
+                self.manifest['windows'][station] -= 1
+                self._write_manifest()
+                os.truncate(os.path.join(self.directory, f'{station}.windows.f8'), 16 * (n_windows - 1))
+        return rows, open_windows
+
+    def _write_manifest(self):
+        # Written atomically, so readers see either the old or the new row counts
+        tmp_path = self.manifest_path + f'.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _append(self, name, array):
+        with open(os.path.join(self.directory, name), 'ab') as f:
+            f.write(np.ascontiguousarray(array).tobytes())
+
+    def append(self, block):
+        """
+        Writes one VisibilityBlock to the end of the store. Raises ValueError if the
+        block does not start after the last stored epoch.
+        """
+        last_et = self.last_epoch()
+        if last_et is not None and block.times_et[0] <= last_et:
+            raise ValueError(f"Block starting at ET {block.times_et[0]:.3f} overlaps the stored "
+                             f"rows (last ET {last_et:.3f})")
+
+        self._append('times_et.f8', block.times_et.astype(np.float64))
+        self._append('positions.f8', np.asarray(block.positions_T, dtype=np.float64).T)
+        self._append('flags.i1', block.visibility_flags.astype(np.int8))
+
+        for station in self.manifest['stations']:
+            track = block.visibility_data[station]
+            self._append(f'{station}.az.f8', track.az_deg)
+            self._append(f'{station}.el.f8', track.el_deg)
+            self._append(f'{station}.range.f8', track.range_km)
+            self._append(f'{station}.visible.b1', track.visible)
+            windows = np.asarray(block.closed_windows[station], dtype=np.float64).reshape(-1, 2)
+            self._append(f'{station}.windows.f8', windows)
+            self.manifest['windows'][station] += len(windows)
+
+        self.manifest['rows'] += len(block.times_et)
+
+        # Update the row count last so readers never see a partial block
+        self._write_manifest()
+
+def open_visibility_store(directory):
+    """
+    Memory-maps a VisibilityStore. Returns (positions (N, 3), VisibilityResult,
+    visibility_flags, windows {station: (K, 2) [start_et, end_et]}) without
+    reading the columns into memory.
+    """
+    directory = os.path.abspath(directory)
+    with open(os.path.join(directory, 'manifest.json')) as f:
+        manifest = json.load(f)
+    rows = manifest['rows']
+
+    def column(name, dtype, shape):
+        if shape[0] == 0:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(os.path.join(directory, name), dtype=dtype, mode='r', shape=shape)
+
+    times_et = column('times_et.f8', np.float64, (rows,))
+    positions = column('positions.f8', np.float64, (rows, 3))
+    flags = column('flags.i1', np.int8, (rows,))
+
+    tracks = {}
+    windows = {}
+    for station in manifest['stations']:
+        tracks[station] = StationTrack(
+            station, times_et,
+            column(f'{station}.az.f8', np.float64, (rows,)),
+            column(f'{station}.el.f8', np.float64, (rows,)),
+            column(f'{station}.range.f8', np.float64, (rows,)),
+            column(f'{station}.visible.b1', np.bool_, (rows,))
+        )
+        windows[station] = column(f'{station}.windows.f8', np.float64, (manifest['windows'][station], 2))
+
+    return positions, VisibilityResult(times_et, tracks), flags, windows
+
+def run_visibility_stream(utc_start, utc_end, step_seconds, directory, block_size=86400, cache=None):
+    """
+    Streams a visibility run straight into a VisibilityStore at `directory`,
+    continuing after the rows already stored there (e.g. by an interrupted run).
+    Returns the number of epochs in the store.
+    """
+    store = VisibilityStore(directory)
+    with JWST_KERNELS:
+        et_start = spice.str2et(utc_start)
+        n_total = int(np.floor((spice.str2et(utc_end) - et_start) / step_seconds)) + 1
+    first_epoch, open_windows = store.resume_point(et_start, step_seconds, n_total)
+    if first_epoch:
+        print(f"Resuming after {first_epoch} stored epochs")
+
+    for block in stream_visibility(utc_start, utc_end, step_seconds, block_size, cache,
+                                   first_epoch, open_windows):
+        store.append(block)
+        print(f"Block {block.index}: {spice.et2utc(block.times_et[-1], 'ISOC', 0)} "
+              f"({store.manifest['rows']} epochs written)")
+    return store.manifest['rows']
+
+# --- Main Execution ---
+if __name__ == "__main__":
+
+    UTC_START = '2025-06-01'
+    UTC_END = '2025-12-31'
+    STEP_SECONDS = 60.0
+    OUTPUT_DIR = 'visibility_store'
+
+    run_visibility_stream(UTC_START, UTC_END, STEP_SECONDS, OUTPUT_DIR)
+
+    positions, visibility_data, visibility_flags, windows = open_visibility_store(OUTPUT_DIR)
+    for station, station_windows in windows.items():
+        print(f"{station}: {len(station_windows)} windows, "
+              f"{visibility_data[station].total_contact_time() / 3600:.1f} h of contact")
+
+    JWST_KERNELS.unload()
@@ -0,0 +1,184 @@
+import spiceypy as spice
+import numpy as np
+
+from jwst_visibility import (
+    DSN_STATIONS, JWST_KERNELS, MIN_ELEVATION_DEG, calculate_station_geometry, lookup_body_id
+)
+from spice_tools.time_scale import et_to_iso
+
+def elevation_margin(target_id, times_et, station_frame, station_id, min_elevation_rad):
+    """
+    Elevation of the target above the elevation mask (radians) at each epoch.
+    Epochs SPICE cannot evaluate count as below the mask.
+    """
+    _, _, el_rad = calculate_station_geometry(target_id, times_et, station_frame, station_id)
+    return np.where(np.isnan(el_rad), -np.inf, el_rad - min_elevation_rad)
+
+def refine_crossings(margin_func, t_a, t_b, a_is_visible, tolerance):
+    """
+    Bisects every horizon-crossing bracket [t_a, t_b] at the same time.
+    margin_func takes an array of epochs, so each iteration is one batched SPICE pass.
+    Returns the crossing epochs, accurate to `tolerance` seconds.
+    """
+    t_a = np.array(t_a, dtype=float)
+    t_b = np.array(t_b, dtype=float)
+    a_is_visible = np.asarray(a_is_visible, dtype=bool)
+
+    if t_a.size == 0:
+        return t_a
+
+    while np.max(t_b - t_a) > tolerance:
+        t_mid = 0.5 * (t_a + t_b)
+        mid_is_visible = margin_func(t_mid) > 0.0
+
+        # Keep the half of each bracket where the visibility state still changes
+        same_as_a = mid_is_visible == a_is_visible
+        t_a = np.where(same_as_a, t_mid, t_a)
+        t_b = np.where(same_as_a, t_b, t_mid)
+
+    return 0.5 * (t_a + t_b)
+
+def refine_maxima(elevation_func, t_a, t_b, tolerance):
+    """
+    Golden-section search for the peak elevation inside every bracket [t_a, t_b]
+    at the same time. Returns the epochs and values of the maxima.
+    """
+    t_a = np.array(t_a, dtype=float)
+    t_b = np.array(t_b, dtype=float)
+
+    if t_a.size == 0:
+        return t_a, t_a.copy()
+
+    inv_phi = (np.sqrt(5.0) - 1.0) / 2.0
+    t_c = t_b - inv_phi * (t_b - t_a)
+    t_d = t_a + inv_phi * (t_b - t_a)
+    f_c = elevation_func(t_c)
+    f_d = elevation_func(t_d)
+
+    while np.max(t_b - t_a) > tolerance:
+        # Where f_c > f_d the peak is in [t_a, t_d], otherwise in [t_c, t_b]
+        left = f_c > f_d
+        t_b = np.where(left, t_d, t_b)
+        t_a = np.where(left, t_a, t_c)
+
+        # One of the two interior points carries over, the other is new
+        t_new = np.where(left, t_b - inv_phi * (t_b - t_a), t_a + inv_phi * (t_b - t_a))
+        f_new = elevation_func(t_new)
+
+        t_c, t_d, f_c, f_d = (
+            np.where(left, t_new, t_d),
+            np.where(left, t_c, t_new),
+            np.where(left, f_new, f_d),
+            np.where(left, f_c, f_new),
+        )
+
+    t_peak = 0.5 * (t_a + t_b)
+    return t_peak, elevation_func(t_peak)
+
+def find_station_windows(target_id, station_frame, station_id, et_start, et_end,
+                         coarse_step=600.0, tolerance=0.01, min_elevation_deg=MIN_ELEVATION_DEG):
+    """
+    Finds the visibility windows of a target from one station between et_start and et_end.
+
+    A coarse scan every `coarse_step` seconds brackets each rise and set, and the
+    brackets are then bisected down to `tolerance` seconds. Windows or gaps shorter
+    than `coarse_step` can be missed, so choose it smaller than the shortest pass.
+    Returns a list of (rise_et, set_et, max_elevation_deg) tuples.
+    """
+    min_elevation_rad = np.deg2rad(min_elevation_deg)
+
+    def margin_func(times):
+        return elevation_margin(target_id, times, station_frame, station_id, min_elevation_rad)
+
+    def elevation_func(times):
+        return margin_func(times) + min_elevation_rad
+
+    # --- Step 1: Coarse scan ---
+    times_et = np.arange(et_start, et_end, coarse_step)
+    times_et = np.append(times_et, et_end)
+    margins = margin_func(times_et)
+    visible = margins > 0.0
+
+    # --- Step 2: Bracket and refine every horizon crossing ---
+    k = np.flatnonzero(visible[:-1] != visible[1:]) # crossing between k and k+1
+    crossings = refine_crossings(margin_func, times_et[k], times_et[k + 1], visible[k], tolerance)
+
+    is_rise = ~visible[k]
+    rises = list(crossings[is_rise])
+    sets = list(crossings[~is_rise])
+
+    # A window already open at the start (or still open at the end) is clipped to the span
+    if visible[0]:
+        rises.insert(0, et_start)
+    if visible[-1]:
+        sets.append(et_end)
+
+    if not rises:
+        return []
+
+    rises = np.array(rises)
+    sets = np.array(sets)
+
+    # --- Step 3: Refine the peak elevation of each window ---
+    # Bracket the peak by the coarse samples either side of the highest sample in the window
+    peak_a = np.empty(len(rises))
+    peak_b = np.empty(len(rises))
+    for j, (rise, set_) in enumerate(zip(rises, sets)):
+        i0 = np.searchsorted(times_et, rise, side='left')
+        i1 = np.searchsorted(times_et, set_, side='right')
+        i_peak = i0 + np.argmax(margins[i0:i1])
+        peak_a[j] = max(rise, times_et[max(i_peak - 1, 0)])
+        peak_b[j] = min(set_, times_et[min(i_peak + 1, len(times_et) - 1)])
+
+    # Elevation is flat near the peak, so a 1 s bracket is already far below the
+    # angular precision we care about
+    _, peak_el = refine_maxima(elevation_func, peak_a, peak_b, max(tolerance, 1.0))
+
+    return list(zip(rises, sets, np.rad2deg(peak_el)))
+
+def calculate_visibility_windows(utc_start, utc_end, coarse_step=600.0, tolerance=0.01):
+    """
+    Calculates JWST rise/set windows for every DSN station.
+    Returns a dict of station name -> list of (rise_et, set_et, max_elevation_deg).
+    """
+    try:
+        JWST_KERNELS.acquire()
+    except Exception as e:
+        print(f"Error loading kernels: {e}")
+        return None
+
+    try:
+        et_start = spice.str2et(utc_start)
+        et_end = spice.str2et(utc_end)
+
+        JWST_ID = lookup_body_id('JWST', '-170')
+
+        windows = {}
+        for station_name, (station_frame, station_id) in DSN_STATIONS.items():
+            windows[station_name] = find_station_windows(
+                JWST_ID, station_frame, station_id, et_start, et_end,
+                coarse_step=coarse_step, tolerance=tolerance
+            )
+
+        return windows
+    finally:
+        JWST_KERNELS.release()
+
+# --- Main Execution ---
+if __name__ == "__main__":
+
+    UTC_START = '2025-06-01'
+    UTC_END = '2025-12-31'
+
+    windows = calculate_visibility_windows(UTC_START, UTC_END)
+
+    if windows is not None:
+        for station_name, station_windows in windows.items():
+            print(f"\n{station_name}: {len(station_windows)} windows")
+            # Every rise/set time of the station converted to UTC in one call
+            station_windows = np.asarray(station_windows, dtype=float).reshape(-1, 3)
+            rise_utc, set_utc = et_to_iso(station_windows[:, :2].T, unit='ms')
+            for rise, set_, max_el in zip(rise_utc, set_utc, station_windows[:, 2]):
+                print(f"  {rise}  ->  {set_}   max elevation {max_el:6.2f} deg")
+
+        JWST_KERNELS.unload()
@@ -0,0 +1,167 @@
+"""
+Headless batch rendering of every tutorial figure.
+
+Computes the JWST and/or Gateway data once in this process, then renders all
+figures with the Agg backend in a pool of worker processes, e.g.
+
+    python batch_render.py --scenario all --start 2025-06-01 --end 2025-12-31 --step 600 --output-dir products
+"""
+import os
+import sys
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# No display on batch nodes: select Agg before any module imports pyplot
+import matplotlib
+matplotlib.use('Agg')
+
+import spiceypy as spice
+
+# The tutorials live in their own folders next to spice_tools
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(PROJECT_DIR)
+sys.path.append(os.path.join(PROJECT_DIR, 'JWST_Visibility'))
+sys.path.append(os.path.join(PROJECT_DIR, 'Gateway_Orbit'))
+
+from spice_tools.ephemeris_cache import EphemerisCache
+import jwst_visibility
+import Gateway_Orbit
+import Gateway_Orbit_ECI
+import Gateway_Orbit_SCI
+
+# Default time window and number of samples of each figure when not given on the command line
+JWST_DEFAULTS = ('2025-06-01', '2025-12-31', 10000)
+GATEWAY_DEFAULTS = {
+    'rotating': ('2020-01-05 T00:00:00', '2020-03-05 T00:00:00', 2000),
+    'eci':      ('2020-01-05 T00:00:00', '2020-03-05 T00:00:00', 2000),
+    'sci':      ('2020-01-05 T00:00:00', '2021-01-05 T00:00:00', 2000),
+}
+
+def time_grid(kernels, defaults, start, end, step):
+    """
+    (utc_start, utc_end, N) for one figure. Missing arguments fall back to `defaults`;
+    a step in seconds is turned into the nearest number of evenly spaced samples.
+    """
+    default_start, default_end, default_steps = defaults
+    utc_start = start or default_start
+    utc_end = end or default_end
+    if not step:
+        return utc_start, utc_end, default_steps
+
+    with kernels:
+        span = spice.str2et(utc_end) - spice.str2et(utc_start)
+    return utc_start, utc_end, int(round(span / step)) + 1
+
+def jwst_jobs(args, cache):
+    """
+    Runs the JWST visibility and rotating-frame calculations once and returns
+    the render jobs for its four figures.
+    """
+    utc_start, utc_end, steps = time_grid(jwst_visibility.JWST_KERNELS, JWST_DEFAULTS,
+                                          args.start, args.end, args.step)
+
+    positions_T, visibility_data, times_utc, visibility_flags = jwst_visibility.calculate_visibility(
+        utc_start, utc_end, steps, workers=args.workers, cache=cache
+    )
+    if positions_T is None:
+        print("JWST calculation failed, skipping its figures.")
+        return []
+
+    rot_x, rot_y, rot_z = jwst_visibility.calculate_rotating_frame_data(
+        utc_start, utc_end, steps, cache=cache,
+        positions_T=positions_T, visibility_data=visibility_data
+    )
+
+    out = args.output_dir
+    return [
+        (jwst_visibility.plot_orbit_3d, (positions_T, visibility_flags),
+         {'filename': os.path.join(out, 'jwst_orbit_3d.jpg')}),
+        (jwst_visibility.plot_visibility_timeline, (visibility_data, times_utc),
+         {'filename': os.path.join(out, 'jwst_visibility_timeline.jpg')}),
+        (jwst_visibility.plot_sky_tracks, (visibility_data,),
+         {'filename': os.path.join(out, 'jwst_sky_tracks.jpg')}),
+        (jwst_visibility.plot_rotating_frame, (rot_x, rot_y, rot_z, visibility_flags),
+         {'filename': os.path.join(out, 'jwst_rotating_frame.jpg')}),
+    ]
+
+def gateway_jobs(args, cache):
+    """
+    Runs the three Gateway state calculations once and returns their render jobs.
+    """
+    kernels = Gateway_Orbit.GATEWAY_KERNELS
+    out = args.output_dir
+    jobs = []
+
+    utc_start, utc_end, N = time_grid(kernels, GATEWAY_DEFAULTS['rotating'], args.start, args.end, args.step)
+    r_dsg_rot, _, _ = Gateway_Orbit.calculate_rotating_frame(utc_start, utc_end, N, cache=cache)
+    jobs.append((Gateway_Orbit.plot_rotating_frame, (r_dsg_rot,),
+                 {'filename': os.path.join(out, 'Gateway_Orbit.jpeg')}))
+
+    utc_start, utc_end, N = time_grid(kernels, GATEWAY_DEFAULTS['eci'], args.start, args.end, args.step)
+    r_dsg_eci, r_moon_eci, _ = Gateway_Orbit_ECI.calculate_eci_states(utc_start, utc_end, N, cache=cache)
+    jobs.append((Gateway_Orbit_ECI.plot_eci, (r_dsg_eci, r_moon_eci),
+                 {'filename': os.path.join(out, 'Gateway_Orbit_ECI.jpeg')}))
+
+    utc_start, utc_end, N = time_grid(kernels, GATEWAY_DEFAULTS['sci'], args.start, args.end, args.step)
+    r_dsg_sun, r_earth_sun, r_moon_sun, _ = Gateway_Orbit_SCI.calculate_sci_states(utc_start, utc_end, N, cache=cache)
+    jobs.append((Gateway_Orbit_SCI.plot_sci, (r_dsg_sun, r_earth_sun, r_moon_sun),
+                 {'filename': os.path.join(out, 'Gateway_Orbit_SCI.jpeg')}))
+
+    return jobs
+
+def render(job):
+    """
+    Runs one plotting job in a worker process. Returns (filename, seconds).
+    """
+    plot_func, plot_args, plot_kwargs = job
+    start = time.perf_counter()
+    plot_func(*plot_args, **plot_kwargs)
+    return plot_kwargs['filename'], time.perf_counter() - start
+
+def render_all(jobs, workers=None):
+    """
+    Renders every job in parallel. Plotting only needs the precomputed arrays,
+    so the workers never touch SPICE.
+    """
+    workers = max(1, min(workers or os.cpu_count() or 1, len(jobs)))
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        for filename, seconds in pool.map(render, jobs):
+            print(f"Rendered {filename} in {seconds:.1f} s")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Render all JWST and Gateway figures without a display.")
+    parser.add_argument('--scenario', choices=['jwst', 'gateway', 'all'], default='all',
+                        help="which figures to render (default: all)")
+    parser.add_argument('--start', help="UTC start time (default: each figure's tutorial window)")
+    parser.add_argument('--end', help="UTC end time (default: each figure's tutorial window)")
+    parser.add_argument('--step', type=float,
+                        help="time step in seconds (default: each figure's tutorial sample count)")
+    parser.add_argument('--output-dir', default='products', help="directory for the figures (default: products)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help="worker processes for calculation and rendering (default: all cores)")
+    parser.add_argument('--no-cache', action='store_true', help="always recompute ephemerides with SPICE")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    os.makedirs(args.output_dir, exist_ok=True)
+    cache = None if args.no_cache else EphemerisCache()
+
+    start = time.perf_counter()
+    jobs = []
+    if args.scenario in ('jwst', 'all'):
+        jobs += jwst_jobs(args, cache)
+    if args.scenario in ('gateway', 'all'):
+        jobs += gateway_jobs(args, cache)
+    print(f"Data computed in {time.perf_counter() - start:.1f} s, rendering {len(jobs)} figures...")
+
+    render_all(jobs, args.workers)
+
+    jwst_visibility.JWST_KERNELS.unload()
+    Gateway_Orbit.GATEWAY_KERNELS.unload()
+    print(f"Done in {time.perf_counter() - start:.1f} s")
+
+if __name__ == "__main__":
+    main()
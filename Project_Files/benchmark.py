@@ -0,0 +1,324 @@
+"""
+Benchmark suite for the JWST and Gateway calculations.
+
+Runs offline against the kernels listed in JWST_Visibility/jwst_meta.txt and
+Gateway_Orbit/gateway_meta.txt. Every case runs in a fresh process and records
+wall time, SPICE calls and epochs per second and peak RSS, plus an accuracy check
+of the batched code against the original one-epoch-at-a-time SPICE loops.
+Results are appended to benchmark_history.json so runs can be compared between commits:
+
+    python benchmark.py                # full sweep, 1e3 to 1e6 steps
+    python benchmark.py --quick        # up to 1e4 steps
+    python benchmark.py --compare      # compare the last two runs in the history
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import spiceypy as spice
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(PROJECT_DIR)
+sys.path.append(os.path.join(PROJECT_DIR, 'JWST_Visibility'))
+sys.path.append(os.path.join(PROJECT_DIR, 'Gateway_Orbit'))
+
+from spice_tools.instrumentation import SpiceCallCounter, peak_rss_mb
+
+HISTORY_FILE = os.path.join(PROJECT_DIR, 'benchmark_history.json')
+
+JWST_START = '2025-06-01'
+GATEWAY_START = '2020-01-05 T00:00:00'
+
+ACCURACY_SAMPLES = 500       # epochs re-computed with the scalar reference code
+POSITION_TOLERANCE_KM = 1e-6
+ANGLE_TOLERANCE_DEG = 1e-9
+REGRESSION_THRESHOLD = 1.10  # flag cases more than 10% slower than the previous run
+
+# --- Scalar reference implementations (the original per-epoch loops) ---
+
+def scalar_visibility(times_et, jwst_id, observer_id, stations):
+    """
+    JWST positions (N, 3) and {station: (az_deg, el_deg)} computed one epoch at a time.
+    """
+    positions = np.array([spice.spkpos(jwst_id, t, 'J2000', 'NONE', observer_id)[0] for t in times_et])
+    angles = {}
+    for station_name, (station_frame, station_id) in stations.items():
+        az_el = []
+        for t in times_et:
+            state, _ = spice.spkezr(jwst_id, t, station_frame, 'LT+S', station_id)
+            _, az, el = spice.recrad(state[:3])
+            az_el.append((np.rad2deg(az), np.rad2deg(el)))
+        angles[station_name] = np.array(az_el)
+    return positions, angles
+
+def scalar_sun_earth_frame(times_et, jwst_id, earth_id, sun_id):
+    """
+    JWST in the Sun-Earth rotating frame with spice.twovec/mxv, one epoch at a time.
+    """
+    rotated = []
+    for t in times_et:
+        pos_jwst_earth, _ = spice.spkpos(jwst_id, t, 'J2000', 'NONE', earth_id)
+        state_earth_sun, _ = spice.spkezr(earth_id, t, 'J2000', 'NONE', sun_id)
+        transform_matrix = spice.twovec(state_earth_sun[:3], 1, spice.vcrss(state_earth_sun[:3], state_earth_sun[3:]), 3)
+        rotated.append(spice.mxv(transform_matrix, pos_jwst_earth))
+    return np.array(rotated)
+
+def scalar_earth_moon_frame(times_et, dsg_id, earth_id, moon_id):
+    """
+    DSG in the Moon-centered Earth-Moon rotating frame with the per-sample matrix loop.
+    """
+    rotated = []
+    for t in times_et:
+        r_dsg_moon = spice.spkezr(dsg_id, t, 'J2000', 'NONE', moon_id)[0][:3]
+        earth_state = spice.spkezr(earth_id, t, 'J2000', 'NONE', moon_id)[0]
+        x_hat = earth_state[:3] / np.linalg.norm(earth_state[:3])
+        h_vec = np.cross(earth_state[:3], earth_state[3:])
+        z_hat = h_vec / np.linalg.norm(h_vec)
+        y_hat = np.cross(z_hat, x_hat)
+        C_rot_J2000 = np.column_stack((x_hat, y_hat, z_hat))
+        rotated.append(C_rot_J2000.T @ r_dsg_moon)
+    return np.array(rotated)
+
+# --- Benchmark cases (each runs in its own process) ---
+
+def utc_window(start, span_days):
+    et_start = spice.str2et(start)
+    return start, spice.et2utc(et_start + span_days * 86400.0, 'ISOC', 3)
+
+def accuracy_indices(steps):
+    return np.unique(np.linspace(0, steps - 1, min(steps, ACCURACY_SAMPLES)).astype(int))
+
+def case_visibility(case):
+    import jwst_visibility as jv
+
+    # Benchmark with the first `stations` antennas only
+    jv.DSN_STATIONS = dict(list(jv.DSN_STATIONS.items())[:case['stations']])
+
+    with jv.JWST_KERNELS:
+        utc_start, utc_end = utc_window(JWST_START, case['span_days'])
+
+        def run():
+            return jv.calculate_visibility(utc_start, utc_end, case['steps'])
+
+        def check(result):
+            positions_T, visibility_data, _, _ = result
+            idx = accuracy_indices(case['steps'])
+            jwst_id = jv.lookup_body_id('JWST', '-170')
+            observer_id = jv.lookup_body_id('SUN_EARTH_BARYCENTER', '3')
+            positions, angles = scalar_visibility(visibility_data.times_et[idx], jwst_id, observer_id, jv.DSN_STATIONS)
+
+            angle_error = 0.0
+            mask_mismatches = 0
+            for station_name, az_el in angles.items():
+                track = visibility_data[station_name]
+                az_diff = (track.az_deg[idx] - az_el[:, 0] + 180.0) % 360.0 - 180.0
+                angle_error = max(angle_error, np.max(np.abs(az_diff)), np.max(np.abs(track.el_deg[idx] - az_el[:, 1])))
+                mask_mismatches += int(np.sum(track.visible[idx] != (az_el[:, 1] > jv.MIN_ELEVATION_DEG)))
+            return {
+                'position_error_km': float(np.max(np.abs(positions_T.T[idx] - positions))),
+                'angle_error_deg': float(angle_error),
+                'visibility_mismatches': mask_mismatches,
+            }
+
+        return measure(run, check)
+
+def case_rotating_frame(case):
+    import jwst_visibility as jv
+
+    with jv.JWST_KERNELS:
+        utc_start, utc_end = utc_window(JWST_START, case['span_days'])
+
+        def run():
+            return jv.calculate_rotating_frame_data(utc_start, utc_end, case['steps'])
+
+        def check(result):
+            rotated = np.column_stack(result)
+            times = np.linspace(spice.str2et(utc_start), spice.str2et(utc_end), case['steps'])
+            idx = accuracy_indices(case['steps'])
+            reference = scalar_sun_earth_frame(times[idx], str(spice.bodn2c('JWST')), '399', '10')
+            return {'position_error_km': float(np.max(np.abs(rotated[idx] - reference)))}
+
+        return measure(run, check)
+
+def case_gateway_frame(case):
+    import Gateway_Orbit
+
+    with Gateway_Orbit.GATEWAY_KERNELS:
+        utc_start, utc_end = utc_window(GATEWAY_START, case['span_days'])
+
+        def run():
+            return Gateway_Orbit.calculate_rotating_frame(utc_start, utc_end, case['steps'])
+
+        def check(result):
+            r_dsg_rot, _, times = result
+            idx = accuracy_indices(case['steps'])
+            reference = scalar_earth_moon_frame(times[idx], Gateway_Orbit.DSG_ID,
+                                                Gateway_Orbit.EARTH_ID, Gateway_Orbit.MOON_ID)
+            return {'position_error_km': float(np.max(np.abs(r_dsg_rot[idx] - reference)))}
+
+        return measure(run, check)
+
+CASES = {
+    'visibility': case_visibility,
+    'rotating_frame': case_rotating_frame,
+    'gateway_frame': case_gateway_frame,
+}
+
+def measure(run, check):
+    """
+    Times run() with SPICE call counting, then checks its result against the scalar code.
+    """
+    with SpiceCallCounter() as counter:
+        start = time.perf_counter()
+        result = run()
+        wall = time.perf_counter() - start
+    rss = peak_rss_mb()
+
+    accuracy = check(result)
+    accuracy['passed'] = (
+        accuracy.get('position_error_km', 0.0) <= POSITION_TOLERANCE_KM
+        and accuracy.get('angle_error_deg', 0.0) <= ANGLE_TOLERANCE_DEG
+        and accuracy.get('visibility_mismatches', 0) == 0
+    )
+
+    return {
+        'wall_s': wall,
+        'spice_calls': counter.total_calls,
+        'spice_epochs': counter.total_epochs,
+        'spice_calls_per_s': counter.total_calls / wall,
+        'spice_epochs_per_s': counter.total_epochs / wall,
+        'calls_by_routine': {name: count for name, count in counter.calls.items() if count},
+        'peak_rss_mb': rss,
+        'accuracy': accuracy,
+    }
+
+def run_case(case):
+    """
+    Process entry point: runs one case and returns the case with its measurements.
+    """
+    return dict(case, **CASES[case['name']](case))
+
+# --- Sweep, history and comparison ---
+
+def case_key(case):
+    return f"{case['name']}[steps={case['steps']},span={case['span_days']}d,stations={case.get('stations', '-')}]"
+
+def build_sweep(max_steps):
+    """
+    One-axis-at-a-time sweep over step counts, span lengths and station counts.
+    """
+    step_counts = [n for n in (1000, 10000, 100000, 1000000) if n <= max_steps]
+    cases = []
+    for steps in step_counts:
+        cases.append({'name': 'visibility', 'steps': steps, 'span_days': 180, 'stations': 3})
+    for span_days in (7, 30, 365):
+        cases.append({'name': 'visibility', 'steps': min(10000, max_steps), 'span_days': span_days, 'stations': 3})
+    for stations in (1, 2):
+        cases.append({'name': 'visibility', 'steps': min(10000, max_steps), 'span_days': 180, 'stations': stations})
+    for steps in step_counts:
+        cases.append({'name': 'rotating_frame', 'steps': steps, 'span_days': 180})
+    for steps in step_counts:
+        cases.append({'name': 'gateway_frame', 'steps': steps, 'span_days': 60})
+    return cases
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+def save_history(path, history):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(history, f, indent=1)
+    os.replace(tmp_path, path)
+
+def compare_runs(previous, current):
+    """
+    Prints the wall time of every case in `current` next to `previous`.
+    Returns the keys of cases that got slower than REGRESSION_THRESHOLD.
+    """
+    before = {case_key(result): result for result in previous['results']}
+    regressions = []
+    print(f"\n{'case':<60} {'before':>9} {'after':>9} {'ratio':>7}")
+    for result in current['results']:
+        key = case_key(result)
+        if key not in before:
+            print(f"{key:<60} {'-':>9} {result['wall_s']:>8.2f}s")
+            continue
+        ratio = result['wall_s'] / before[key]['wall_s']
+        flag = '  <-- slower' if ratio > REGRESSION_THRESHOLD else ''
+        print(f"{key:<60} {before[key]['wall_s']:>8.2f}s {result['wall_s']:>8.2f}s {ratio:>6.2f}x{flag}")
+        if ratio > REGRESSION_THRESHOLD:
+            regressions.append(key)
+    return regressions
+
+def run_benchmarks(cases):
+    """
+    Runs every case in a fresh process (so peak RSS belongs to that case alone).
+    """
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for case in cases:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            result = pool.submit(run_case, case).result()
+        results.append(result)
+        status = 'ok' if result['accuracy']['passed'] else 'ACCURACY FAILED'
+        print(f"{case_key(case):<60} {result['wall_s']:>8.2f} s {result['spice_epochs_per_s']:>12.0f} epochs/s "
+              f"{result['peak_rss_mb'] or 0:>8.0f} MB  {status}")
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the JWST and Gateway calculations.")
+    parser.add_argument('--quick', action='store_true', help="only sweep up to 1e4 steps")
+    parser.add_argument('--max-steps', type=int, default=1000000, help="largest step count to run")
+    parser.add_argument('--cases', nargs='+', choices=sorted(CASES), help="only run these benchmarks")
+    parser.add_argument('--history', default=HISTORY_FILE, help="JSON history file")
+    parser.add_argument('--compare', action='store_true', help="compare the last two runs and exit")
+    args = parser.parse_args(argv)
+
+    history = load_history(args.history)
+    if args.compare:
+        if len(history) < 2:
+            print("Need at least two runs in the history to compare.")
+            return 1
+        return 1 if compare_runs(history[-2], history[-1]) else 0
+
+    max_steps = min(args.max_steps, 10000) if args.quick else args.max_steps
+    cases = [case for case in build_sweep(max_steps) if not args.cases or case['name'] in args.cases]
+
+    run = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'spiceypy': spice.__version__,
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'results': run_benchmarks(cases),
+    }
+
+    if history:
+        compare_runs(history[-1], run)
+    history.append(run)
+    save_history(args.history, history)
+    print(f"\nSaved to {args.history}")
+
+    return 0 if all(result['accuracy']['passed'] for result in run['results']) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,3 @@
+"""
+Shared SPICE helpers used by both the JWST_Visibility and Gateway_Orbit tutorials.
+"""
@@ -0,0 +1,126 @@
+import numpy as np
+
+class AdaptiveSamples:
+    """
+    Non-uniform epochs chosen by adaptive_times and the sample_func values at them.
+    evaluations counts every epoch sample_func was called on, including the
+    midpoints that were only used to check the error and the samples that
+    decimate_samples dropped, so it is larger than len(times_et).
+    """
+
+    def __init__(self, times_et, values, evaluations, tolerance):
+        self.times_et = times_et
+        self.values = values
+        self.evaluations = evaluations
+        self.tolerance = tolerance
+
+    def __len__(self):
+        return len(self.times_et)
+
+    def report(self):
+        return (f"{len(self.times_et)} adaptive samples ({self.evaluations} evaluations) "
+                f"for a chord error below {self.tolerance:g}")
+
+def chord_errors(left, right, middle, vector_size=3):
+    """
+    Distance of the true midpoint values from the straight chord between the ends,
+    the largest over every vector_size group of columns (e.g. one per body).
+    """
+    deviation = np.asarray(middle) - 0.5 * (np.asarray(left) + np.asarray(right))
+    deviation = deviation.reshape(len(deviation), -1, vector_size)
+    return np.linalg.norm(deviation, axis=2).max(axis=1)
+
+def decimate_samples(times, values, keep, tolerance, vector_size=3):
+    """
+    Drops kept samples (keep is a boolean mask over times) whose neighbours can be
+    joined by a straight line that stays within `tolerance` of every sample in
+    between, kept or not. Each pass tries every other kept sample, so the segments
+    being merged never overlap and the passes alternate until nothing changes.
+    Returns the new keep mask.
+    """
+    keep = keep.copy()
+    samples = np.arange(len(times))
+    idle_passes, parity = 0, 0
+    while idle_passes < 2:
+        kept = np.flatnonzero(keep)
+        k = np.arange(1 + parity, len(kept) - 1, 2)
+        parity = 1 - parity
+        if len(k) == 0:
+            idle_passes += 1
+            continue
+        before, candidate, after = kept[k - 1], kept[k], kept[k + 1]
+
+        # Every sample strictly inside [before, after] of some candidate
+        segment = np.searchsorted(before, samples, side='right') - 1
+        inside = (segment >= 0) & (samples < after[np.maximum(segment, 0)])
+        inside &= samples > before[np.maximum(segment, 0)]
+        j, segment = samples[inside], segment[inside]
+
+        # Distance of each of them from the chord that would replace the candidate
+        t0, t1 = times[before[segment]], times[after[segment]]
+        fraction = ((times[j] - t0) / (t1 - t0))[:, None]
+        chord = values[before[segment]] + fraction * (values[after[segment]] - values[before[segment]])
+        deviation = (values[j] - chord).reshape(len(j), -1, vector_size)
+        errors = np.linalg.norm(deviation, axis=2).max(axis=1)
+
+        worst = np.zeros(len(k))
+        np.maximum.at(worst, segment, errors)
+        # NaN (no ephemeris) never compares as within tolerance
+        removable = worst <= tolerance
+        keep[candidate[removable]] = False
+        idle_passes = 0 if removable.any() else idle_passes + 1
+    return keep
+
+def adaptive_times(sample_func, et_start, et_end, tolerance, n_initial=64, min_step=1.0,
+                   vector_size=3, decimate=True):
+    """
+    Epochs between et_start and et_end at which straight lines between consecutive
+    samples of sample_func stay within `tolerance` (same units, e.g. km) of the curve.
+
+    sample_func takes an array of epochs and returns an (N, dims) array, e.g. the
+    positions of one or more bodies side by side. The span starts as n_initial
+    uniform samples; each interval is checked at its midpoint and split there if the
+    chord error is above tolerance, down to min_step seconds. Smooth stretches keep
+    the coarse spacing, while tight turns (like the NRHO perilune) get refined. All
+    intervals of one refinement level share one sample_func call.
+
+    The chord error of an interval of length h is about h^2 * |acceleration| / 8, so
+    this refines exactly where the trajectory curves fastest.
+
+    With decimate, decimate_samples then coarsens the result: samples (including
+    the starting grid) are dropped wherever the remaining chords still pass within
+    tolerance of every evaluated sample, so smooth stretches end up sparser than
+    n_initial. Pass an EphemerisCache to sample_func to reuse the evaluations
+    on a re-run.
+    """
+    times = np.linspace(et_start, et_end, n_initial)
+    values = np.asarray(sample_func(times), dtype=float).reshape(len(times), -1)
+    evaluations = len(times)
+
+    all_times, all_values, all_kept = [times], [values], [np.ones(len(times), dtype=bool)]
+    left_t, right_t = times[:-1], times[1:]
+    left_v, right_v = values[:-1], values[1:]
+
+    while len(left_t) > 0:
+        mid_t = 0.5 * (left_t + right_t)
+        mid_v = np.asarray(sample_func(mid_t), dtype=float).reshape(len(mid_t), -1)
+        evaluations += len(mid_t)
+
+        errors = chord_errors(left_v, right_v, mid_v, vector_size)
+        # NaN errors (no ephemeris) are never split
+        split = (errors > tolerance) & (0.5 * (right_t - left_t) >= min_step)
+
+        # Midpoints of split intervals become samples; the others were only checks
+        all_times.append(mid_t)
+        all_values.append(mid_v)
+        all_kept.append(split)
+
+        left_t, right_t = np.concatenate([left_t[split], mid_t[split]]), np.concatenate([mid_t[split], right_t[split]])
+        left_v, right_v = np.concatenate([left_v[split], mid_v[split]]), np.concatenate([mid_v[split], right_v[split]])
+
+    times = np.concatenate(all_times)
+    order = np.argsort(times)
+    times, values, keep = times[order], np.concatenate(all_values)[order], np.concatenate(all_kept)[order]
+    if decimate:
+        keep = decimate_samples(times, values, keep, tolerance, vector_size)
+    return AdaptiveSamples(times[keep], values[keep], evaluations, tolerance)
@@ -0,0 +1,148 @@
+import numpy as np
+import spiceypy as spice
+from numpy.polynomial import chebyshev
+
+def spkpos_sampler(targ, ref, abcorr, obs):
+    """
+    Returns a function of an epoch array that gives spice.spkpos positions,
+    ready to be passed to build_chebyshev_surrogate. For example, the DSG
+    relative to the Moon from the Gateway scripts is
+    spkpos_sampler('-60000', 'J2000', 'NONE', 'MOON').
+    """
+    def sample(times_et):
+        positions, _ = spice.spkpos(targ, times_et, ref, abcorr, obs)
+        return np.asarray(positions)
+    return sample
+
+class ChebyshevSurrogate:
+    """
+    Piecewise Chebyshev approximation of a vector quantity (e.g. a position) over time.
+
+    Segment k covers [breakpoints[k], breakpoints[k + 1]] and holds one set of
+    Chebyshev coefficients per vector component. max_errors[k] is the largest
+    difference from SPICE found at the check points when the segment was fitted.
+    Evaluation is pure NumPy, so millions of epochs cost milliseconds.
+    """
+
+    def __init__(self, breakpoints, coefficients, max_errors, tolerance):
+        self.breakpoints = np.asarray(breakpoints, dtype=float)
+        self.coefficients = np.asarray(coefficients, dtype=float) # (segments, degree + 1, dims)
+        self.max_errors = np.asarray(max_errors, dtype=float)
+        self.tolerance = tolerance
+
+    @property
+    def degree(self):
+        return self.coefficients.shape[1] - 1
+
+    @property
+    def max_error(self):
+        return float(self.max_errors.max())
+
+    def _locate(self, times_et):
+        times_et = np.asarray(times_et, dtype=float)
+        if np.any(times_et < self.breakpoints[0]) or np.any(times_et > self.breakpoints[-1]):
+            raise ValueError("Epochs outside the span covered by the surrogate.")
+
+        # Segment index and position inside the segment mapped to [-1, 1]
+        idx = np.searchsorted(self.breakpoints, times_et, side='right') - 1
+        idx = np.clip(idx, 0, len(self.max_errors) - 1)
+        start = self.breakpoints[idx]
+        end = self.breakpoints[idx + 1]
+        x = 2.0 * (times_et - start) / (end - start) - 1.0
+        return idx, x, end - start
+
+    @staticmethod
+    def _clenshaw(coefficients, idx, x):
+        # Clenshaw recurrence, vectorized over epochs that each use their own segment
+        x = x[..., None]
+        b1 = np.zeros(x.shape[:-1] + (coefficients.shape[2],))
+        b2 = np.zeros_like(b1)
+        for k in range(coefficients.shape[1] - 1, 0, -1):
+            b1, b2 = 2.0 * x * b1 - b2 + coefficients[idx, k], b1
+        return x * b1 - b2 + coefficients[idx, 0]
+
+    def __call__(self, times_et):
+        """
+        Evaluates the surrogate at an epoch (or array of epochs).
+        """
+        idx, x, _ = self._locate(times_et)
+        return self._clenshaw(self.coefficients, idx, x)
+
+    def derivative(self, times_et):
+        """
+        Evaluates the time derivative (e.g. velocity in km/s for a position surrogate).
+        """
+        idx, x, length = self._locate(times_et)
+        deriv_coefficients = chebyshev.chebder(self.coefficients, axis=1)
+        # chebder differentiates with respect to x in [-1, 1]; dx/dt = 2 / segment length
+        return self._clenshaw(deriv_coefficients, idx, x) * (2.0 / length)[..., None]
+
+    def report(self):
+        """
+        Returns one (segment_start_et, segment_end_et, max_error) tuple per segment.
+        """
+        return list(zip(self.breakpoints[:-1], self.breakpoints[1:], self.max_errors))
+
+def build_chebyshev_surrogate(sample_func, et_start, et_end, tolerance, degree=12,
+                              segment_length=86400.0, min_segment_length=60.0):
+    """
+    Fits a piecewise Chebyshev surrogate to sample_func between et_start and et_end.
+
+    sample_func takes an array of epochs and returns an (N, dims) array, e.g. the
+    output of spkpos_sampler. The span starts as segment_length pieces; every piece is
+    interpolated at degree + 1 Chebyshev nodes and checked against sample_func at
+    degree + 2 other points (including both ends). Pieces whose error is above
+    `tolerance` (same units as sample_func) are halved and refitted, down to
+    min_segment_length. All pieces at one refinement level share one sample_func call.
+    """
+    n_nodes = degree + 1
+    nodes = np.cos(np.pi * (np.arange(n_nodes) + 0.5) / n_nodes)  # interpolation points
+    checks = np.cos(np.pi * np.arange(n_nodes + 1) / n_nodes)      # interleaved check points
+
+    # Interpolating on fixed nodes means the fit is one matrix product per segment
+    fit_matrix = np.linalg.pinv(chebyshev.chebvander(nodes, degree))
+    check_matrix = chebyshev.chebvander(checks, degree)
+
+    n_segments = max(1, int(np.ceil((et_end - et_start) / segment_length)))
+    edges = np.linspace(et_start, et_end, n_segments + 1)
+    starts, ends = edges[:-1], edges[1:]
+
+    accepted_starts, accepted_ends, accepted_coeffs, accepted_errors = [], [], [], []
+
+    while len(starts) > 0:
+        mid = 0.5 * (starts + ends)
+        half = 0.5 * (ends - starts)
+        fit_times = mid[:, None] + half[:, None] * nodes[None, :]
+        check_times = mid[:, None] + half[:, None] * checks[None, :]
+
+        samples = np.asarray(sample_func(np.concatenate([fit_times.ravel(), check_times.ravel()])))
+        samples = samples.reshape(len(samples), -1)
+        n_fit = fit_times.size
+        fit_samples = samples[:n_fit].reshape(len(starts), n_nodes, -1)
+        truth = samples[n_fit:].reshape(len(starts), n_nodes + 1, -1)
+
+        coeffs = np.einsum('kn,snd->skd', fit_matrix, fit_samples)
+        approx = np.einsum('mk,skd->smd', check_matrix, coeffs)
+        errors = np.linalg.norm(approx - truth, axis=2).max(axis=1)
+
+        # Keep segments that meet the tolerance, or that cannot be split any further
+        done = (errors <= tolerance) | (half < min_segment_length)
+        accepted_starts.append(starts[done])
+        accepted_ends.append(ends[done])
+        accepted_coeffs.append(coeffs[done])
+        accepted_errors.append(errors[done])
+
+        # Halve the rest and try again
+        split_starts, split_ends, split_mid = starts[~done], ends[~done], mid[~done]
+        starts = np.concatenate([split_starts, split_mid])
+        ends = np.concatenate([split_mid, split_ends])
+
+    seg_starts = np.concatenate(accepted_starts)
+    seg_ends = np.concatenate(accepted_ends)
+    order = np.argsort(seg_starts)
+
+    breakpoints = np.append(seg_starts[order], seg_ends[order][-1])
+    coefficients = np.concatenate(accepted_coeffs)[order]
+    max_errors = np.concatenate(accepted_errors)[order]
+
+    return ChebyshevSurrogate(breakpoints, coefficients, max_errors, tolerance)
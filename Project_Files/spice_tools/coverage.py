@@ -0,0 +1,201 @@
+import numpy as np
+import spiceypy as spice
+
+from spice_tools.kernel_session import loaded_kernel_files
+from spice_tools.time_scale import et_to_iso
+
+# Solar system barycenter: the root of every SPK chain, always available
+SSB_ID = 0
+
+def _window(intervals):
+    """
+    SPICE double precision window holding the given [start, stop] intervals.
+    """
+    window = spice.cell_double(2 * max(len(intervals), 1))
+    for start, stop in intervals:
+        spice.wninsd(start, stop, window)
+    return window
+
+def _intervals(window):
+    """
+    (K, 2) array of the intervals in a SPICE window.
+    """
+    return np.array([spice.wnfetd(window, i) for i in range(spice.wncard(window))]).reshape(-1, 2)
+
+def read_spk_segments(path):
+    """
+    (body, center, start_et, stop_et, first_address, last_address) of every segment
+    in one SPK file, read from the DAF segment summaries without loading any
+    ephemeris data. The addresses locate the segment's data for spice.dafgda.
+    """
+    segments = []
+    handle = spice.dafopr(path)
+    try:
+        spice.dafbfs(handle)
+        while spice.daffna():
+            dc, ic = spice.dafus(spice.dafgs(), 2, 6)
+            segments.append((int(ic[0]), int(ic[1]), float(dc[0]), float(dc[1]), int(ic[4]), int(ic[5])))
+    finally:
+        spice.dafcls(handle)
+    return segments
+
+class SpkCoverage:
+    """
+    Coverage windows of every body in a set of SPK files.
+
+    A body can only be evaluated where one of its segments and the whole chain of
+    centers down to the solar system barycenter have data, so window(body) is the
+    union over the body's segments of [start, stop] intersected with the window of
+    the segment's center. Windows are computed with SPICE's window routines once and
+    cached per body.
+    """
+
+    def __init__(self, spk_files):
+        self.spk_files = list(spk_files)
+        self.segments = {}
+        for path in self.spk_files:
+            for body, center, start, stop, _, _ in read_spk_segments(path):
+                self.segments.setdefault(body, []).append((center, start, stop))
+        self._windows = {SSB_ID: _window([(-spice.dpmax(), spice.dpmax())])}
+
+    def window(self, body, _visiting=()):
+        """
+        SPICE window of the epochs at which `body` (a NAIF ID) can be evaluated.
+        """
+        if body in self._windows:
+            return self._windows[body]
+
+        coverage = spice.cell_double(2)
+        for center, start, stop in self.segments.get(body, []):
+            if center in _visiting: # malformed chain pointing back at itself
+                continue
+            segment = spice.wnintd(_window([(start, stop)]), self.window(center, _visiting + (body,)))
+            coverage = spice.wnunid(coverage, segment)
+
+        self._windows[body] = coverage
+        return coverage
+
+    def intervals(self, body):
+        """
+        (K, 2) array of [start_et, stop_et] coverage intervals of `body`.
+        """
+        return _intervals(self.window(body))
+
+    def pair_intervals(self, target, observer):
+        """
+        Intervals where both target and observer can be evaluated (what spkezr needs).
+        """
+        return _intervals(spice.wnintd(self.window(target), self.window(observer)))
+
+# Coverage of the SPKs that are loaded right now, rebuilt when that set changes
+_coverage = None
+
+def spk_coverage():
+    """
+    SpkCoverage of the currently loaded SPK files.
+    """
+    global _coverage
+    spk_files = loaded_kernel_files('SPK')
+    if _coverage is None or _coverage.spk_files != spk_files:
+        _coverage = SpkCoverage(spk_files)
+    return _coverage
+
+def body_code(name):
+    """
+    NAIF ID of a body name or numeric string, or None if the kernels don't define it.
+    """
+    try:
+        return int(spice.bods2c(str(name)))
+    except Exception:
+        return None
+
+def intervals_mask(times_et, intervals):
+    """
+    True for the epochs that fall inside one of the sorted, disjoint intervals.
+    """
+    times_et = np.asarray(times_et, dtype=float)
+    if len(intervals) == 0:
+        return np.zeros(times_et.shape, dtype=bool)
+    k = np.searchsorted(intervals[:, 0], times_et, side='right') - 1
+    return (k >= 0) & (times_et <= intervals[np.maximum(k, 0), 1])
+
+def coverage_mask(target, observer, times_et):
+    """
+    Boolean mask of the epochs at which SPK data exists for both target and observer.
+    Bodies the kernels can't name are left to SPICE (all epochs count as covered).
+    """
+    target_id, observer_id = body_code(target), body_code(observer)
+    if target_id is None or observer_id is None:
+        return np.ones(np.shape(times_et), dtype=bool)
+    return intervals_mask(times_et, spk_coverage().pair_intervals(target_id, observer_id))
+
+def mask_intervals(mask):
+    """
+    Run-length encodes a boolean mask into (first_index, last_index) pairs,
+    one row per run of consecutive True samples.
+    """
+    padded = np.concatenate(([False], np.asarray(mask, dtype=bool), [False])).astype(np.int8)
+    edges = np.diff(padded)
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1) - 1
+    return np.column_stack([starts, ends])
+
+class CoverageReport:
+    """
+    Which epochs of a time grid have SPK data for a target/observer pair.
+    gaps holds the [first_et, last_et] of every run of uncovered epochs.
+    """
+
+    def __init__(self, target, observer, times_et, covered):
+        self.target = target
+        self.observer = observer
+        self.times_et = np.asarray(times_et, dtype=float)
+        self.covered = covered
+        self.gaps = self.times_et[mask_intervals(~covered)].reshape(-1, 2)
+
+    @property
+    def n_missing(self):
+        return int(np.count_nonzero(~self.covered))
+
+    def __bool__(self):
+        # True when the whole grid is covered
+        return self.n_missing == 0
+
+    def __str__(self):
+        if not self.n_missing:
+            return f"{self.target} from {self.observer}: all {len(self.times_et)} epochs covered"
+        lines = [f"{self.target} from {self.observer}: {self.n_missing} of {len(self.times_et)} "
+                 f"epochs outside SPK coverage (left as NaN)"]
+        for start, stop in et_to_iso(self.gaps, unit='s'):
+            lines.append(f"  gap {start} to {stop}")
+        return '\n'.join(lines)
+
+def coverage_report(target, observer, times_et):
+    """
+    CoverageReport of a time grid for a target/observer pair. Kernels must be loaded.
+    """
+    return CoverageReport(target, observer, times_et, coverage_mask(target, observer, times_et))
+
+def covered_ephemeris(routine, target, times_et, ref, abcorr, observer, cache=None):
+    """
+    Calls spkezr or spkpos (named by `routine`) in one batch on only the epochs that
+    have SPK coverage and returns an (N, 6) or (N, 3) array with NaN rows for the rest,
+    so the result still lines up with times_et. Pass an EphemerisCache as `cache` to
+    reuse results from earlier runs.
+    """
+    times_et = np.atleast_1d(np.asarray(times_et, dtype=float))
+    if len(times_et) == 0:
+        # SPICE rejects an empty batch
+        return np.empty((0, 6 if routine == 'spkezr' else 3))
+    covered = coverage_mask(target, observer, times_et)
+    source = cache or spice
+
+    if covered.all():
+        values, _ = getattr(source, routine)(target, times_et, ref, abcorr, observer)
+        return np.asarray(values, dtype=float)
+
+    values = np.full((len(times_et), 6 if routine == 'spkezr' else 3), np.nan)
+    if covered.any():
+        covered_values, _ = getattr(source, routine)(target, times_et[covered], ref, abcorr, observer)
+        values[covered] = covered_values
+    return values
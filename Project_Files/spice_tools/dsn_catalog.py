@@ -0,0 +1,103 @@
+import numpy as np
+import spiceypy as spice
+
+# Approximate longitude (deg, east positive) of each DSN complex, used to group antennas
+DSN_COMPLEXES = {
+    'Goldstone': -116.9,
+    'Madrid':      -4.2,
+    'Canberra':   149.0,
+}
+
+class DSNStation:
+    """
+    One antenna from DSN_topo.tf: its topocentric frame, NAIF ID, geodetic
+    longitude/latitude (deg) and the DSN complex it belongs to.
+    """
+
+    def __init__(self, name, frame, naif_id, lon_deg, lat_deg, complex_name):
+        self.name = name
+        self.frame = frame
+        self.naif_id = naif_id
+        self.lon_deg = lon_deg
+        self.lat_deg = lat_deg
+        self.complex = complex_name
+
+    def __repr__(self):
+        return (f"DSNStation({self.name!r}, frame={self.frame!r}, id={self.naif_id!r}, "
+                f"lon={self.lon_deg:.3f}, lat={self.lat_deg:.3f}, complex={self.complex!r})")
+
+def nearest_complex(lon_deg):
+    """
+    Name of the DSN complex whose longitude is closest to lon_deg.
+    """
+    gaps = {name: abs((lon_deg - lon + 180.0) % 360.0 - 180.0) for name, lon in DSN_COMPLEXES.items()}
+    return min(gaps, key=gaps.get)
+
+def load_dsn_catalog():
+    """
+    Reads every DSS-nn_TOPO frame defined in the kernel pool (i.e. from DSN_topo.tf,
+    which must already be loaded) and returns {station name: DSNStation}, sorted by name.
+
+    The frame kernel stores each site as TK frame angles (-lon, -(90 - lat), 180),
+    which is where the longitude and latitude come from.
+    """
+    try:
+        variables = spice.gnpool('FRAME_DSS-*_TOPO', 0, 1000)
+    except Exception:
+        # SpiceyPy raises NotFoundError when no variable matches
+        return {}
+
+    catalog = {}
+    for variable in variables:
+        frame = variable[len('FRAME_'):]
+        frame_code = spice.gipool(variable, 0, 1)[0]
+        naif_id = str(spice.gipool(f'FRAME_{frame_code}_CENTER', 0, 1)[0])
+
+        angles = spice.gdpool(f'TKFRAME_{frame}_ANGLES', 0, 3)
+        lon_deg = (-angles[0] + 180.0) % 360.0 - 180.0
+        lat_deg = 90.0 + angles[1]
+
+        name = frame[:-len('_TOPO')]
+        catalog[name] = DSNStation(name, frame, naif_id, lon_deg, lat_deg, nearest_complex(lon_deg))
+
+    return dict(sorted(catalog.items()))
+
+def select_stations(catalog, names=None):
+    """
+    Picks stations from a catalog. `names` may mix station names ('DSS-14') and
+    complex names ('Madrid'); None selects the whole catalog.
+    """
+    if names is None:
+        return dict(catalog)
+    if isinstance(names, str):
+        names = [names]
+
+    selected = {}
+    for name in names:
+        if name in catalog:
+            selected[name] = catalog[name]
+        elif name in DSN_COMPLEXES:
+            selected.update({key: station for key, station in catalog.items() if station.complex == name})
+        else:
+            raise KeyError(f"'{name}' is neither a station in the catalog nor a DSN complex")
+    return selected
+
+def station_table(catalog):
+    """
+    Plain {name: (topocentric frame, NAIF station ID)} mapping, the same shape as
+    DSN_STATIONS in jwst_visibility.py.
+    """
+    return {name: (station.frame, station.naif_id) for name, station in catalog.items()}
+
+def station_positions(catalog, fixed_frame, et):
+    """
+    Body-fixed positions (S, 3) of the stations relative to Earth's center, in km.
+    Rows are NaN for stations without SPK data (they are not in earthstns_*.bsp).
+    """
+    positions = np.full((len(catalog), 3), np.nan)
+    for i, station in enumerate(catalog.values()):
+        try:
+            positions[i], _ = spice.spkpos(station.naif_id, et, fixed_frame, 'NONE', 'EARTH')
+        except Exception:
+            pass
+    return positions
@@ -0,0 +1,159 @@
+import os
+import json
+import hashlib
+
+import numpy as np
+import spiceypy as spice
+
+from spice_tools.kernel_fingerprint import KernelHashIndex
+from spice_tools.kernel_session import loaded_kernel_files
+
+# Cache lives next to the tutorials unless another directory is given
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '.ephemeris_cache')
+DEFAULT_MAX_BYTES = 2 * 1024**3 # 2 GB
+
+class EphemerisCache:
+    """
+    On-disk cache for spkezr/spkpos results, stored as memory-mapped .npy files.
+
+    A result is keyed by the content hashes of all furnished kernels (in load order)
+    together with the target, observer, frame, aberration correction and time grid,
+    so swapping in a new jwst_pred.bsp (or any other kernel) never returns stale data.
+    The kernel part of the key is worked out once per set of loaded files.
+    Least recently used files are evicted once the cache grows past max_bytes.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._kernel_files = None # loaded files the digest below belongs to
+        self._kernel_digest = None
+
+    # --- Keys ---
+
+    def _hash_index_path(self):
+        return os.path.join(self.cache_dir, 'kernel_hashes.json')
+
+    def kernel_hashes(self):
+        """
+        Content hashes of the furnished kernels, in load order (a later SPK takes
+        precedence over an earlier one, so swapping two changes the results).
+        Hashing de440.bsp takes a moment, so hashes are remembered in the shared
+        KernelHashIndex per (path, size, modification time).
+        """
+        index = KernelHashIndex(self._hash_index_path())
+        hashes = index.file_hashes(loaded_kernel_files())
+        index.save()
+        return hashes
+
+    def kernel_digest(self):
+        """
+        One hash of the furnished kernels' contents and load order, recomputed
+        only when the set of loaded files changes.
+        """
+        files = loaded_kernel_files()
+        if files != self._kernel_files:
+            self._kernel_digest = hashlib.sha256(json.dumps(self.kernel_hashes()).encode()).hexdigest()
+            self._kernel_files = files
+        return self._kernel_digest
+
+    def key(self, routine, targ, et, ref, abcorr, obs):
+        """
+        Builds the cache key for one spkezr/spkpos query.
+        """
+        times = np.ascontiguousarray(et, dtype=float)
+        query = {
+            'routine': routine,
+            'kernels': self.kernel_digest(),
+            'targ': str(targ).upper(),
+            'obs': str(obs).upper(),
+            'ref': str(ref).upper(),
+            'abcorr': str(abcorr).upper(),
+            'times': hashlib.sha256(times.tobytes()).hexdigest(),
+            'n': int(times.size),
+        }
+        return hashlib.sha256(json.dumps(query, sort_keys=True).encode()).hexdigest()
+
+    # --- Storage ---
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + '.npy')
+
+    def _load(self, key):
+        path = self._path(key)
+        try:
+            data = np.load(path, mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+        os.utime(path) # mark as recently used for LRU eviction
+        return data
+
+    def _store(self, key, data):
+        path = self._path(key)
+        tmp_path = path + f'.{os.getpid()}.tmp.npy'
+        np.save(tmp_path, data)
+        os.replace(tmp_path, path) # atomic, so parallel workers never see half a file
+        self.evict()
+
+    def evict(self):
+        """
+        Deletes least recently used entries until the cache fits in max_bytes.
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.npy') or '.tmp' in name:
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        """
+        Removes every cached ephemeris (the kernel hash index is kept).
+        """
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.npy'):
+                os.remove(os.path.join(self.cache_dir, name))
+
+    # --- Cached SPICE calls ---
+
+    def _query(self, routine, spice_func, targ, et, ref, abcorr, obs):
+        times = np.atleast_1d(np.asarray(et, dtype=float))
+        key = self.key(routine, targ, times, ref, abcorr, obs)
+
+        data = self._load(key)
+        if data is None:
+            values, light_times = spice_func(targ, times, ref, abcorr, obs)
+            # Light time is stored as the last column next to the state/position
+            data = np.column_stack([np.asarray(values), np.asarray(light_times)])
+            self._store(key, data)
+
+        values, light_times = data[:, :-1], data[:, -1]
+        if np.ndim(et) == 0:
+            return np.array(values[0]), float(light_times[0])
+        return values, light_times
+
+    def spkezr(self, targ, et, ref, abcorr, obs):
+        """
+        Cached spice.spkezr: returns (states, light_times) like SpiceyPy does.
+        """
+        return self._query('spkezr', spice.spkezr, targ, et, ref, abcorr, obs)
+
+    def spkpos(self, targ, et, ref, abcorr, obs):
+        """
+        Cached spice.spkpos: returns (positions, light_times) like SpiceyPy does.
+        """
+        return self._query('spkpos', spice.spkpos, targ, et, ref, abcorr, obs)
@@ -0,0 +1,370 @@
+import os
+import sys
+import json
+import time
+import atexit
+import cProfile
+import functools
+import contextlib
+import tracemalloc
+
+import numpy as np
+import spiceypy
+
+# SpiceyPy routines the tutorials call, and which argument holds the epoch(s)
+COUNTED_ROUTINES = {
+    'spkezr': 1,
+    'spkpos': 1,
+    'str2et': 0,
+    'et2utc': 0,
+    'et2datetime': 0,
+    'recrad': None,
+    'twovec': None,
+    'mxv': None,
+    'vcrss': None,
+    'bodn2c': None,
+    'furnsh': None,
+    'unload': None,
+}
+
+class SpiceCallCounter:
+    """
+    Counts SpiceyPy calls made in this process while active.
+
+    calls[routine] is the number of Python-level calls and epochs[routine] the
+    number of epochs they covered (an spkezr call over an array of N epochs is one
+    call and N epochs), so batched and scalar code can be compared fairly. Works by
+    temporarily wrapping the functions on the spiceypy module:
+
+        with SpiceCallCounter() as counter:
+            calculate_visibility(...)
+        print(counter.calls['spkezr'], counter.epochs['spkezr'])
+    """
+
+    def __init__(self, routines=COUNTED_ROUTINES):
+        self.routines = dict(routines)
+        self.calls = {name: 0 for name in self.routines}
+        self.epochs = {name: 0 for name in self.routines}
+        self.errors = {name: 0 for name in self.routines}
+        self._originals = {}
+
+    def _wrap(self, name, func):
+        epoch_arg = self.routines[name]
+
+        @functools.wraps(func)
+        def counted(*args, **kwargs):
+            self.calls[name] += 1
+            if epoch_arg is not None:
+                et = args[epoch_arg] if len(args) > epoch_arg else kwargs.get('et', kwargs.get('time'))
+                self.epochs[name] += 1 if isinstance(et, str) else int(np.size(et))
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                self.errors[name] += 1
+                raise
+        return counted
+
+    def __enter__(self):
+        for name in self.routines:
+            func = getattr(spiceypy, name, None)
+            if func is not None:
+                self._originals[name] = func
+                setattr(spiceypy, name, self._wrap(name, func))
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        for name, func in self._originals.items():
+            setattr(spiceypy, name, func)
+        self._originals = {}
+        return False
+
+    @property
+    def total_calls(self):
+        return sum(self.calls.values())
+
+    @property
+    def total_epochs(self):
+        # Epoch-based routines count their epochs, the others one per call
+        return sum(self.epochs[name] if self.routines[name] is not None else self.calls[name]
+                   for name in self.routines)
+
+def peak_rss_mb():
+    """
+    Peak resident memory of this process so far, in MB.
+    """
+    try:
+        import resource
+    except ImportError: # not available on Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 1024**2 if sys.platform == 'darwin' else peak / 1024
+
+class StageStats:
+    """
+    Accumulated timing of one named stage: how often it ran, total seconds,
+    SPICE calls/epochs made inside it and, with trace_memory, the largest
+    tracemalloc peak inside it. (The process-wide peak RSS is only on the report:
+    ru_maxrss never goes down, so it can't be attributed to one stage.)
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.seconds = 0.0
+        self.spice_calls = 0
+        self.spice_epochs = 0
+        self.exceptions = 0
+        self.peak_traced_mb = None
+
+    def as_dict(self):
+        return dict(vars(self))
+
+class InstrumentationReport:
+    """
+    Snapshot of everything an Instrumentation collected, as plain data:
+    per-stage timings, SPICE calls/epochs/errors by routine, handled exception
+    counts by site, peak memory and the cProfile dumps that were written.
+    """
+
+    def __init__(self, stages, spice_calls, spice_epochs, spice_errors, exceptions,
+                 peak_rss_mb, wall_seconds, profiles):
+        self.stages = stages
+        self.spice_calls = spice_calls
+        self.spice_epochs = spice_epochs
+        self.spice_errors = spice_errors
+        self.exceptions = exceptions
+        self.peak_rss_mb = peak_rss_mb
+        self.wall_seconds = wall_seconds
+        self.profiles = profiles
+
+    def as_dict(self):
+        return {
+            'wall_seconds': self.wall_seconds,
+            'peak_rss_mb': self.peak_rss_mb,
+            'stages': {name: stats.as_dict() for name, stats in self.stages.items()},
+            'spice_calls': self.spice_calls,
+            'spice_epochs': self.spice_epochs,
+            'spice_errors': self.spice_errors,
+            'exceptions': self.exceptions,
+            'profiles': self.profiles,
+        }
+
+    def to_json(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.as_dict(), f, indent=1)
+
+    def slowest_stages(self, n=5):
+        return sorted(self.stages.values(), key=lambda stats: stats.seconds, reverse=True)[:n]
+
+    def __str__(self):
+        lines = [f"Instrumentation report ({self.wall_seconds:.2f} s total, "
+                 f"peak RSS {self.peak_rss_mb or 0:.0f} MB)"]
+        lines.append(f"  {'stage':<36} {'calls':>7} {'seconds':>9} {'SPICE calls':>12} {'epochs':>10} {'errors':>7}")
+        for stats in sorted(self.stages.values(), key=lambda stats: stats.seconds, reverse=True):
+            lines.append(f"  {stats.name:<36} {stats.count:>7} {stats.seconds:>9.3f} "
+                         f"{stats.spice_calls:>12} {stats.spice_epochs:>10} {stats.exceptions:>7}")
+        calls = ', '.join(f"{name}={count}" for name, count in self.spice_calls.items() if count)
+        lines.append(f"  SPICE calls: {calls or 'none'}")
+        errors = {name: count for name, count in self.spice_errors.items() if count}
+        errors.update(self.exceptions)
+        if errors:
+            lines.append("  Exceptions: " + ', '.join(f"{name}={count}" for name, count in errors.items()))
+        for name, path in self.profiles.items():
+            lines.append(f"  cProfile for {name}: {path}")
+        return '\n'.join(lines)
+
+class Instrumentation:
+    """
+    Collects stage timers, SPICE call counts, exception counts and peak memory for
+    one run. Stages are marked in the code with the stage() context manager or the
+    instrumented() decorator, which do nothing unless instrumentation is enabled.
+
+    profile lists stage names (or '*' for all) to run under cProfile; their stats
+    are dumped to profile_dir/<stage>.prof. trace_memory also records the peak
+    Python allocation of every stage with tracemalloc (slower).
+    """
+
+    def __init__(self, profile=(), profile_dir='profiles', trace_memory=False):
+        self.profile = set(profile)
+        self.profile_dir = profile_dir
+        self.trace_memory = trace_memory
+        self.stages = {}
+        self.exceptions = {}
+        self.counter = SpiceCallCounter()
+        self._profilers = {}
+        self._profiling = False
+        self._memory_stack = []
+        self._start = None
+
+    def start(self):
+        self._start = time.perf_counter()
+        self.counter.__enter__()
+        if self.trace_memory:
+            tracemalloc.start()
+        return self
+
+    def stop(self):
+        self.counter.__exit__(None, None, None)
+        if self.trace_memory:
+            tracemalloc.stop()
+
+    def _wants_profile(self, name):
+        return '*' in self.profile or name in self.profile
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = StageStats(name)
+
+        calls_before = self.counter.total_calls
+        epochs_before = self.counter.total_epochs
+
+        # Only one cProfile profiler can run at a time, so nested stages are
+        # covered by the outermost profiled stage
+        profiler = None
+        if self._wants_profile(name) and not self._profiling:
+            profiler = self._profilers.setdefault(name, cProfile.Profile())
+            self._profiling = True
+            profiler.enable()
+
+        if self.trace_memory:
+            # Fold the peak so far into the enclosing stage before measuring this one
+            if self._memory_stack:
+                self._memory_stack[-1] = max(self._memory_stack[-1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            self._memory_stack.append(0)
+
+        start = time.perf_counter()
+        try:
+            yield stats
+        except Exception:
+            stats.exceptions += 1
+            raise
+        finally:
+            stats.seconds += time.perf_counter() - start
+            stats.count += 1
+
+            if profiler is not None:
+                profiler.disable()
+                self._profiling = False
+
+            if self.trace_memory:
+                peak = max(self._memory_stack.pop(), tracemalloc.get_traced_memory()[1])
+                stats.peak_traced_mb = max(stats.peak_traced_mb or 0.0, peak / 1024**2)
+                if self._memory_stack:
+                    self._memory_stack[-1] = max(self._memory_stack[-1], peak)
+                tracemalloc.reset_peak()
+
+            stats.spice_calls += self.counter.total_calls - calls_before
+            stats.spice_epochs += self.counter.total_epochs - epochs_before
+
+    def count_exception(self, site):
+        self.exceptions[site] = self.exceptions.get(site, 0) + 1
+
+    def report(self):
+        """
+        Dumps any cProfile stats and returns an InstrumentationReport.
+        """
+        profiles = {}
+        if self._profilers:
+            os.makedirs(self.profile_dir, exist_ok=True)
+        for name, profiler in self._profilers.items():
+            path = os.path.join(self.profile_dir, f"{name}.prof")
+            profiler.dump_stats(path)
+            profiles[name] = path
+
+        return InstrumentationReport(
+            stages=dict(self.stages),
+            spice_calls=dict(self.counter.calls),
+            spice_epochs=dict(self.counter.epochs),
+            spice_errors=dict(self.counter.errors),
+            exceptions=dict(self.exceptions),
+            peak_rss_mb=peak_rss_mb(),
+            wall_seconds=time.perf_counter() - self._start if self._start else 0.0,
+            profiles=profiles,
+        )
+
+# The instrumentation collecting data in this process, if any
+_active = None
+
+def enable_instrumentation(profile=(), profile_dir='profiles', trace_memory=False):
+    """
+    Starts collecting instrumentation in this process and returns the Instrumentation.
+    """
+    global _active
+    if _active is not None:
+        _active.stop()
+    _active = Instrumentation(profile, profile_dir, trace_memory).start()
+    return _active
+
+def disable_instrumentation():
+    """
+    Stops collecting and returns the final InstrumentationReport (None if not enabled).
+    """
+    global _active
+    if _active is None:
+        return None
+    report = _active.report()
+    _active.stop()
+    _active = None
+    return report
+
+def instrumentation_report():
+    """
+    Report of the data collected so far, without stopping (None if not enabled).
+    """
+    return _active.report() if _active is not None else None
+
+def stage(name):
+    """
+    Context manager timing a named stage; a no-op when instrumentation is off.
+    """
+    if _active is None:
+        return contextlib.nullcontext()
+    return _active.stage(name)
+
+def instrumented(name):
+    """
+    Decorator that runs a whole function as one stage.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def count_exception(site):
+    """
+    Counts an exception that the code handled itself (e.g. a SPICE fallback path).
+    """
+    if _active is not None:
+        _active.count_exception(site)
+
+def _enable_from_environment():
+    # SPICE_TOOLS_INSTRUMENT=1 turns instrumentation on for any script without editing it.
+    # SPICE_TOOLS_PROFILE=stage1,stage2 (or *) adds cProfile dumps, SPICE_TOOLS_REPORT=path.json
+    # saves the report and SPICE_TOOLS_TRACE_MEMORY=1 adds tracemalloc peaks.
+    if os.environ.get('SPICE_TOOLS_INSTRUMENT', '') in ('', '0'):
+        return
+    profile = [name for name in os.environ.get('SPICE_TOOLS_PROFILE', '').split(',') if name]
+    enable_instrumentation(
+        profile=profile,
+        profile_dir=os.environ.get('SPICE_TOOLS_PROFILE_DIR', 'profiles'),
+        trace_memory=os.environ.get('SPICE_TOOLS_TRACE_MEMORY', '') not in ('', '0'),
+    )
+
+    def print_report():
+        report = disable_instrumentation()
+        if report is None:
+            return
+        print(report)
+        report_path = os.environ.get('SPICE_TOOLS_REPORT')
+        if report_path:
+            report.to_json(f"{report_path}.{os.getpid()}" if os.path.exists(report_path) else report_path)
+    atexit.register(print_report)
+
+_enable_from_environment()
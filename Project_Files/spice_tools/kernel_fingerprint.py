@@ -0,0 +1,131 @@
+import os
+import json
+import hashlib
+
+import spiceypy as spice
+
+from spice_tools.coverage import read_spk_segments
+from spice_tools.kernel_session import loaded_kernel_files
+
+def _sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _spk_segment_hashes(path):
+    """
+    [body, center, start_et, stop_et, hash] of every segment of an SPK, where the
+    hash covers the segment's summary and its data records.
+    """
+    segments = []
+    handle = spice.dafopr(path)
+    try:
+        for body, center, start, stop, first, last in read_spk_segments(path):
+            digest = hashlib.sha256(repr((body, center, start, stop)).encode())
+            # Read large segments (de440) a piece at a time to keep memory flat
+            for chunk_start in range(first, last + 1, 1 << 20):
+                chunk_end = min(chunk_start + (1 << 20) - 1, last)
+                digest.update(spice.dafgda(handle, chunk_start, chunk_end).tobytes())
+            segments.append([body, center, start, stop, digest.hexdigest()])
+    finally:
+        spice.dafcls(handle)
+    return segments
+
+class KernelHashIndex:
+    """
+    Content hashes of kernel files, kept in a JSON index at index_path and shared by
+    EphemerisCache and KernelFingerprints.
+
+    Text and binary PCK/frame kernels are hashed whole, SPKs segment by segment (the
+    file hash of an SPK is the hash of its segment hashes). Entries are remembered
+    per (path, size, modification time), so unchanged kernels are not read again.
+    """
+
+    def __init__(self, index_path):
+        self.index_path = index_path
+        try:
+            with open(index_path) as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = {}
+        if not isinstance(self.index, dict):
+            self.index = {}
+        self._changed = False
+
+    def entry(self, path, is_spk):
+        """
+        {'size', 'mtime_ns', 'hash'} of one kernel, plus 'segments' for an SPK.
+        Raises OSError if the file can't be read.
+        """
+        stat = os.stat(path)
+        entry = self.index.get(path)
+        if not (isinstance(entry, dict) and entry.get('size') == stat.st_size
+                and entry.get('mtime_ns') == stat.st_mtime_ns and 'hash' in entry
+                and (not is_spk or 'segments' in entry)):
+            entry = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+            if is_spk:
+                entry['segments'] = _spk_segment_hashes(path)
+                segment_hashes = [segment[4] for segment in entry['segments']]
+                entry['hash'] = hashlib.sha256(json.dumps(segment_hashes).encode()).hexdigest()
+            else:
+                entry['hash'] = _sha256_file(path)
+            self.index[path] = entry
+            self._changed = True
+        return entry
+
+    def file_hashes(self, paths):
+        """
+        Hash of each loaded kernel in `paths`, in the same order.
+        """
+        spk_files = set(loaded_kernel_files('SPK'))
+        hashes = []
+        for path in paths:
+            try:
+                hashes.append(self.entry(path, path in spk_files)['hash'])
+            except OSError:
+                hashes.append(path) # unreadable kernel: fall back to its name
+        return hashes
+
+    def save(self):
+        """
+        Writes the hash index back if anything new was hashed (atomically).
+        """
+        if not self._changed:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.index_path)), exist_ok=True)
+        tmp_path = self.index_path + f'.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, self.index_path)
+        self._changed = False
+
+class KernelFingerprints(KernelHashIndex):
+    """
+    Fingerprints of the loaded kernels restricted to a time range.
+
+    range_fingerprint includes the whole-file hash of every non-SPK kernel but only
+    the SPK segments that overlap the range. So a new jwst_pred.bsp only changes the
+    fingerprint of the time ranges whose ephemeris data actually changed.
+    """
+
+    def range_fingerprint(self, et_start, et_end):
+        """
+        Hash of everything in the loaded kernels that can affect results in [et_start, et_end].
+        """
+        spk_files = set(loaded_kernel_files('SPK'))
+        parts = []
+        # Load order matters: later SPK segments take precedence over earlier ones
+        for path in loaded_kernel_files():
+            try:
+                entry = self.entry(path, path in spk_files)
+            except OSError:
+                parts.append(path) # unreadable kernel: fall back to its name
+                continue
+            if 'segments' in entry:
+                parts.extend(segment[4] for segment in entry['segments']
+                             if segment[2] <= et_end and segment[3] >= et_start)
+            else:
+                parts.append(entry['hash'])
+        return hashlib.sha256(json.dumps(parts).encode()).hexdigest()
@@ -0,0 +1,141 @@
+import os
+import time
+import threading
+
+import spiceypy as spice
+
+from spice_tools.instrumentation import stage
+
+# One session per meta-kernel per process, shared by every caller
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+class KernelSession:
+    """
+    Reference-counted handle on one meta-kernel in this process's kernel pool.
+
+    The first acquire() furnishes the meta-kernel; later calls (from other
+    functions, worker initializers or notebook cells) only bump a counter, so
+    de440.bsp and friends are read once per process. release() never unloads
+    anything, which keeps the pool warm for the next caller; unload() removes the
+    kernels only when nobody holds the session. Use it as a context manager:
+
+        with kernel_session('jwst_meta.txt', relative_to=__file__):
+            ...
+    """
+
+    def __init__(self, meta_kernel):
+        self.meta_kernel = os.path.abspath(meta_kernel)
+        self.ref_count = 0
+        self.loaded = False
+        self.kernel_files = []    # absolute paths of the kernels listed in the meta-kernel
+        self.load_count = 0       # how many times the kernels were actually furnished
+        self.load_seconds = 0.0   # time spent in the most recent furnish
+        self._lock = threading.RLock()
+
+    def _furnish(self):
+        # Paths inside a meta-kernel are relative to its own directory, so we
+        # step into that directory while SPICE reads it. The kernels it lists are
+        # then reloaded by absolute path: unloading any kernel makes SPICE re-read
+        # the remaining text kernels, which must work from any working directory
+        # even when meta-kernels from several folders are loaded.
+        cwd = os.getcwd()
+        start = time.perf_counter()
+        with stage('kernel load'):
+            try:
+                os.chdir(os.path.dirname(self.meta_kernel))
+                spice.furnsh(self.meta_kernel)
+                self.kernel_files = self._listed_kernels()
+                spice.unload(self.meta_kernel)
+            finally:
+                os.chdir(cwd)
+            for path in self.kernel_files:
+                spice.furnsh(path)
+        self.load_seconds = time.perf_counter() - start
+        self.load_count += 1
+        self.loaded = True
+
+    def _listed_kernels(self):
+        # Absolute paths of the kernels loaded by this meta-kernel, in load order
+        files = []
+        for i in range(spice.ktotal('ALL')):
+            file, _, source = spice.kdata(i, 'ALL')[:3]
+            if source and os.path.abspath(source) == self.meta_kernel:
+                files.append(os.path.abspath(file))
+        return files
+
+    def acquire(self):
+        """
+        Makes sure the kernels are loaded and registers one more user.
+        """
+        with self._lock:
+            if not self.loaded:
+                self._furnish()
+            self.ref_count += 1
+        return self
+
+    def release(self):
+        """
+        Drops one user. The kernels stay loaded for the next caller.
+        """
+        with self._lock:
+            if self.ref_count > 0:
+                self.ref_count -= 1
+
+    def unload(self):
+        """
+        Unloads this meta-kernel's kernels if no one is using them.
+        Returns True if the kernels were unloaded.
+        """
+        with self._lock:
+            if not self.loaded or self.ref_count > 0:
+                return False
+            for path in reversed(self.kernel_files):
+                spice.unload(path)
+            self.loaded = False
+            return True
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+        return False
+
+    def __repr__(self):
+        return (f"KernelSession({os.path.basename(self.meta_kernel)!r}, loaded={self.loaded}, "
+                f"users={self.ref_count}, load_seconds={self.load_seconds:.3f})")
+
+def kernel_session(meta_kernel, relative_to=None):
+    """
+    Returns the process-wide KernelSession for a meta-kernel.
+    A relative meta_kernel path is resolved against the directory of `relative_to`
+    (usually the calling module's __file__) instead of the working directory.
+    """
+    if relative_to is not None and not os.path.isabs(meta_kernel):
+        meta_kernel = os.path.join(os.path.dirname(os.path.abspath(relative_to)), meta_kernel)
+    meta_kernel = os.path.abspath(meta_kernel)
+
+    with _sessions_lock:
+        session = _sessions.get(meta_kernel)
+        if session is None:
+            session = KernelSession(meta_kernel)
+            _sessions[meta_kernel] = session
+        return session
+
+def loaded_kernel_files(kind='ALL'):
+    """
+    Lists the absolute paths of every kernel currently furnished in the kernel pool
+    (only those of one type, e.g. 'SPK', if `kind` is given).
+    Kernels listed in a meta-kernel are resolved relative to the meta-kernel's directory
+    when they cannot be found relative to the working directory.
+    """
+    files = []
+    for i in range(spice.ktotal(kind)):
+        # Depending on SpiceyPy's settings kdata may or may not return a 'found' flag
+        file, _, source = spice.kdata(i, kind)[:3]
+        path = file
+        if not os.path.isabs(path) and not os.path.exists(path) and source:
+            path = os.path.join(os.path.dirname(os.path.abspath(source)), file)
+        files.append(os.path.abspath(path))
+    return files
@@ -0,0 +1,73 @@
+import numpy as np
+from matplotlib.colors import ListedColormap
+from mpl_toolkits.mplot3d import proj3d
+from mpl_toolkits.mplot3d.art3d import Line3DCollection
+
+def flag_colormap(colors_map):
+    """
+    Turns a {flag: color} dict with flags 0..K-1 into a ListedColormap, so an
+    integer flag array maps to RGBA colors in one vectorized call: cmap(flags).
+    """
+    return ListedColormap([colors_map[flag] for flag in range(len(colors_map))])
+
+def screen_cells(ax, positions, pixel_size=1.0):
+    """
+    Projects (N, 3) data positions through the current view of a 3D axis and
+    returns the (N, 2) integer screen cell (pixel_size pixels wide) of each point.
+    Axis limits and view angles must be set first.
+    """
+    x_2d, y_2d, _ = proj3d.proj_transform(positions[:, 0], positions[:, 1], positions[:, 2], ax.get_proj())
+    pixels = ax.transData.transform(np.column_stack([x_2d, y_2d]))
+    return np.floor(pixels / pixel_size)
+
+def decimate_path(cells, flags):
+    """
+    Indices of the samples worth drawing: a sample is dropped when it lands in the
+    same screen cell with the same flag as the previous one, so the path keeps its
+    shape on screen while dense stretches collapse to one vertex per pixel.
+    """
+    n = len(flags)
+    keep = np.ones(n, dtype=bool)
+    if n > 1:
+        same_cell = np.all(cells[1:] == cells[:-1], axis=1)
+        keep[1:] = ~(same_cell & (flags[1:] == flags[:-1]))
+        keep[-1] = True
+    return np.flatnonzero(keep)
+
+def plot_flagged_path_3d(ax, positions, flags, colors_map, linewidth=2.5, pixel_size=1.0):
+    """
+    Level-of-detail replacement for ax.scatter(x, y, z, c=[color per point]).
+
+    Draws a 3D trajectory colored by integer flags as one Line3DCollection per flag,
+    with one polyline per run of equal flags. Points are first decimated to about one
+    vertex per screen pixel, so render time and memory depend on the figure size and
+    the number of flag changes, not on the number of samples. Set the axis limits
+    and view before calling. Returns the number of vertices drawn.
+    """
+    positions = np.asarray(positions, dtype=float)
+    flags = np.asarray(flags, dtype=int)
+    if len(flags) == 0:
+        return 0
+    cmap = flag_colormap(colors_map)
+
+    # --- Screen-space decimation ---
+    keep = decimate_path(screen_cells(ax, positions, pixel_size), flags)
+    points = positions[keep]
+    point_flags = flags[keep]
+
+    # --- Runs of equal flags (vectorized run-length pass) ---
+    change = np.flatnonzero(point_flags[1:] != point_flags[:-1]) + 1
+    run_starts = np.concatenate(([0], change))
+    run_ends = np.concatenate((change, [len(point_flags)]))
+
+    # One collection per flag; each run also includes the first point of the next
+    # run so the colored pieces join up into one continuous path
+    for flag in np.unique(point_flags):
+        segments = [
+            points[start:min(end + 1, len(points))]
+            for start, end in zip(run_starts, run_ends) if point_flags[start] == flag
+        ]
+        collection = Line3DCollection(segments, colors=cmap(flag), linewidths=linewidth)
+        ax.add_collection3d(collection)
+
+    return len(points)
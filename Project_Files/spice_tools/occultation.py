@@ -0,0 +1,85 @@
+import numpy as np
+import spiceypy as spice
+
+from spice_tools.coverage import mask_intervals
+
+def body_radii(body):
+    """
+    Triaxial radii (a, b, c) in km of a body, from the RADII in the loaded PCK (pck00010).
+    """
+    return np.asarray(spice.bodvrd(str(body), 'RADII', 3)[1], dtype=float)
+
+def body_fixed_rotations(frame, times_et):
+    """
+    (N, 3, 3) matrices rotating J2000 vectors into a body-fixed frame (e.g. IAU_MOON),
+    from one batched sxform call.
+    """
+    return spice.sxform('J2000', frame, np.atleast_1d(times_et))[:, :3, :3]
+
+def segment_hits_ellipsoid(start, end, radii):
+    """
+    True where the straight segment from `start` to `end` passes through the ellipsoid
+    x^2/a^2 + y^2/b^2 + z^2/c^2 < 1. Points are (..., 3) arrays in the body-fixed frame
+    relative to the body's center; any leading shapes broadcast.
+
+    Scaling each axis by 1/radius turns the ellipsoid into the unit sphere, so the
+    test reduces to: is the point of the segment closest to the origin inside it?
+    """
+    start = np.asarray(start, dtype=float) / radii
+    direction = np.asarray(end, dtype=float) / radii - start
+
+    # Closest point start + s * direction, with s clipped to the segment [0, 1]
+    length2 = np.sum(direction * direction, axis=-1)
+    s = np.clip(-np.sum(start * direction, axis=-1) / np.where(length2 > 0, length2, 1.0), 0.0, 1.0)
+    closest = start + s[..., None] * direction
+    return np.sum(closest * closest, axis=-1) < 1.0
+
+def line_of_sight_blocked(observer_pos, target_pos, body_pos, radii, rotations=None):
+    """
+    Whether a body blocks the line of sight from observer to target, for all epochs at once.
+
+    observer_pos, target_pos and body_pos are J2000 positions (..., N, 3) relative to a
+    common origin (e.g. Earth's center); leading shapes broadcast, so (S, 1, N, 3)
+    stations against (1, T, N, 3) targets give a (S, T, N) result. rotations are the
+    (N, 3, 3) J2000 -> body-fixed matrices, only needed when the radii are not all equal.
+
+    TEACHING NOTE: this is spice.occult with an ELLIPSOID occulting body and a POINT
+    target ('NONE' aberration correction), done for every epoch in one numpy pass
+    instead of one SPICE call per epoch and observer.
+    """
+    start = np.asarray(observer_pos, dtype=float) - body_pos
+    end = np.asarray(target_pos, dtype=float) - body_pos
+    if rotations is not None:
+        start = np.einsum('nij,...nj->...ni', rotations, start)
+        end = np.einsum('nij,...nj->...ni', rotations, end)
+    return segment_hits_ellipsoid(start, end, radii)
+
+class OccultingBody:
+    """
+    Shape and orientation of a body that can block lines of sight. A sphere (all radii
+    equal, like the Moon in pck00010) needs no orientation; otherwise the body-fixed
+    frame (IAU_<body> by default) is evaluated with one batched sxform per call.
+    """
+
+    def __init__(self, name, frame=None):
+        self.name = name
+        self.radii = body_radii(name)
+        self.frame = frame or f'IAU_{name}'
+
+    @property
+    def is_sphere(self):
+        return np.all(self.radii == self.radii[0])
+
+    def blocked(self, observer_pos, target_pos, body_pos, times_et):
+        """
+        line_of_sight_blocked for this body's shape at the given epochs.
+        """
+        rotations = None if self.is_sphere else body_fixed_rotations(self.frame, times_et)
+        return line_of_sight_blocked(observer_pos, target_pos, body_pos, self.radii, rotations)
+
+def blockage_intervals(times_et, blocked):
+    """
+    (K, 2) array of [first_et, last_et] of every run of blocked samples.
+    """
+    times_et = np.asarray(times_et, dtype=float)
+    return times_et[mask_intervals(blocked)].reshape(-1, 2)
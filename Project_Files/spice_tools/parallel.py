@@ -0,0 +1,43 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+import numpy as np
+
+from spice_tools.kernel_session import kernel_session
+
+def load_worker_kernels(meta_kernel):
+    """
+    Process-pool initializer: furnishes the meta-kernel once per worker
+    and keeps it loaded for the worker's whole life.
+    """
+    kernel_session(meta_kernel).acquire()
+
+def split_times(times_et, n_chunks):
+    """
+    Splits an array of epochs into at most n_chunks contiguous, non-empty blocks.
+    """
+    n_chunks = max(1, min(int(n_chunks), len(times_et)))
+    return np.array_split(np.asarray(times_et, dtype=float), n_chunks)
+
+def run_time_sharded(chunk_func, times_et, meta_kernel, workers=None, chunks_per_worker=4, args=()):
+    """
+    Runs chunk_func(times_chunk, *args) over contiguous blocks of times_et in a
+    pool of worker processes, each with its own copy of the kernel pool.
+
+    CSPICE keeps a single, non thread-safe kernel pool per process, so we use
+    processes (not threads) and the 'spawn' start method so every worker
+    starts with a clean pool. chunk_func must be a module-level function.
+    Results are returned as a list in time order, ready to be merged.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = split_times(times_et, workers * chunks_per_worker)
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=load_worker_kernels,
+        initargs=(meta_kernel,)
+    ) as pool:
+        futures = [pool.submit(chunk_func, chunk, *args) for chunk in chunks]
+        return [future.result() for future in futures]
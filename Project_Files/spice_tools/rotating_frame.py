@@ -0,0 +1,147 @@
+import numpy as np
+import spiceypy as spice
+
+from spice_tools.coverage import covered_ephemeris
+
+def body_states(targets, times_et, observer, ref='J2000', abcorr='NONE', cache=None):
+    """
+    Pulls the states of several bodies relative to one observer with one batched
+    spkezr call each. Returns {target: (N, 6) array}, with NaN rows at epochs outside
+    the SPK coverage of the target or observer. Pass an EphemerisCache as `cache` to
+    reuse states from earlier runs.
+    """
+    times_et = np.atleast_1d(np.asarray(times_et, dtype=float))
+    states = {}
+    for target in targets:
+        states[target] = covered_ephemeris('spkezr', target, times_et, ref, abcorr, observer, cache)
+    return states
+
+def rotating_frame_matrices(relative_states):
+    """
+    Batched spice.twovec(r, 1, r x v, 3) for an (N, 6) array of states of the
+    secondary body relative to the primary. Returns (N, 3, 3) matrices that rotate
+    J2000 vectors into the rotating frame (X towards the secondary, Z along the
+    orbit normal).
+    """
+    relative_states = np.asarray(relative_states, dtype=float)
+    pos = relative_states[:, :3]
+    vel = relative_states[:, 3:6]
+
+    x_axis = pos / np.linalg.norm(pos, axis=1, keepdims=True)
+    z_axis = np.cross(pos, vel)
+    z_axis /= np.linalg.norm(z_axis, axis=1, keepdims=True)
+    y_axis = np.cross(z_axis, x_axis)
+
+    # The rows of each matrix are the rotating axes expressed in J2000
+    return np.stack([x_axis, y_axis, z_axis], axis=1)
+
+def frame_angular_velocity(relative_states):
+    """
+    Angular velocity (N, 3) of the rotating frame in J2000, omega = (r x v) / |r|^2.
+    This is the rotation of the primary-secondary line, which is what the
+    omega x r term of the velocity transformation needs.
+    """
+    relative_states = np.asarray(relative_states, dtype=float)
+    pos = relative_states[:, :3]
+    vel = relative_states[:, 3:6]
+    return np.cross(pos, vel) / np.sum(pos * pos, axis=1, keepdims=True)
+
+def rotate_vectors(matrices, vectors):
+    """
+    Applies matrix n to vector n for every epoch: (N, 3, 3) x (N, 3) -> (N, 3).
+    """
+    return np.einsum('nij,nj->ni', matrices, vectors)
+
+def mass_ratio(primary, secondary):
+    """
+    CR3BP mass ratio mu = GM_secondary / (GM_primary + GM_secondary) from the GM values
+    in the kernel pool (e.g. gm_de440.tpc). Returns None when they are not loaded.
+    """
+    try:
+        gm_primary = spice.bodvrd(str(primary), 'GM', 1)[1][0]
+        gm_secondary = spice.bodvrd(str(secondary), 'GM', 1)[1][0]
+    except Exception:
+        return None
+    return gm_secondary / (gm_primary + gm_secondary)
+
+class RotatingFrame:
+    """
+    Synodic (rotating) frame of a primary/secondary pair over an array of epochs.
+
+    The X-axis points from the primary to the secondary, Z is along their relative
+    orbital angular momentum and Y completes the right-handed triad. The origin is
+    the primary, the secondary or (given the mass ratio mu) their barycenter.
+    All epochs are handled at once with stacked matrix products, for example:
+
+        frame = RotatingFrame('EARTH', 'MOON', times, center='barycenter', mu=0.01215)
+        dsg_rot = frame.transform('-60000')
+    """
+
+    def __init__(self, primary, secondary, times_et, center='primary', mu=None, cache=None):
+        self.primary = primary
+        self.secondary = secondary
+        self.times_et = np.atleast_1d(np.asarray(times_et, dtype=float))
+        self.center = center
+        self.cache = cache
+
+        # One batched state pull defines the frame at every epoch
+        self.relative_states = body_states([secondary], self.times_et, primary, cache=cache)[secondary]
+        self.matrices = rotating_frame_matrices(self.relative_states)
+        self.omega = frame_angular_velocity(self.relative_states)
+        self.distance = np.linalg.norm(self.relative_states[:, :3], axis=1)
+
+        self.mu = mu if mu is not None else mass_ratio(primary, secondary)
+        if center == 'barycenter' and self.mu is None:
+            raise ValueError("A barycenter-centered frame needs the mass ratio mu "
+                             "(no GM values found in the loaded kernels).")
+
+    def origin_states(self):
+        """
+        States (N, 6) of the frame origin relative to the primary, in J2000.
+        """
+        if self.center == 'primary':
+            return np.zeros_like(self.relative_states)
+        if self.center == 'secondary':
+            return self.relative_states
+        if self.center == 'barycenter':
+            return self.mu * self.relative_states
+        raise ValueError(f"Unknown frame center '{self.center}'.")
+
+    def to_rotating(self, states):
+        """
+        Converts (N, 6) J2000 states relative to the primary into rotating-frame
+        states relative to the frame origin. Velocities include the -omega x r term.
+        """
+        states = np.asarray(states, dtype=float) - self.origin_states()
+        pos = states[:, :3]
+        vel = states[:, 3:6] - np.cross(self.omega, pos)
+        return np.hstack([rotate_vectors(self.matrices, pos), rotate_vectors(self.matrices, vel)])
+
+    def from_rotating(self, states_rot):
+        """
+        Inverse of to_rotating: rotating-frame states back to J2000 relative to the primary.
+        """
+        states_rot = np.asarray(states_rot, dtype=float)
+        # The inverse of a rotation matrix is its transpose
+        transposed = np.swapaxes(self.matrices, 1, 2)
+        pos = rotate_vectors(transposed, states_rot[:, :3])
+        vel = rotate_vectors(transposed, states_rot[:, 3:6]) + np.cross(self.omega, pos)
+        return np.hstack([pos, vel]) + self.origin_states()
+
+    def transform(self, target, abcorr='NONE'):
+        """
+        Rotating-frame states (N, 6) of a NAIF body, e.g. '-60000' for the DSG.
+        """
+        states = body_states([target], self.times_et, self.primary, abcorr=abcorr, cache=self.cache)[target]
+        return self.to_rotating(states)
+
+    def nondimensionalize(self, states_rot):
+        """
+        Scales rotating-frame states to CR3BP units: the instantaneous primary-secondary
+        distance is one length unit and 1/|omega| one time unit, so the secondary
+        stays at x = 1 - mu in a barycentric frame.
+        """
+        states_rot = np.asarray(states_rot, dtype=float)
+        length_unit = self.distance[:, None]
+        velocity_unit = (self.distance * np.linalg.norm(self.omega, axis=1))[:, None]
+        return np.hstack([states_rot[:, :3] / length_unit, states_rot[:, 3:6] / velocity_unit])
@@ -0,0 +1,157 @@
+import re
+import datetime
+
+import numpy as np
+import spiceypy as spice
+
+# J2000 epoch (2000-01-01 12:00:00 UTC) as numpy datetime64, the zero point of ET
+J2000_DATETIME64 = np.datetime64('2000-01-01T12:00:00', 'us')
+J2000_DATETIME = datetime.datetime(2000, 1, 1, 12)
+
+# Upper bound on the leap second table read from the kernel pool
+MAX_LEAP_SECONDS = 200
+
+def _parse_lsk_value(token):
+    """
+    One value of a text kernel assignment: a number (possibly with a Fortran 'D'
+    exponent) or an @date, returned as seconds past J2000 like SPICE stores it.
+    """
+    if token.startswith('@'):
+        date = datetime.datetime.strptime(token[1:].title(), '%Y-%b-%d')
+        return (date - J2000_DATETIME).total_seconds()
+    return float(token.upper().replace('D', 'E'))
+
+def read_lsk_variables(path):
+    """
+    {name: [values]} of every assignment in the \\begindata sections of a leapseconds kernel.
+    """
+    with open(path) as f:
+        text = f.read()
+
+    data = ''.join(re.findall(r'\\begindata(.*?)(?:\\begintext|$)', text, flags=re.S))
+    variables = {}
+    for name, value in re.findall(r'([\w/]+)\s*=\s*(\([^)]*\)|\S+)', data):
+        tokens = value.strip('()').replace(',', ' ').split()
+        variables[name] = [_parse_lsk_value(token) for token in tokens]
+    return variables
+
+class LeapSecondTable:
+    """
+    The DELTET constants and leap second table of a leapseconds kernel (naif0012.tls),
+    used to convert whole ET arrays to and from UTC with numpy, the way SPICE's
+    deltet does it one epoch at a time.
+
+    ET - UTC = DELTA_AT + DELTA_T_A + K sin(E), with E = M + EB sin(M) and
+    M = M0 + M1 * ET; DELTA_AT (TAI - UTC) steps by one second at every leap second.
+    """
+
+    def __init__(self, delta_t_a, k, eb, m, delta_at):
+        self.delta_t_a = delta_t_a
+        self.k = k
+        self.eb = eb
+        self.m0, self.m1 = m
+        delta_at = np.asarray(delta_at, dtype=float).reshape(-1, 2)
+        self.leap_values = delta_at[:, 0]  # TAI - UTC in seconds from each leap on
+        self.leap_utc = delta_at[:, 1]     # leap epochs as UTC seconds past J2000
+
+    @classmethod
+    def from_lsk(cls, path):
+        """
+        Reads the table straight from a .tls file, without the SPICE kernel pool.
+        """
+        variables = read_lsk_variables(path)
+        return cls(variables['DELTET/DELTA_T_A'][0], variables['DELTET/K'][0],
+                   variables['DELTET/EB'][0], variables['DELTET/M'], variables['DELTET/DELTA_AT'])
+
+    @classmethod
+    def from_kernel_pool(cls):
+        """
+        Reads the table from the kernel pool (a leapseconds kernel must be loaded).
+        """
+        return cls(spice.gdpool('DELTET/DELTA_T_A', 0, 1)[0], spice.gdpool('DELTET/K', 0, 1)[0],
+                   spice.gdpool('DELTET/EB', 0, 1)[0], spice.gdpool('DELTET/M', 0, 2),
+                   spice.gdpool('DELTET/DELTA_AT', 0, 2 * MAX_LEAP_SECONDS))
+
+    def _et_minus_tai(self, times_et):
+        m = self.m0 + self.m1 * times_et
+        return self.delta_t_a + self.k * np.sin(m + self.eb * np.sin(m))
+
+    def et_to_utc_seconds(self, times_et):
+        """
+        UTC seconds past J2000 (no leap seconds counted, like datetime64) for an ET array.
+        An epoch inside a leap second maps onto the last second of that day.
+        """
+        times_et = np.asarray(times_et, dtype=float)
+        tai = times_et - self._et_minus_tai(times_et)
+
+        # In TAI a leap second starts one second before the new TAI - UTC value takes
+        # effect; using the new value from there on repeats 23:59:59 (datetime64 has no :60)
+        k = np.searchsorted(self.leap_utc + self.leap_values - 1.0, tai, side='right') - 1
+        return tai - self.leap_values[np.maximum(k, 0)]
+
+    def utc_seconds_to_et(self, utc_seconds):
+        """
+        ET for an array of UTC seconds past J2000 (inverse of et_to_utc_seconds).
+        """
+        utc_seconds = np.asarray(utc_seconds, dtype=float)
+        k = np.searchsorted(self.leap_utc, utc_seconds, side='right') - 1
+        tai = utc_seconds + np.where(k >= 0, self.leap_values[np.maximum(k, 0)], self.leap_values[0])
+
+        # ET - TAI depends on ET itself; it varies by under 2 ms, so two passes converge
+        times_et = tai + self.delta_t_a
+        for _ in range(2):
+            times_et = tai + self._et_minus_tai(times_et)
+        return times_et
+
+    def et_to_datetime64(self, times_et):
+        """
+        numpy datetime64[us] (UTC) for an ET array, rounded to the microsecond like et2datetime.
+        """
+        utc_seconds = self.et_to_utc_seconds(times_et)
+        # Split off whole seconds first so the microseconds keep full precision
+        whole = np.floor(utc_seconds)
+        micros = np.round((utc_seconds - whole) * 1e6)
+        return J2000_DATETIME64 + (whole.astype(np.int64) * 1000000 + micros.astype(np.int64)).astype('timedelta64[us]')
+
+    def datetime64_to_et(self, times_utc):
+        """
+        ET for an array of UTC datetime64 values (or anything np.datetime64 accepts).
+        """
+        offset = np.asarray(times_utc, dtype='datetime64[us]') - J2000_DATETIME64
+        micros = offset.astype(np.int64)
+        whole, remainder = np.divmod(micros, 1000000)
+        return self.utc_seconds_to_et(whole.astype(float) + remainder * 1e-6)
+
+# Table read on first use from the loaded kernels
+_table = None
+
+def leap_second_table():
+    """
+    The LeapSecondTable of the loaded leapseconds kernel, read from the pool once.
+    """
+    global _table
+    if _table is None:
+        _table = LeapSecondTable.from_kernel_pool()
+    return _table
+
+def et_to_datetime64(times_et):
+    """
+    Vectorized spice.et2datetime: UTC datetime64[us] array for an ET array.
+    """
+    return leap_second_table().et_to_datetime64(times_et)
+
+def datetime64_to_et(times_utc):
+    """
+    Vectorized inverse of et_to_datetime64 (UTC datetime64 values or ISO strings to ET).
+    """
+    return leap_second_table().datetime64_to_et(times_utc)
+
+def et_to_iso(times_et, unit='ms'):
+    """
+    ISO 8601 UTC strings for an ET array, e.g. unit='s' gives '2025-06-01T00:00:00'.
+    Times are rounded to the unit like et2utc (datetime_as_string alone truncates).
+    """
+    micros = (et_to_datetime64(times_et) - J2000_DATETIME64).astype(np.int64)
+    step = np.timedelta64(1, unit).astype('timedelta64[us]').astype(np.int64)
+    rounded = np.floor_divide(micros + step // 2, step) * step
+    return np.datetime_as_string(J2000_DATETIME64 + rounded.astype('timedelta64[us]'), unit=unit)